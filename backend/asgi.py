@@ -0,0 +1,115 @@
+"""
+ASGI entry point for the clean screener
+Requests that can wait on Yahoo (predefined screens, rankings, the
+your-stocks pages, stock details) first await the fetches they need on the
+fetch engine's event loop, holding no thread while upstream responds;
+identical waits share one fetch. The unchanged Flask views then render
+every response from the warm data on a small thread pool, so URLs and JSON
+stay exactly those of clean_screener.py.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+"""
+import os
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.exceptions import HTTPException
+
+from clean_screener import PREDEFINED_FILTERS, app, screener
+from wsgi_bridge import call_wsgi, wsgi_environ
+
+# Threads for the Flask views, which only render by the time they run
+# (ASGI_RENDER_THREADS)
+_render_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_RENDER_THREADS', 16)),
+                                      thread_name_prefix='render')
+
+
+def _arg(query, name, default=None):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+async def _prepare_screen(view_args, query):
+    if view_args.get('filter_name', '') in PREDEFINED_FILTERS:
+        await screener.prepare_screen_data()
+
+
+async def _prepare_ranking(view_args, query):
+    await screener.prepare_screen_data()
+
+
+async def _prepare_stock(view_args, query):
+    ticker = view_args['ticker']
+    await screener.prepare_stock(ticker if '.' in ticker else f"{ticker}.NS")
+
+
+async def _prepare_page(view_args, query):
+    await screener.prepare_page(int(_arg(query, 'page', 1)), int(_arg(query, 'per_page', 10)),
+                                sort=_arg(query, 'sort', 'name'), order=_arg(query, 'order', 'asc'),
+                                cursor=_arg(query, 'cursor'))
+
+
+# Flask endpoint -> coroutine awaiting the fetches that view would make inline
+PREPARE = {
+    'screen_with_predefined_filter': _prepare_screen,
+    'top_stocks_for_filter': _prepare_screen,
+    'rank_stocks': _prepare_ranking,
+    'get_stock_details': _prepare_stock,
+    'get_your_screener_stocks': _prepare_page,
+}
+
+
+async def _prepare(scope, path_info):
+    try:
+        endpoint, view_args = app.url_map.bind('localhost').match(path_info, method=scope['method'])
+    except HTTPException:  # not found, wrong method, redirect: the view answers
+        return
+    prepare = PREPARE.get(endpoint)
+    if prepare is None:
+        return
+    try:
+        await prepare(view_args, parse_qs(scope.get('query_string', b'').decode('latin-1')))
+    except Exception as e:
+        # The view repeats the work inline and reports the error its usual way
+        print(f"⚠️ Could not prepare {scope['path']}: {e}")
+
+
+async def _http(scope, receive, send):
+    body = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+
+    root_path = scope.get('root_path', '')
+    path_info = scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+    await _prepare(scope, path_info)
+    try:
+        await call_wsgi(app, wsgi_environ(scope, path_info, b''.join(body)), send, receive, _render_executor)
+    except Exception:
+        traceback.print_exc()
+        raise
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            if os.environ.get('BACKGROUND_REFRESH', '1') == '1':
+                screener.refresher.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            screener.refresher.stop()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http':
+        await _http(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
@@ -2,22 +2,45 @@
 Enhanced Stock Screener using Yahoo Finance
 Real financial data for proper filtering with Flask integration
 """
+import asyncio
 import requests
 import json
 import time
 import ssl
 import urllib3
-import csv
 import os
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from functools import lru_cache
+from werkzeug.serving import is_running_from_reloader
 import threading
 
+from criteria_engine import compile_criteria
+from csv_loader import ScreenerCSV
+from fetch_engine import YAHOO_HOST, AsyncFetchEngine
+from http_client import yahoo_session
+from json_provider import FastJSONProvider
+from ranking import DEFAULT_K, MAX_K, parse_sort, top_k_rows
+from quote_provider import BatchQuoteFetcher, YahooQuoteProvider, yahoo_ticker
+from rate_limit import UpstreamGuard
+from projection import project, project_records, requested_fields
+from refresher import RemoteRefresher, UniverseRefresher
+from response_cache import ResponseCache
+from sort_index import SORT_KEY_FIELDS
+from stock_cache import PersistentStockCache, SingleFlight, TTLCache
+from streaming import stream_format, stream_stocks
+from universe_snapshot import load_snapshot, write_snapshot
+from universe_state import UniverseState
+from universe_store import UniverseStore
+
+# Inline writes a serve.py worker keeps to replay onto reloaded snapshots
+LOCAL_WRITES_LIMIT = 10000
+
 # Disable SSL verification warnings and issues
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 ssl._create_default_https_context = ssl._create_unverified_context
@@ -31,8 +54,15 @@ try:
 except AttributeError:
     pass
 
+# One pooled keep-alive session for every Yahoo call, with the same SSL fix
+yahoo_session().verify = False
+
+async def _await_shared(future):
+    """Await a concurrent Future other requests share; a cancelled waiter leaves it running"""
+    return await asyncio.shield(asyncio.wrap_future(future))
+
 class YahooFinanceScreener:
-    def __init__(self):
+    def __init__(self, quote_provider=None):
         # Expanded list of major Indian stocks (similar to screener.in coverage)
         self.indian_stocks = [
             # Large Cap IT
@@ -69,269 +99,559 @@ class YahooFinanceScreener:
         ]
         
         # Performance optimizations
-        self.cache = {}
         self.cache_timeout = 300  # 5 minutes
+        # Stale-while-revalidate: expired entries are served (and refreshed in
+        # the background) until max_staleness, after which refreshes are inline
+        self.stale_while_revalidate = True
+        self.max_staleness = 3600  # 1 hour
+        self.cache = TTLCache(ttl=self.cache_timeout, max_stale=self.max_staleness,
+                              max_entries=5000, max_bytes=64 * 1024 * 1024)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        # Concurrent fetches of the same symbol share one upstream call
+        self._inflight = SingleFlight()
+        
+        # Persistent tier so restarts come up warm
+        self.disk_cache = PersistentStockCache(
+            os.environ.get('STOCK_CACHE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stock_cache.db'))
+        )
         self.executor = ThreadPoolExecutor(max_workers=10)
-        self._cached_csv_data = None
-        self._csv_last_read = None
-    
-    @lru_cache(maxsize=128)
-    def get_screener_stocks_from_csv_cached(self):
-        """Cached CSV reading to avoid repeated file I/O"""
-        current_time = datetime.now()
-        
-        # Check if cache is still valid (1 hour)
-        if (self._cached_csv_data is not None and 
-            self._csv_last_read is not None and 
-            (current_time - self._csv_last_read).seconds < 3600):
-            print(f"📊 Using cached CSV data ({len(self._cached_csv_data)} stocks)")
-            return self._cached_csv_data
-        
-        print(f"📊 Reading fresh CSV data...")
-        stocks = self._read_csv_file()
-        
-        # Cache the results
-        self._cached_csv_data = stocks
-        self._csv_last_read = current_time
-        
-        return stocks
-    
-    def _read_csv_file(self):
-        """Internal method to read CSV file"""
-        possible_paths = [
-            '/Users/prashanthbandlamudi/Desktop/personalWork/stock-insights/filter-conditions/stock-filter-criteria.csv',
-            '/Users/prashanthbandlamudi/Desktop/personalWork/stock-insights/stock-filter-criteria.csv',
-            './filter-conditions/stock-filter-criteria.csv',
-            './stock-filter-criteria.csv'
-        ]
+        # screener.in export, reparsed only when the file changes
+        self.screener_csv = ScreenerCSV()
+        self._csv_snapshot = None
+        self._csv_lock = threading.Lock()
         
-        csv_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                csv_path = path
-                break
+        # Columnar store shared by screens, pagination and detail lookups,
+        # mapped from the last snapshot when there is one (UNIVERSE_SNAPSHOT,
+        # empty to disable)
+        self.snapshot_path = os.environ.get(
+            'UNIVERSE_SNAPSHOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'universe.snap'))
+        self.snapshot_stats = {'path': self.snapshot_path or None, 'loaded': False, 'writes': 0}
+        # The store with its sort / range indexes and materialized screens,
+        # replaced as a whole when a newer snapshot is adopted
+        self.state = UniverseState(self._open_universe())
+        # Serializes store writes with reload_snapshot()'s swap
+        self._write_lock = threading.Lock()
+        # (kind, symbol) -> (record, fetched_at) of the inline writes of a
+        # serve.py worker; None in a single-process server
+        self._local_writes = None
         
-        if not csv_path:
-            return []
+        # Concurrent upstream fetching (FETCH_MAX_CONCURRENCY / FETCH_PER_HOST_LIMIT)
+        self.fetch_engine = AsyncFetchEngine.from_env()
+        
+        # Shared rate limiter + circuit breaker for every Yahoo call
+        # (YAHOO_RATE_LIMIT, YAHOO_BURST, YAHOO_BREAKER_FAILURES, YAHOO_BREAKER_RESET)
+        self.upstream = UpstreamGuard.from_env()
+        
+        # Bulk quote fetching (swap the provider for a local stand-in in tests)
+        self.quote_provider = quote_provider or YahooQuoteProvider(guard=self.upstream, engine=self.fetch_engine)
+        self.quote_fetcher = BatchQuoteFetcher(self.quote_provider, engine=self.fetch_engine)
         
+        # Keeps the whole universe warm once started (REFRESH_CYCLE_INTERVAL, REFRESH_BUDGET_SHARE)
+        self.refresher = UniverseRefresher.from_env(self)
+        
+        if not self.snapshot_stats['loaded']:
+            self._warm_from_disk()
+    
+    # The parts of the current state. Code using more than one of them takes
+    # `state = self.state` once, since reload_snapshot() may replace it.
+    @property
+    def universe(self):
+        return self.state.store
+    
+    @property
+    def sort_indexes(self):
+        return self.state.sort_indexes
+    
+    @property
+    def range_indexes(self):
+        return self.state.range_indexes
+    
+    @property
+    def screens(self):
+        return self.state.screens
+    
+    def _open_universe(self):
+        """Store mapped from the snapshot file, or an empty one"""
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            started = time.perf_counter()
+            try:
+                universe = load_snapshot(self.snapshot_path)
+            except Exception as e:
+                print(f"⚠️ Could not open universe snapshot {self.snapshot_path}: {e}")
+            else:
+                self.snapshot_stats['loaded'] = True
+                self.snapshot_stats['signature'] = self._snapshot_signature()
+                print(f"🗺️ Mapped {len(universe)} symbols from {self.snapshot_path} in "
+                      f"{(time.perf_counter() - started) * 1000:.1f}ms")
+                return universe
+        return UniverseStore()
+    
+    def save_snapshot(self):
+        """Write the universe to the snapshot file (after each refresh cycle)"""
+        if not self.snapshot_path:
+            return
+        started = time.perf_counter()
+        size = write_snapshot(self.universe, self.snapshot_path)
+        self.snapshot_stats.update({
+            'writes': self.snapshot_stats['writes'] + 1,
+            'bytes': size,
+            'written_at': time.time(),
+            'write_seconds': round(time.perf_counter() - started, 3),
+        })
+        print(f"🗺️ Wrote universe snapshot ({len(self.universe)} symbols, {size} bytes)")
+    
+    def _snapshot_signature(self):
         try:
-            with open(csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                stocks = []
-                
-                for row in reader:
-                    try:
-                        nse_code = row.get('NSE Code', '').strip()
-                        bse_code = row.get('BSE Code', '').strip() 
-                        name = row.get('Name', '').strip()
-                        
-                        if not name:
-                            continue
-                        
-                        symbol = None
-                        if nse_code:
-                            symbol = f"{nse_code}.NS"
-                        elif bse_code:
-                            symbol = f"{bse_code}.BO"
-                        
-                        if symbol and name:
-                            stocks.append({
-                                'symbol': symbol,
-                                'name': name,
-                                'nse_code': nse_code,
-                                'bse_code': bse_code,
-                                'screener_price': float(row.get('Current Price', 0)) if row.get('Current Price') else 0,
-                                'screener_pe': float(row.get('Price to Earning', 0)) if row.get('Price to Earning') else 0,
-                                'screener_roe': float(row.get('Return on equity', 0)) if row.get('Return on equity') else 0,
-                                'screener_debt_equity': float(row.get('Debt to equity', 0)) if row.get('Debt to equity') else 0,
-                                'industry': row.get('Industry', 'Unknown'),
-                                'industry_group': row.get('Industry Group', 'Unknown')
-                            })
-                    except Exception:
-                        continue
-                
-                return stocks
-                
-        except Exception:
-            return []
+            stat = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+    
+    def reload_snapshot(self):
+        """Adopt the snapshot file if it changed since it was mapped; True if it did
+        
+        The new store gets fresh sort and range indexes and materialized
+        screens, and replaces the current state in one assignment. A
+        worker's own inline fetches that the snapshot doesn't have yet are
+        replayed onto it first, so reloading never loses them.
+        """
+        signature = self._snapshot_signature() if self.snapshot_path else None
+        if signature is None or signature == self.snapshot_stats.get('signature'):
+            return False
+        state = UniverseState(load_snapshot(self.snapshot_path))
+        with self._write_lock:
+            replayed = self._replay_local_writes(state.store)
+            if self.screens is not None:
+                state.materialize(self.screens.filters, self.indian_stocks)
+            self.state = state
+        self.snapshot_stats.update({
+            'loaded': True,
+            'signature': signature,
+            'reloads': self.snapshot_stats.get('reloads', 0) + 1,
+            'reloaded_at': time.time(),
+            'replayed_writes': replayed,
+        })
+        return True
+    
+    def _write(self, kind, symbol, record, fetched_at):
+        """Store a quote ('quote') or screening record ('screen') in the current universe"""
+        with self._write_lock:
+            state = self.state
+            if kind == 'quote':
+                state.store.update_quote(symbol, record, fetched_at=fetched_at)
+            else:
+                state.store.update_stock_data(record, fetched_at=fetched_at)
+            if self._local_writes is not None:
+                self._local_writes[(kind, symbol)] = (record, fetched_at)
+                self._local_writes.move_to_end((kind, symbol))
+                if len(self._local_writes) > LOCAL_WRITES_LIMIT:
+                    self._local_writes.popitem(last=False)
+        if state.screens is not None:
+            state.screens.update(symbol)
+    
+    def _replay_local_writes(self, universe):
+        """Apply the local writes newer than what `universe` has; returns how many were
+        
+        Writes the snapshot has caught up with are forgotten.
+        """
+        if not self._local_writes:
+            return 0
+        replayed = 0
+        for (kind, symbol), (record, fetched_at) in list(self._local_writes.items()):
+            row = universe.row_of(symbol)
+            published = universe.get(row, f'{kind}_fetched_at') if row is not None else None
+            if published is not None and published >= fetched_at:
+                del self._local_writes[(kind, symbol)]
+            elif kind == 'quote':
+                universe.update_quote(symbol, record, fetched_at=fetched_at)
+                replayed += 1
+            else:
+                universe.update_stock_data(record, fetched_at=fetched_at)
+                replayed += 1
+        return replayed
+    
+    def _watch_snapshot(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload_snapshot()
+            except Exception as e:
+                print(f"⚠️ Could not reload universe snapshot {self.snapshot_path}: {e}")
+    
+    def serve_as_refresher(self, queue):
+        """Run the refresher for serve.py workers
+        
+        Publishes the universe to the snapshot file at once and after every
+        refresh cycle; symbols the workers prioritize arrive over `queue`.
+        """
+        self.load_screener_csv()
+        self.save_snapshot()
+        
+        def forward():
+            while True:
+                self.refresher.prioritize(queue.get())
+        threading.Thread(target=forward, name='refresh-queue', daemon=True).start()
+        self.refresher.start()
+    
+    def serve_as_worker(self, queue, workers):
+        """Serve from the refresher process's snapshots (one of `workers` serve.py workers)
+        
+        Refreshes go to the refresher process over `queue`. The Yahoo rate
+        limit left over from its budget share is split between the workers
+        for the fetches that can't wait (SNAPSHOT_POLL_INTERVAL seconds
+        between snapshot checks). Inline fetches still write the worker's own
+        copy of the universe; they are replayed onto each snapshot adopted
+        until the refresher has published data at least as new.
+        """
+        self._local_writes = OrderedDict()
+        share = self.refresher.budget_share
+        self.refresher = RemoteRefresher(self, queue)
+        limiter = self.upstream.limiter
+        limiter.rate = limiter.rate * (1 - share) / workers
+        limiter.burst = max(1.0, limiter.burst / workers)
+        interval = float(os.environ.get('SNAPSHOT_POLL_INTERVAL', 5))
+        threading.Thread(target=self._watch_snapshot, args=(interval,),
+                         name='snapshot-watch', daemon=True).start()
+    
+    def _warm_from_disk(self):
+        """Load persisted records into the universe and the memory cache"""
+        now = time.time()
+        warmed = 0
+        try:
+            for key, value, fetched_at in self.disk_cache.load_all('stock_'):
+                symbol = key[len('stock_'):]
+                self._write('quote', symbol, value, fetched_at)
+                age = now - fetched_at
+                if age < self.cache.retention:
+                    self.cache.set(key, value, age=age)
+                warmed += 1
+            for key, value, fetched_at in self.disk_cache.load_all('screen_'):
+                self._write('screen', value['symbol'], value, fetched_at)
+                warmed += 1
+        except Exception as e:
+            print(f"⚠️ Could not warm from disk cache: {e}")
+        if warmed:
+            print(f"💽 Warmed {warmed} records from {self.disk_cache.path}")
+    
+    def load_screener_csv(self):
+        """Current CSV snapshot, loaded into the universe store when it changed"""
+        snapshot = self.screener_csv.load()
+        if snapshot is not None and snapshot is not self._csv_snapshot:
+            with self._csv_lock:
+                if snapshot is not self._csv_snapshot:
+                    self.universe.load_screener_csv(snapshot)
+                    self._csv_snapshot = snapshot
+        return snapshot
     
     def get_stock_data_cached(self, symbol):
-        """Get stock data with caching"""
-        current_time = datetime.now()
+        """Get stock data with caching (stale-while-revalidate)"""
         cache_key = f"stock_{symbol}"
         
-        # Check cache first
-        if cache_key in self.cache:
-            cached_data, cache_time = self.cache[cache_key]
-            if (current_time - cache_time).seconds < self.cache_timeout:
+        # Check cache first; expired entries are served while a refresh runs
+        entry = self.cache.get_entry(cache_key, allow_stale=self.stale_while_revalidate)
+        if entry is not None:
+            cached_data, age = entry
+            if age >= self.cache_timeout:
+                print(f"   ♻️ Serving stale data for {symbol} ({age:.0f}s old), refreshing in background")
+                self._schedule_refresh(symbol)
+            else:
                 print(f"   💾 Using cached data for {symbol}")
+            return cached_data
+        
+        # Then the persistent tier (survives restarts)
+        record = self.disk_cache.get(cache_key)
+        if record is not None:
+            cached_data, fetched_at = record
+            age = time.time() - fetched_at
+            if age < self.cache_timeout or (self.stale_while_revalidate and age < self.max_staleness):
+                print(f"   💽 Using disk-cached data for {symbol}")
+                self.cache.set(cache_key, cached_data, age=age)
+                self._write('quote', symbol, cached_data, fetched_at)
+                if age >= self.cache_timeout:
+                    self._schedule_refresh(symbol)
                 return cached_data
         
+        # Nothing cached, or older than the max-staleness bound: refresh inline
+        stock_data = self._fetch_stock_data(symbol)
+        if stock_data is None and self.upstream.is_open():
+            # Yahoo is failing or throttling us: short-circuit to whatever we have
+            return self._last_known_quote(cache_key)
+        return stock_data
+    
+    def _last_known_quote(self, cache_key):
+        """Most recent cached quote of any age (None -> screener.in CSV fallback)"""
+        entry = self.cache.get_entry(cache_key)
+        if entry is not None:
+            return entry[0]
+        record = self.disk_cache.get(cache_key)
+        return record[0] if record is not None else None
+    
+    def _schedule_refresh(self, symbol):
+        """Refresh `symbol` on the background executor (once at a time)"""
+        if self.refresher.running:
+            # Requested symbols go to the front of the refresher's queue
+            self.refresher.prioritize(symbol)
+            return
+        with self._refresh_lock:
+            if symbol in self._refreshing:
+                return
+            self._refreshing.add(symbol)
+        self.fetch_engine.submit(self._background_refresh, symbol, host=YAHOO_HOST)
+    
+    def _background_refresh(self, symbol):
+        try:
+            self._fetch_stock_data(symbol)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(symbol)
+    
+    def _fetch_stock_data(self, symbol):
+        """Fetch one symbol, coalescing with any identical fetch in flight"""
+        return self._inflight.do(f"stock_{symbol}", self._load_stock_data, symbol)
+    
+    def _load_stock_data(self, symbol):
+        """Fetch one symbol from Yahoo and write it to every cache tier"""
+        cache_key = f"stock_{symbol}"
+        
+        # Another caller may have just finished the same fetch
+        cached_data = self.cache.get(cache_key)
+        if cached_data is not None:
+            return cached_data
+        
         # Fetch fresh data
         try:
             print(f"   🌐 Fetching fresh data for {symbol}")
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            
-            if not info or ('regularMarketPrice' not in info and 'currentPrice' not in info):
-                return None
-            
-            price = info.get('regularMarketPrice', info.get('currentPrice', 0))
-            market_cap = info.get('marketCap', 0) / 10000000 if info.get('marketCap') else 1000.0
-            pe_ratio = info.get('trailingPE', info.get('forwardPE', 0))
-            roe = info.get('returnOnEquity', 0) * 100 if info.get('returnOnEquity') else 0
-            debt_equity = info.get('debtToEquity', 0) / 100 if info.get('debtToEquity') else 0
-            
-            stock_data = {
-                'symbol': symbol,
-                'price': price,
-                'market_cap': market_cap,
-                'pe_ratio': pe_ratio,
-                'roe': roe,
-                'debt_equity': debt_equity,
-                'sector': info.get('sector', 'Unknown'),
-                'industry': info.get('industry', 'Unknown'),
-                'volume': info.get('volume', 0),
-                'change': info.get('regularMarketChange', 0),
-                'change_percent': info.get('regularMarketChangePercent', 0),
-                '52w_high': info.get('fiftyTwoWeekHigh', 0),
-                '52w_low': info.get('fiftyTwoWeekLow', 0),
-            }
-            
-            # Cache the result
-            self.cache[cache_key] = (stock_data, current_time)
-            return stock_data
-            
+            return self._store_quote(symbol, self._fetch_info(symbol))
         except Exception as e:
             print(f"   ❌ Error fetching {symbol}: {e}")
             return None
     
-    def process_stock_batch_parallel(self, stock_batch):
+    def _store_quote(self, symbol, info):
+        """Normalize a Yahoo info dict into a quote and write every cache tier"""
+        if not info or ('regularMarketPrice' not in info and 'currentPrice' not in info):
+            return None
+        
+        price = info.get('regularMarketPrice', info.get('currentPrice', 0))
+        market_cap = info.get('marketCap', 0) / 10000000 if info.get('marketCap') else 1000.0
+        pe_ratio = info.get('trailingPE', info.get('forwardPE', 0))
+        roe = info.get('returnOnEquity', 0) * 100 if info.get('returnOnEquity') else 0
+        debt_equity = info.get('debtToEquity', 0) / 100 if info.get('debtToEquity') else 0
+        
+        stock_data = {
+            'symbol': symbol,
+            'price': price,
+            'market_cap': market_cap,
+            'pe_ratio': pe_ratio,
+            'roe': roe,
+            'debt_equity': debt_equity,
+            'sector': info.get('sector', 'Unknown'),
+            'industry': info.get('industry', 'Unknown'),
+            'volume': info.get('volume', 0),
+            'change': info.get('regularMarketChange', 0),
+            'change_percent': info.get('regularMarketChangePercent', 0),
+            '52w_high': info.get('fiftyTwoWeekHigh', 0),
+            '52w_low': info.get('fiftyTwoWeekLow', 0),
+        }
+        
+        # Cache the result
+        cache_key = f"stock_{symbol}"
+        fetched_at = time.time()
+        self.cache.set(cache_key, stock_data)
+        self.disk_cache.set(cache_key, stock_data, fetched_at=fetched_at)
+        self._write('quote', symbol, stock_data, fetched_at)
+        return stock_data
+    
+    def universe_symbols(self):
+        """Every symbol we serve: the screener.in CSV plus indian_stocks"""
+        snapshot = self.load_screener_csv()
+        csv_symbols = snapshot.symbols if snapshot is not None else []
+        return list(dict.fromkeys(csv_symbols + self.indian_stocks))
+    
+    def refresh_symbols(self, symbols):
+        """Batch-refresh quotes and screening data; returns the symbols updated"""
+        return self._store_infos(symbols, self.quote_fetcher.fetch(symbols))
+    
+    async def _refresh_symbols_async(self, symbols):
+        # On the fetch engine loop: the batches are awaited, the writes run on the executor
+        infos = await self.quote_fetcher.fetch_async(symbols)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._store_infos, symbols, infos)
+    
+    def refresh_symbols_future(self, symbols):
+        """Future of refresh_symbols(symbols), shared with identical refreshes in flight
+        
+        Awaiting it (asyncio.wrap_future()) holds no thread while Yahoo responds.
+        """
+        symbols = tuple(symbols)
+        return self._inflight.future(('refresh', symbols), self.fetch_engine.schedule,
+                                     self._refresh_symbols_async, list(symbols))
+    
+    def _store_infos(self, symbols, infos):
+        refreshed = []
+        for symbol in symbols:
+            info = infos.get(symbol)
+            if info and self._store_quote(symbol, info) is not None:
+                self._stock_data_from_info(symbol, info)
+                refreshed.append(symbol)
+        return refreshed
+    
+    def process_stock_batch_parallel(self, symbols):
         """Process stocks in parallel for better performance"""
-        print(f"🚀 Processing {len(stock_batch)} stocks in parallel...")
+        print(f"🚀 Processing {len(symbols)} stocks in parallel...")
         
-        # Use ThreadPoolExecutor for parallel processing
-        futures = []
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            for stock_info in stock_batch:
-                future = executor.submit(self._process_single_stock, stock_info)
-                futures.append(future)
+        # Fetch engine runs them concurrently, 10 second timeout per stock
+        results = self.fetch_engine.map(self._process_single_stock, symbols, host=YAHOO_HOST, timeout=10)
         
         # Collect results
         enriched_stocks = []
-        for i, future in enumerate(futures):
-            try:
-                result = future.result(timeout=10)  # 10 second timeout per stock
-                if result:
-                    enriched_stocks.append(result)
-                    print(f"   ✅ {i+1}/{len(futures)}: {result['name']}")
-            except Exception as e:
-                print(f"   ❌ {i+1}/{len(futures)}: Error - {e}")
+        for i, result in enumerate(results):
+            if result:
+                enriched_stocks.append(result)
+                print(f"   ✅ {i+1}/{len(results)}: {result['name']}")
+            else:
+                print(f"   ❌ {i+1}/{len(results)}: {symbols[i]} not available")
         
         return enriched_stocks
     
-    def _process_single_stock(self, stock_info):
+    def _process_single_stock(self, symbol):
         """Process a single stock (for parallel execution)"""
         try:
-            # Get Yahoo Finance data (cached)
-            yahoo_data = self.get_stock_data_cached(stock_info['symbol'])
-            
-            if yahoo_data:
-                price = yahoo_data['price']
-                market_cap = yahoo_data['market_cap']
-                pe_ratio = yahoo_data['pe_ratio']
-                roe = yahoo_data['roe']
-                debt_equity = yahoo_data['debt_equity']
-            else:
-                # Fallback to screener data
-                price = stock_info['screener_price']
-                market_cap = 1000.0
-                pe_ratio = stock_info['screener_pe']
-                roe = stock_info['screener_roe']
-                debt_equity = stock_info['screener_debt_equity']
+            # Refresh Yahoo Finance data (cached) into the universe store
+            self.get_stock_data_cached(symbol)
             
-            # Create enriched stock data
-            enriched_stock = {
-                'name': stock_info['name'],
-                'symbol': stock_info['symbol'],
-                'ticker': stock_info['nse_code'] or stock_info['bse_code'],
-                'industry': stock_info['industry'],
-                'industry_group': stock_info['industry_group'],
-                
-                # Yahoo Finance data (or fallback)
-                'yahoo_current_price': price,
-                'yahoo_market_cap': market_cap,
-                'yahoo_pe_ratio': pe_ratio,
-                'yahoo_roe': roe,
-                'yahoo_debt_equity': debt_equity,
-                'yahoo_52w_high': yahoo_data['52w_high'] if yahoo_data else price * 1.2,
-                'yahoo_52w_low': yahoo_data['52w_low'] if yahoo_data else price * 0.8,
-                'yahoo_volume': yahoo_data['volume'] if yahoo_data else 100000,
-                'yahoo_change': yahoo_data['change'] if yahoo_data else 0,
-                'yahoo_change_percent': yahoo_data['change_percent'] if yahoo_data else 0,
-                'yahoo_sector': yahoo_data['sector'] if yahoo_data else stock_info['industry_group'],
-                'yahoo_industry': yahoo_data['industry'] if yahoo_data else stock_info['industry'],
-                'yahoo_revenue_growth': 10.0,
-                'yahoo_earnings_growth': 8.0,
-                
-                # Screener.in data for comparison
-                'screener_price': stock_info['screener_price'],
-                'screener_pe': stock_info['screener_pe'],
-                'screener_roe': stock_info['screener_roe'],
-                'screener_debt_equity': stock_info['screener_debt_equity'],
-                
-                # Price difference analysis
-                'price_diff_percent': ((price - stock_info['screener_price']) / stock_info['screener_price'] * 100) if stock_info['screener_price'] > 0 else 0,
-                
-                'url': f'https://finance.yahoo.com/quote/{stock_info["symbol"]}'
-            }
+            universe = self.universe
+            row = universe.row_of(symbol)
+            if row is None:
+                return None
             
-            return enriched_stock
+            # Yahoo data where available, screener.in fallback otherwise
+            return universe.enriched_record(row)
             
         except Exception as e:
-            print(f"Error processing {stock_info['name']}: {e}")
+            print(f"Error processing {symbol}: {e}")
             return None
     
-    def get_your_stocks_data_paginated_optimized(self, page=1, per_page=10):
-        """Optimized paginated data fetching with caching and parallel processing"""
-        print(f"🚀 Optimized pagination: Page {page}, {per_page} per page")
-        
-        # Get all stocks from cached CSV
-        screener_stocks = self.get_screener_stocks_from_csv_cached()
-        
-        if len(screener_stocks) == 0:
-            return [], 0, 0
+    def get_your_stocks_data_paginated_optimized(self, page=1, per_page=10, sort='name', order='asc', cursor=None):
+        """Optimized paginated data fetching with caching and parallel processing
         
-        # Sort alphabetically by name
-        screener_stocks.sort(key=lambda x: x['name'].lower())
+        Pages are slices of a presorted index (see sort_index.py); pass the
+        returned next/prev cursor to keep paging through the same order.
+        Returns (stocks, total_pages, total_stocks, page_info).
+        """
+        print(f"🚀 Optimized pagination: Page {page}, {per_page} per page, sort={sort} {order}")
         
-        # Calculate pagination
-        total_stocks = len(screener_stocks)
+        state = self.state
+        page_rows, page_info = self._page_rows(page, per_page, sort, order, cursor, state)
+        if page_info is None:
+            return [], 0, 0, {}
+        total_stocks = page_info['total']
         total_pages = (total_stocks + per_page - 1) // per_page
-        start_idx = (page - 1) * per_page
-        end_idx = min(start_idx + per_page, total_stocks)
         
         # Get current page stocks
-        page_stocks = screener_stocks[start_idx:end_idx]
+        page_symbols = [state.store.symbols[row] for row in page_rows]
         
-        print(f"📋 Processing stocks {start_idx+1}-{end_idx} of {total_stocks}")
+        print(f"📋 Processing stocks {page_info['start']+1}-{page_info['end']} of {total_stocks}")
         
         # Process in parallel for better performance
-        enriched_stocks = self.process_stock_batch_parallel(page_stocks)
+        enriched_stocks = self.process_stock_batch_parallel(page_symbols)
+        
+        # The sort column shows the values the snapshot was ordered by: a
+        # quote fetched for this page since may differ, and showing it would
+        # break the order the cursor pages through (it shows from the next
+        # snapshot on)
+        sort_field = SORT_KEY_FIELDS.get(page_info['sort'])
+        if sort_field:
+            ordered_by = dict(zip(page_symbols, page_info['values']))
+            for stock in enriched_stocks:
+                stock[sort_field] = ordered_by[stock['symbol']]
         
         print(f"🎉 Optimized result: {len(enriched_stocks)} stocks processed")
-        return enriched_stocks, total_pages, total_stocks
+        return enriched_stocks, total_pages, total_stocks, page_info
+    
+    def _page_rows(self, page, per_page, sort, order, cursor, state):
+        """(rows of state.store, page_info) of a your-stocks page, or (None, None) without CSV stocks"""
+        # Make sure the current CSV is loaded into the store
+        self.load_screener_csv()
+        csv_rows = state.store.csv_rows
+        if len(csv_rows) == 0:
+            return None, None
+        return state.sort_indexes.page(csv_rows, per_page, key=sort, order=order, cursor=cursor, page=page)
+    
+    def page_version(self, page, per_page, sort, order, cursor):
+        """Changes whenever what a your-stocks page shows may have: its rows, their quotes or its sort snapshot
+
+        None for a page that can't be served (bad sort key or cursor).
+        """
+        state = self.state
+        try:
+            page_rows, page_info = self._page_rows(page, per_page, sort, order, cursor, state)
+        except ValueError:
+            return None
+        universe = state.store
+        if page_rows is None:
+            return universe.epoch, universe.csv_generation
+        fetched_at = np.nan_to_num(universe.column('quote_fetched_at', page_rows), nan=-1.0)
+        # The sort column shows the values of the snapshot the page is sliced from
+        return (universe.epoch, universe.csv_generation, page_info['snapshot'],
+                tuple(page_rows.tolist()), tuple(fetched_at.tolist()))
+    
+    def _quote_missing(self, symbol):
+        """True when get_stock_data_cached(symbol) would fetch inline"""
+        cache_key = f"stock_{symbol}"
+        if self.cache.get_entry(cache_key, allow_stale=self.stale_while_revalidate) is not None:
+            return False
+        record = self.disk_cache.get(cache_key)
+        if record is None:
+            return True
+        age = time.time() - record[1]
+        return not (age < self.cache_timeout or (self.stale_while_revalidate and age < self.max_staleness))
+    
+    # Async preparation for the ASGI routes (see asgi.py): each one awaits
+    # the upstream fetches a route would otherwise make inline, so that the
+    # route then renders from warm data
+    
+    async def prepare_page(self, page=1, per_page=10, sort='name', order='asc', cursor=None):
+        """Fetch the quotes a your-stocks page is missing"""
+        loop = asyncio.get_running_loop()
+        state = self.state
+        page_rows, _ = await loop.run_in_executor(self.executor, self._page_rows, page, per_page, sort, order,
+                                                  cursor, state)
+        if page_rows is None:
+            return
+        symbols = [state.store.symbols[row] for row in page_rows]
+        missing = await loop.run_in_executor(
+            self.executor, lambda: [symbol for symbol in symbols if self._quote_missing(symbol)])
+        if missing:
+            await _await_shared(self.refresh_symbols_future(missing))
+    
+    async def prepare_screen_data(self):
+        """Async counterpart of _ensure_screen_data()"""
+        if not self.refresher.running and self._screen_data_stale():
+            await _await_shared(self.refresh_symbols_future(self.indian_stocks))
+    
+    async def prepare_stock(self, symbol):
+        """Fetch `symbol` for get_stock_details() unless the store has it"""
+        universe = self.universe
+        row = universe.row_of(symbol)
+        if row is None or not universe.has_quote(row):
+            await _await_shared(self._inflight.future(
+                f"screen_{symbol}", self.fetch_engine.submit, self._load_screen_data, symbol, host=YAHOO_HOST))
     
     def get_stock_data(self, symbol):
         """Get comprehensive stock data from Yahoo Finance with historical growth metrics"""
+        return self._inflight.do(f"screen_{symbol}", self._load_screen_data, symbol)
+    
+    def _load_screen_data(self, symbol):
+        try:
+            stock = yahoo_ticker(symbol)
+            return self._stock_data_from_info(symbol, self.upstream.call(getattr, stock, 'info'))
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+            return None
+    
+    def _stock_data_from_info(self, symbol, info):
+        """Normalize a Yahoo info dict into screening fields and store it"""
         try:
-            # Create session with SSL fix
-            session = requests.Session()
-            session.verify = False
-            
-            stock = yf.Ticker(symbol, session=session)
-            info = stock.info
-            
             # Skip if no basic data available
             if not info or 'regularMarketPrice' not in info and 'currentPrice' not in info:
                 print(f"No price data for {symbol}")
@@ -348,7 +668,7 @@ class YahooFinanceScreener:
             revenue_growth = info.get('revenueGrowth', 0) * 100 if info.get('revenueGrowth') else 0
             
             # Extract all the financial ratios we need
-            return {
+            stock_data = {
                 'name': info.get('longName', info.get('shortName', symbol)),
                 'ticker': symbol.replace('.NS', ''),
                 'symbol': symbol,
@@ -379,193 +699,160 @@ class YahooFinanceScreener:
                 'fii_holding': 15 if market_cap > 1000 else 5,  # Large caps have more FII
                 'dii_holding': 10 if market_cap > 1000 else 3   # Large caps have more DII
             }
+            fetched_at = time.time()
+            self._write('screen', symbol, stock_data, fetched_at)
+            self.disk_cache.set(f"screen_{symbol}", stock_data, fetched_at=fetched_at)
+            return stock_data
         except Exception as e:
-            print(f"Error fetching data for {symbol}: {e}")
+            print(f"Error normalizing data for {symbol}: {e}")
             return None
     
+    def get_stock_details(self, symbol):
+        """Detail lookup served from the universe store, fetching on a miss"""
+        universe = self.universe
+        row = universe.row_of(symbol)
+        if row is not None and universe.has_quote(row):
+            return universe.stock_record(row)
+        return self.get_stock_data(symbol)
+    
     def screen_stocks_by_criteria(self, criteria):
         """Screen stocks with REAL filtering based on actual financial data"""
-        screened_stocks = []
-        
         print(f"Screening {len(self.indian_stocks)} stocks with criteria: {criteria}")
         
+        # Many symbols per round trip instead of one Ticker.info call each;
+        # screens running at the same time share a single batch fetch
+        symbols = tuple(self.indian_stocks)
+        infos = self._inflight.do(('batch', symbols), self.quote_fetcher.fetch, symbols)
+        
+        fetched_symbols = []
         for symbol in self.indian_stocks:
-            try:
-                stock_data = self.get_stock_data(symbol)
-                if not stock_data:
-                    continue
-                
-                # Apply REAL filtering
-                if self.meets_criteria(stock_data, criteria):
-                    screened_stocks.append(stock_data)
-                    print(f"✓ {stock_data['name']} passed filter")
-                else:
-                    print(f"✗ {stock_data['name']} failed filter")
-                
-                # Small delay to be respectful
-                time.sleep(0.3)
-                
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-                continue
+            # _stock_data_from_info() writes straight into the universe store
+            if symbol in infos and self._stock_data_from_info(symbol, infos[symbol]):
+                fetched_symbols.append(symbol)
+        
+        state = self.state
+        universe = state.store
+        if self.upstream.is_open():
+            # Circuit open: screen on the last known data for every symbol
+            print(f"⛔ Yahoo circuit open - screening cached universe data")
+            fetched_symbols = [s for s in self.indian_stocks
+                               if s in universe.symbol_index and
+                               universe.has_quote(universe.symbol_index[s])]
+        
+        # Apply REAL filtering via the range indexes (only candidate rows are evaluated)
+        rows = universe.rows_for(fetched_symbols)
+        # Membership test rather than a mask sized now: rows appended by
+        # concurrent writers may be among the candidates
+        passed = state.range_indexes.select(compile_criteria(criteria),
+                                            accept=lambda candidates: np.isin(candidates, rows))
+        # Keep the indian_stocks order
+        passed = rows[np.isin(rows, passed)]
+        screened_stocks = [universe.stock_record(row) for row in passed]
+        print(f"✓ {len(screened_stocks)}/{len(rows)} stocks passed filter")
         
         return screened_stocks
     
+    def materialize_screens(self, filters):
+        """Maintain the results of `filters` over indian_stocks from now on"""
+        with self._write_lock:
+            screens = self.state.materialize(filters, self.indian_stocks)
+        print(f"🧮 Materialized {len(filters)} screens over {screens.eligible_count()} stocks with data")
+    
+    def screen_results(self, filter_name):
+        """Current members of a materialized screen
+        
+        Without the background refresher, stale or missing data is refreshed
+        in one batch first; every refreshed record updates the screens.
+        """
+        self._ensure_screen_data()
+        return self.screens.results(filter_name)
+    
+    def screen_version(self, filter_name):
+        """Version of a materialized screen's results, after screen_results()'s refresh"""
+        self._ensure_screen_data()
+        return self.screens.version(filter_name)
+    
+    def _ensure_screen_data(self):
+        if not self.refresher.running and self._screen_data_stale():
+            symbols = tuple(self.indian_stocks)
+            self._inflight.do(('refresh', symbols), self.refresh_symbols, list(symbols))
+    
+    def rank_stocks(self, sort, k, filter_name=None, criteria=None):
+        """Top `k` stocks by `sort` among a predefined screen or custom criteria
+        
+        Returns (ranked records, number of stocks that passed the screen).
+        """
+        keys = parse_sort(sort)
+        self._ensure_screen_data()
+        state = self.state
+        if filter_name is not None:
+            rows = state.screens.member_rows(filter_name)
+        else:
+            rows = state.range_indexes.select(compile_criteria(criteria or {}), accept=state.screens.accept)
+        ranked = []
+        for rank, row in enumerate(top_k_rows(state.store, rows, keys, k), start=1):
+            record = state.store.stock_record(row)
+            record['rank'] = rank
+            ranked.append(record)
+        return ranked, len(rows)
+    
+    def _screen_data_stale(self):
+        universe = self.universe
+        rows = universe.rows_for(self.indian_stocks)
+        if len(rows) < len(self.indian_stocks):
+            return True
+        fetched_at = universe.column('screen_fetched_at', rows)
+        return bool(np.any(np.isnan(fetched_at) | (time.time() - fetched_at >= self.cache_timeout)))
+    
+    def iter_screen_stocks_by_criteria(self, criteria, progress=None):
+        """Like screen_stocks_by_criteria(), yielding passing stocks batch by batch
+        
+        Provider batches are fetched concurrently and each one is screened as
+        soon as it arrives, so the first results are out after roughly one
+        round trip. `progress` (a dict) receives the number of stocks checked.
+        """
+        compiled = compile_criteria(criteria)
+        progress = progress if progress is not None else {}
+        progress['checked'] = 0
+        
+        if self.upstream.is_open():
+            print(f"⛔ Yahoo circuit open - screening cached universe data")
+            universe = self.universe
+            rows = np.array([row for row in universe.rows_for(self.indian_stocks)
+                             if universe.has_quote(row)], dtype=np.int64)
+            progress['checked'] = len(rows)
+            if len(rows):
+                for row in rows[compiled.mask(universe.view(rows))]:
+                    yield universe.stock_record(row)
+            return
+        
+        for infos in self.quote_fetcher.iter_batches(self.indian_stocks):
+            symbols = [s for s, info in infos.items() if self._stock_data_from_info(s, info)]
+            universe = self.universe
+            rows = universe.rows_for(symbols)
+            progress['checked'] += len(rows)
+            if len(rows):
+                for row in rows[compiled.mask(universe.view(rows))]:
+                    yield universe.stock_record(row)
+    
     def meets_criteria(self, stock_data, criteria):
         """REAL filtering based on actual financial ratios - ALL 11 CRITERIA"""
         try:
-            # 1. Market Cap filter (> 200 Cr)
-            if 'marketCap' in criteria:
-                market_cap = stock_data.get('marketCap', 0)
-                if 'min' in criteria['marketCap'] and market_cap < criteria['marketCap']['min']:
-                    return False
-                if 'max' in criteria['marketCap'] and market_cap > criteria['marketCap']['max']:
-                    return False
-            
-            # 2. ROE filter (> 14%)
-            if 'roe' in criteria:
-                roe = stock_data.get('roe', 0)
-                if 'min' in criteria['roe'] and roe < criteria['roe']['min']:
-                    return False
-            
-            # 3. ROE Growth filter (ROE > ROE preceding year)
-            if 'roe_growth' in criteria:
-                roe_growth = stock_data.get('roe_growth', 0)
-                if 'min' in criteria['roe_growth'] and roe_growth < criteria['roe_growth']['min']:
-                    return False
-            
-            # 4. OPM Growth filter (OPM last year > OPM preceding year)
-            if 'opm_growth' in criteria:
-                omp_growth = stock_data.get('omp_growth', 0)
-                if 'min' in criteria['opm_growth'] and omp_growth < criteria['omp_growth']['min']:
-                    return False
-            
-            # 5. Debt to Equity filter (< 1)
-            if 'debtToEquity' in criteria:
-                debt_ratio = stock_data.get('debtToEquity', 0)
-                if 'max' in criteria['debtToEquity'] and debt_ratio > criteria['debtToEquity']['max']:
-                    return False
-            
-            # 6. Pledged Percentage filter (= 0)
-            if 'pledged_percent' in criteria:
-                pledged_percent = stock_data.get('pledged_percent', 0)
-                if 'max' in criteria['pledged_percent'] and pledged_percent > criteria['pledged_percent']['max']:
-                    return False
-            
-            # 7. PAT Growth filter (PAT > PAT last year)
-            if 'pat_growth' in criteria:
-                pat_growth = stock_data.get('pat_growth', 0)
-                if 'min' in criteria['pat_growth'] and pat_growth < criteria['pat_growth']['min']:
-                    return False
-            
-            # 8. Sales Growth filter (Sales > Sales last year)
-            if 'sales_growth' in criteria:
-                sales_growth = stock_data.get('salesGrowth', 0)  # Use existing field
-                if sales_growth == 0:  # Try alternative field name
-                    sales_growth = stock_data.get('sales_growth', 0)
-                if 'min' in criteria['sales_growth'] and sales_growth < criteria['sales_growth']['min']:
-                    return False
-            
-            # 9. Promoter Holding Change filter (>= 0)
-            if 'promoter_holding_change' in criteria:
-                promoter_change = stock_data.get('promoter_holding_change', 0)
-                if 'min' in criteria['promoter_holding_change'] and promoter_change < criteria['promoter_holding_change']['min']:
-                    return False
-            
-            # 10. Average ROE 5 Years filter (> 14%)
-            if 'avg_roe_5y' in criteria:
-                avg_roe_5y = stock_data.get('avg_roe_5y', 0)
-                if 'min' in criteria['avg_roe_5y'] and avg_roe_5y < criteria['avg_roe_5y']['min']:
-                    return False
-            
-            # 11. Institutional Holding filter (FII > 0 OR DII > 0)
-            if 'institutional_holding' in criteria:
-                fii_holding = stock_data.get('fii_holding', 0)
-                dii_holding = stock_data.get('dii_holding', 0)
-                if 'min' in criteria['institutional_holding']:
-                    min_required = criteria['institutional_holding']['min']
-                    if not (fii_holding > min_required or dii_holding > min_required):
-                        return False
-            
-            return True  # All criteria passed
-            
+            return compile_criteria(criteria).matches(stock_data)
         except Exception as e:
             print(f"Error in criteria check: {e}")
             return False
     
     def get_screener_stocks_from_csv(self):
         """Read stocks from your screener.in CSV file"""
-        # Try multiple possible paths
-        possible_paths = [
-            '/Users/prashanthbandlamudi/Desktop/personalWork/stock-insights/filter-conditions/stock-filter-criteria.csv',
-            '/Users/prashanthbandlamudi/Desktop/personalWork/stock-insights/stock-filter-criteria.csv',
-            './filter-conditions/stock-filter-criteria.csv',
-            './stock-filter-criteria.csv'
-        ]
-        
-        csv_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                csv_path = path
-                print(f"✅ Found CSV file at: {path}")
-                break
-        
-        if not csv_path:
-            print(f"❌ CSV file not found in any of these locations:")
-            for path in possible_paths:
-                print(f"   - {path}")
-            return []
-        
-        try:
-            with open(csv_path, 'r', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                stocks = []
-                
-                print(f"📊 Reading CSV file: {csv_path}")
-                
-                for i, row in enumerate(reader):
-                    try:
-                        nse_code = row.get('NSE Code', '').strip()
-                        bse_code = row.get('BSE Code', '').strip() 
-                        name = row.get('Name', '').strip()
-                        
-                        if not name:
-                            continue
-                        
-                        # Prefer NSE code, fallback to BSE code
-                        symbol = None
-                        if nse_code:
-                            symbol = f"{nse_code}.NS"
-                        elif bse_code:
-                            symbol = f"{bse_code}.BO"  # BSE symbols end with .BO
-                        
-                        if symbol and name:
-                            stocks.append({
-                                'symbol': symbol,
-                                'name': name,
-                                'nse_code': nse_code,
-                                'bse_code': bse_code,
-                                'screener_price': float(row.get('Current Price', 0)) if row.get('Current Price') else 0,
-                                'screener_pe': float(row.get('Price to Earning', 0)) if row.get('Price to Earning') else 0,
-                                'screener_roe': float(row.get('Return on equity', 0)) if row.get('Return on equity') else 0,
-                                'screener_debt_equity': float(row.get('Debt to equity', 0)) if row.get('Debt to equity') else 0,
-                                'industry': row.get('Industry', 'Unknown'),
-                                'industry_group': row.get('Industry Group', 'Unknown')
-                            })
-                            
-                            if i < 5:  # Debug first 5 stocks
-                                print(f"   � Stock {i+1}: {name} -> {symbol}")
-                        
-                    except Exception as e:
-                        print(f"❌ Error processing row {i}: {e}")
-                        continue
-                
-                print(f"✅ Loaded {len(stocks)} stocks from CSV")
-                return stocks
-                
-        except Exception as e:
-            print(f"❌ Error reading CSV file: {e}")
+        snapshot = self.load_screener_csv()
+        if snapshot is None:
+            if self.screener_csv.path() is None:
+                print(f"❌ CSV file not found in any of these locations:")
+                for path in self.screener_csv.paths:
+                    print(f"   - {path}")
             return []
+        return snapshot.stocks
     
     def get_your_stocks_data_paginated(self, page=1, per_page=10):
         """Get paginated real-time data for your screener.in stocks with alphabetical ordering"""
@@ -580,7 +867,7 @@ class YahooFinanceScreener:
             return [], 0, 0
         
         # Sort alphabetically by name
-        screener_stocks.sort(key=lambda x: x['name'].lower())
+        screener_stocks = sorted(screener_stocks, key=lambda x: x['name'].lower())
         print(f"🔤 Sorted {len(screener_stocks)} stocks alphabetically")
         
         # Calculate pagination
@@ -595,6 +882,11 @@ class YahooFinanceScreener:
         print(f"📋 Page {page}/{total_pages}: Processing stocks {start_idx+1}-{end_idx} of {total_stocks}")
         print(f"🎯 Current page stocks: {[s['name'] for s in page_stocks]}")
         
+        # Fetch the whole page concurrently instead of one symbol at a time
+        page_infos = self.fetch_engine.fetch_many(
+            self._fetch_info, [s['symbol'] for s in page_stocks], host=YAHOO_HOST
+        )
+        
         enriched_stocks = []
         
         for i, stock_info in enumerate(page_stocks):
@@ -603,8 +895,9 @@ class YahooFinanceScreener:
                 
                 # Try to get basic info from Yahoo Finance
                 try:
-                    stock = yf.Ticker(stock_info['symbol'])
-                    info = stock.info
+                    info = page_infos.get(stock_info['symbol'])
+                    if info is None:
+                        raise ValueError('no data returned')
                     
                     # Get price and basic metrics
                     price = info.get('regularMarketPrice', info.get('currentPrice', 0))
@@ -669,9 +962,6 @@ class YahooFinanceScreener:
                 enriched_stocks.append(enriched_stock)
                 print(f"   ✅ Added: {stock_info['name']} - ₹{price}")
                 
-                # Small delay to be respectful to APIs
-                time.sleep(0.2)
-                
             except Exception as e:
                 print(f"   💥 Error processing {stock_info['name']}: {e}")
                 continue
@@ -679,6 +969,10 @@ class YahooFinanceScreener:
         print(f"\n🎉 Page {page} result: {len(enriched_stocks)} stocks processed successfully")
         return enriched_stocks, total_pages, total_stocks
 
+    def _fetch_info(self, symbol):
+        """Raw Yahoo info dict for one symbol (rate limited, circuit protected)"""
+        return self.upstream.call(getattr, yahoo_ticker(symbol), 'info')
+    
     def get_fallback_stocks(self):
         """Fallback data when APIs are unavailable"""
         return [
@@ -832,10 +1126,15 @@ class YahooFinanceScreener:
 # Flask REST API setup
 app = Flask(__name__)
 CORS(app, origins=["*"])
+# orjson encoding for jsonify() when it is installed
+app.json = FastJSONProvider(app)
 
 # Initialize screener instance
 screener = YahooFinanceScreener()
 
+# Serialized + compressed responses with ETags (RESPONSE_CACHE_TTL, RESPONSE_CACHE_ENTRIES)
+responses = ResponseCache.from_env()
+
 # Predefined filter sets for quick access
 PREDEFINED_FILTERS = {
     'your_custom_criteria': {
@@ -866,6 +1165,9 @@ PREDEFINED_FILTERS = {
     }
 }
 
+# Serve predefined screens from maintained result sets
+screener.materialize_screens(PREDEFINED_FILTERS)
+
 @app.route('/api/test/sample-stocks', methods=['GET'])
 def test_sample_stocks():
     """Test endpoint with sample stock data to verify frontend display"""
@@ -931,7 +1233,7 @@ def test_sample_stocks():
         'data': {
             'title': 'Sample Test Stocks',
             'description': 'Test data to verify frontend display',
-            'stocks': sample_stocks,
+            'stocks': project_records(sample_stocks, requested_fields(request)),
             'total': len(sample_stocks),
             'data_sources': ['Test Data'],
             'comparison_available': True,
@@ -955,6 +1257,65 @@ def test_csv_reading():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def your_stocks_response(page, per_page, sort, order, cursor, fields=None):
+    """JSON response for one your-stocks page"""
+    print(f"📊 Optimized request: page={page}, per_page={per_page}, sort={sort}, order={order}")
+    start_time = time.time()
+    
+    # Get optimized paginated data
+    try:
+        stocks_data, total_pages, total_stocks, page_info = screener.get_your_stocks_data_paginated_optimized(
+            page, per_page, sort=sort, order=order, cursor=cursor)
+    except ValueError as e:  # unknown sort key / order, bad cursor
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    if cursor and page_info:
+        page = page_info['start'] // per_page + 1
+    showing_from = page_info.get('start', 0) + 1
+    showing_to = page_info.get('end', 0)
+    
+    processing_time = time.time() - start_time
+    print(f"✅ Processed {len(stocks_data)} stocks in {processing_time:.2f} seconds")
+    
+    response_data = {
+        'status': 'success',
+        'data': {
+            'title': f'Your Screener.in Stocks - Page {page}/{total_pages}',
+            'description': f'{len(stocks_data)} stocks from your screener.in filter (Optimized)',
+            'stocks': project_records(stocks_data, fields),
+            'total': len(stocks_data),
+            'pagination': {
+                'current_page': page,
+                'per_page': per_page,
+                'total_pages': total_pages,
+                'total_stocks': total_stocks,
+                'has_prev': showing_from > 1,
+                'has_next': showing_to < total_stocks,
+                'prev_page': page - 1 if page > 1 else None,
+                'next_page': page + 1 if page < total_pages else None,
+                'showing_from': showing_from,
+                'showing_to': showing_to,
+                'sort': page_info.get('sort', sort),
+                'order': page_info.get('order', order),
+                'next_cursor': page_info.get('next_cursor'),
+                'prev_cursor': page_info.get('prev_cursor')
+            },
+            'performance': {
+                'processing_time': f"{processing_time:.2f}s",
+                'cached_data': True,
+                'parallel_processing': True,
+                'max_data_age': max((s['data_age'] for s in stocks_data if s['data_age'] is not None), default=None),
+                'stale_stocks': sum(1 for s in stocks_data
+                                    if s['data_age'] is not None and s['data_age'] >= screener.cache_timeout)
+            },
+            'data_sources': ['Screener.in CSV (Cached)', 'Yahoo Finance (Cached + Live)'],
+            'comparison_available': True,
+            'timestamp': datetime.now().isoformat()
+        }
+    }
+    
+    print(f"🎉 Optimized response ready in {processing_time:.2f}s")
+    return jsonify(response_data)
+
 @app.route('/api/screener/your-stocks', methods=['GET'])
 def get_your_screener_stocks():
     """Get paginated real-time data with performance optimizations"""
@@ -964,48 +1325,16 @@ def get_your_screener_stocks():
         # Get pagination parameters
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
+        sort = request.args.get('sort', 'name')
+        order = request.args.get('order', 'asc')
+        cursor = request.args.get('cursor')
+        fields = requested_fields(request)
         
-        print(f"📊 Optimized request: page={page}, per_page={per_page}")
-        start_time = time.time()
-        
-        # Get optimized paginated data
-        stocks_data, total_pages, total_stocks = screener.get_your_stocks_data_paginated_optimized(page, per_page)
-        
-        processing_time = time.time() - start_time
-        print(f"✅ Processed {len(stocks_data)} stocks in {processing_time:.2f} seconds")
-        
-        response_data = {
-            'status': 'success',
-            'data': {
-                'title': f'Your Screener.in Stocks - Page {page}/{total_pages}',
-                'description': f'{len(stocks_data)} stocks from your screener.in filter (Optimized)',
-                'stocks': stocks_data,
-                'total': len(stocks_data),
-                'pagination': {
-                    'current_page': page,
-                    'per_page': per_page,
-                    'total_pages': total_pages,
-                    'total_stocks': total_stocks,
-                    'has_prev': page > 1,
-                    'has_next': page < total_pages,
-                    'prev_page': page - 1 if page > 1 else None,
-                    'next_page': page + 1 if page < total_pages else None,
-                    'showing_from': (page - 1) * per_page + 1,
-                    'showing_to': min(page * per_page, total_stocks)
-                },
-                'performance': {
-                    'processing_time': f"{processing_time:.2f}s",
-                    'cached_data': True,
-                    'parallel_processing': True
-                },
-                'data_sources': ['Screener.in CSV (Cached)', 'Yahoo Finance (Cached + Live)'],
-                'comparison_available': True,
-                'timestamp': datetime.now().isoformat()
-            }
-        }
-        
-        print(f"🎉 Optimized response ready in {processing_time:.2f}s")
-        return jsonify(response_data)
+        # Serialized once per version of the page's rows and their quotes;
+        # the render fetches missing quotes, so the key is taken again after it
+        return responses.respond(('your-stocks', page, per_page, sort, order, cursor, fields),
+                                 lambda: screener.page_version(page, per_page, sort, order, cursor),
+                                 lambda: your_stocks_response(page, per_page, sort, order, cursor, fields))
         
     except Exception as e:
         print(f"💥 ERROR: {e}")
@@ -1015,50 +1344,121 @@ def get_your_screener_stocks():
 
 @app.route('/api/screener/preload-cache', methods=['POST'])
 def preload_cache():
-    """Preload cache for better performance"""
-    print(f"� Preloading cache for better performance...")
+    """Start the background refresher that keeps the whole universe warm"""
+    print(f"🔄 Starting background universe refresh...")
     
     try:
         start_time = time.time()
-        
-        # Get all stocks
-        stocks = screener.get_screener_stocks_from_csv_cached()
-        
-        # Preload first 20 stocks in background
-        sample_stocks = stocks[:20]
-        
-        def background_preload():
-            for stock in sample_stocks:
-                try:
-                    screener.get_stock_data_cached(stock['symbol'])
-                    time.sleep(0.1)  # Small delay
-                except:
-                    continue
-        
-        # Start background thread
-        thread = threading.Thread(target=background_preload)
-        thread.daemon = True
-        thread.start()
-        
+        started = screener.refresher.start()
+        total = len(screener.universe_symbols())
         preload_time = time.time() - start_time
         
         return jsonify({
             'status': 'success',
-            'message': f'Cache preload started for {len(sample_stocks)} stocks',
-            'preload_time': f"{preload_time:.2f}s"
+            'message': (f'Background refresh started for {total} stocks' if started
+                        else f'Background refresh already running for {total} stocks'),
+            'preload_time': f"{preload_time:.2f}s",
+            'refresh': screener.refresher.stats()
         })
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/screener/refresh-status', methods=['GET'])
+def refresh_status():
+    """Refresh cycle progress and data freshness across the universe"""
+    try:
+        return jsonify({'status': 'success', 'data': screener.refresher.stats()})
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'OK',
         'message': 'Stock Screener API is running',
+        'cache': screener.cache.stats(),
+        'disk_cache_records': len(screener.disk_cache),
+        'inflight': screener._inflight.stats(),
+        'fetch_engine': screener.fetch_engine.stats(),
+        'upstream': screener.upstream.stats(),
+        'refresher': screener.refresher.stats(),
+        'screens': screener.screens.stats(),
+        'range_indexes': screener.range_indexes.stats(),
+        'screener_csv': screener.screener_csv.stats(),
+        'snapshot': screener.snapshot_stats,
+        'responses': responses.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+@app.route('/api/stock/<ticker>', methods=['GET'])
+def get_stock_details(ticker):
+    """Get detailed information for a specific stock"""
+    try:
+        symbol = ticker if '.' in ticker else f"{ticker}.NS"
+        stock_data = screener.get_stock_details(symbol)
+        
+        if not stock_data:
+            return jsonify({'status': 'error', 'message': f'Stock data not found for {ticker}'}), 404
+        
+        return jsonify({'status': 'success', 'data': project(stock_data, requested_fields(request))})
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def stream_predefined_filter(filter_name, fmt, fields=None):
+    """Stream a predefined screen: the materialized set when it is current,
+    otherwise a live screen that emits each batch as it is evaluated"""
+    filter_set = PREDEFINED_FILTERS[filter_name]
+    criteria = filter_set['criteria']
+    progress = {}
+    
+    if screener.refresher.running or not screener._screen_data_stale():
+        stocks = screener.screens.results(filter_name)
+        progress['checked'] = len(screener.indian_stocks)
+        data_source = 'Yahoo Finance (Real-time, materialized)'
+    else:
+        stocks = screener.iter_screen_stocks_by_criteria(criteria, progress)
+        data_source = 'Yahoo Finance (Real-time, streamed)'
+    
+    return stream_stocks(fmt, stocks, fields=fields, trailer=lambda: {
+        'filter_name': filter_set['name'],
+        'description': filter_set['description'],
+        'total_checked': progress['checked'],
+        'criteria': criteria,
+        'criteria_count': len(criteria),
+        'data_source': data_source,
         'timestamp': datetime.now().isoformat()
     })
 
+def predefined_filter_response(filter_name, fields=None):
+    """JSON response with the current members of a predefined screen"""
+    filter_set = PREDEFINED_FILTERS[filter_name]
+    criteria = filter_set['criteria']
+    
+    # Materialized result set, kept current as Yahoo data is refreshed
+    filtered_stocks = screener.screen_results(filter_name)
+    universe = screener.universe
+    
+    print(f"🎉 Final result: {len(filtered_stocks)} stocks passed ALL {len(criteria)} filters")
+    
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'filter_name': filter_set['name'],
+            'description': filter_set['description'],
+            'stocks': project_records(filtered_stocks, fields),
+            'total': len(filtered_stocks),
+            'total_checked': len(screener.indian_stocks),
+            'criteria': criteria,
+            'criteria_count': len(criteria),
+            'data_source': 'Yahoo Finance (Real-time, materialized)',
+            'max_data_age': max((universe.data_age(universe.row_of(s['symbol']), field='screen_fetched_at') or 0
+                                 for s in filtered_stocks), default=None),
+            'timestamp': datetime.now().isoformat()
+        }
+    })
+
 @app.route('/api/screener/screen/<filter_name>', methods=['GET'])
 def screen_with_predefined_filter(filter_name):
     print(f"🔍 Received request for filter: {filter_name}")
@@ -1073,23 +1473,91 @@ def screen_with_predefined_filter(filter_name):
         print(f"✅ Using filter: {filter_set['name']}")
         print(f"🎯 Checking {len(screener.indian_stocks)} stocks...")
         
-        # ALWAYS USE REAL-TIME DATA - NO FALLBACK
-        print("🌐 Using REAL Yahoo Finance data...")
-        filtered_stocks = screener.screen_stocks_by_criteria(criteria)
+        fields = requested_fields(request)
+        fmt = stream_format(request)
+        if fmt:
+            return stream_predefined_filter(filter_name, fmt, fields)
         
-        print(f"🎉 Final result: {len(filtered_stocks)} stocks passed ALL {len(criteria)} filters")
+        # Serialized once per version of the screen's results
+        return responses.respond(('screen', filter_name, fields), screener.screen_version(filter_name),
+                                 lambda: predefined_filter_response(filter_name, fields))
+        
+    except Exception as e:
+        print(f"💥 Error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def _ranking_k(value):
+    """k from a query string or JSON body, capped at MAX_K; ValueError unless a positive integer"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f"k must be a positive integer, got {value!r}")
+    return min(value, MAX_K)
+
+@app.route('/api/screener/screen/<filter_name>/top', methods=['GET'])
+def top_stocks_for_filter(filter_name):
+    """Top K stocks of a predefined screen, e.g. ?k=25&sort=roe:desc,marketCap:desc"""
+    try:
+        if filter_name not in PREDEFINED_FILTERS:
+            return jsonify({'status': 'error', 'message': f'Filter not found'}), 404
+        
+        filter_set = PREDEFINED_FILTERS[filter_name]
+        sort = request.args.get('sort', 'roe:desc')
+        try:
+            k = _ranking_k(request.args.get('k', DEFAULT_K))
+            stocks, passed = screener.rank_stocks(sort, k, filter_name=filter_name)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
         
         return jsonify({
             'status': 'success',
             'data': {
                 'filter_name': filter_set['name'],
                 'description': filter_set['description'],
-                'stocks': filtered_stocks,
-                'total': len(filtered_stocks),
-                'total_checked': len(screener.indian_stocks),
+                'stocks': project_records(stocks, requested_fields(request)),
+                'total': len(stocks),
+                'total_passed': passed,
+                'k': k,
+                'sort': sort,
+                'criteria': filter_set['criteria'],
+                'timestamp': datetime.now().isoformat()
+            }
+        })
+        
+    except Exception as e:
+        print(f"💥 Error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@app.route('/api/screener/rank', methods=['POST'])
+def rank_stocks():
+    """Top K stocks passing custom criteria: {"criteria": {...}, "sort": "roe:desc", "k": 25}"""
+    try:
+        data = request.get_json() or {}
+        if not isinstance(data, dict):
+            return jsonify({'status': 'error', 'message': 'Request body must be a JSON object'}), 400
+        criteria = data.get('criteria')
+        if criteria is None:
+            criteria = {}
+        sort = data.get('sort', 'roe:desc')
+        try:
+            if not isinstance(criteria, dict):
+                raise ValueError('criteria must be an object of {field: {"min": ..., "max": ...}}')
+            if not isinstance(sort, str):
+                raise ValueError("sort must be a string such as 'roe:desc,marketCap'")
+            k = _ranking_k(data.get('k', DEFAULT_K))
+            stocks, passed = screener.rank_stocks(sort, k, criteria=criteria)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'data': {
+                'stocks': project_records(stocks, requested_fields(request, data)),
+                'total': len(stocks),
+                'total_passed': passed,
+                'k': k,
+                'sort': sort,
                 'criteria': criteria,
-                'criteria_count': len(criteria),
-                'data_source': 'Yahoo Finance (Real-time)',
                 'timestamp': datetime.now().isoformat()
             }
         })
@@ -1099,5 +1567,11 @@ def screen_with_predefined_filter(filter_name):
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 if __name__ == "__main__":
+    # Development server; `python serve.py clean --workers N` runs pre-forked
+    # workers and `uvicorn asgi:application` the async (ASGI) stack
     print("🚀 Starting Stock Screener API on http://localhost:5001")
-    app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
+    debug = True
+    # With the debug reloader only the serving child process refreshes
+    if os.environ.get('BACKGROUND_REFRESH', '1') == '1' and (not debug or is_running_from_reloader()):
+        screener.refresher.start()
+    app.run(host='0.0.0.0', port=5001, debug=debug)
\ No newline at end of file
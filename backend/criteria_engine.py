@@ -0,0 +1,184 @@
+"""
+Vectorized criteria engine for the stock screeners
+Compiles a criteria dict once into column-wise boolean masks and evaluates
+a whole universe table in a single pass
+"""
+import json
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Criteria key -> data columns, in lookup order. When the first column is
+# 0 or missing the next one is used (mirrors the old `.get()` fallbacks).
+CRITERIA_FIELDS = {
+    'marketCap': ('marketCap',),
+    'peRatio': ('peRatio',),
+    'roe': ('roe',),
+    'roe_growth': ('roe_growth',),
+    'opm_growth': ('omp_growth', 'opm_growth'),
+    'omp_growth': ('omp_growth', 'opm_growth'),
+    'debtToEquity': ('debtToEquity',),
+    'currentRatio': ('currentRatio',),
+    'salesGrowth': ('salesGrowth',),
+    'sales_growth': ('salesGrowth', 'sales_growth'),
+    'profitGrowth': ('profitGrowth',),
+    'pat_growth': ('pat_growth',),
+    'pledged_percent': ('pledged_percent',),
+    'promoter_holding_change': ('promoter_holding_change',),
+    'avg_roe_5y': ('avg_roe_5y',),
+}
+
+# Criteria that pass when ANY of the columns is strictly above the minimum
+ANY_ABOVE_FIELDS = {
+    'institutional_holding': ('fii_holding', 'dii_holding'),
+}
+
+# Criteria where a non-positive value is never valid (e.g. loss-making PE)
+POSITIVE_ONLY = {'peRatio'}
+
+
+def _table_length(table):
+    """Number of rows in a column table (DataFrame, dict of columns or UniverseStore)"""
+    if isinstance(table, pd.DataFrame):
+        return len(table.index)
+    if isinstance(table, dict):
+        for values in table.values():
+            return len(values)
+        return 0
+    return len(table)
+
+
+def _numeric_column(table, name, n_rows):
+    """Return a float64 column with missing values as 0, like stock_data.get(name, 0)"""
+    if name not in table:
+        return np.zeros(n_rows)
+    values = table[name]
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'fiu':
+        column = values.astype(np.float64, copy=False)
+    else:
+        column = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=np.float64)
+    if np.isnan(column).any():
+        column = np.nan_to_num(column, nan=0.0)
+    return column
+
+
+def _coalesced_column(table, names, n_rows):
+    """First column, falling back to the next wherever the value is 0"""
+    column = _numeric_column(table, names[0], n_rows)
+    for name in names[1:]:
+        if name in table:
+            column = np.where(column == 0, _numeric_column(table, name, n_rows), column)
+    return column
+
+
+class RangePredicate:
+    """min <= value <= max on a single (coalesced) column"""
+
+    def __init__(self, key, columns, minimum=None, maximum=None, positive_only=False):
+        self.key = key
+        self.columns = columns
+        self.minimum = minimum
+        self.maximum = maximum
+        self.positive_only = positive_only
+
+    def mask(self, table, n_rows):
+        values = _coalesced_column(table, self.columns, n_rows)
+        result = np.ones(n_rows, dtype=bool)
+        if self.positive_only:
+            result &= values > 0
+        if self.minimum is not None:
+            result &= values >= self.minimum
+        if self.maximum is not None:
+            result &= values <= self.maximum
+        return result
+
+
+class AnyAbovePredicate:
+    """Passes when any of the columns is strictly above the minimum"""
+
+    def __init__(self, key, columns, minimum):
+        self.key = key
+        self.columns = columns
+        self.minimum = minimum
+
+    def mask(self, table, n_rows):
+        result = np.zeros(n_rows, dtype=bool)
+        for name in self.columns:
+            result |= _numeric_column(table, name, n_rows) > self.minimum
+        return result
+
+
+class CompiledCriteria:
+    """A criteria dict compiled into a list of vectorized predicates"""
+
+    def __init__(self, criteria, predicates):
+        self.criteria = criteria
+        self.predicates = predicates
+
+    def mask(self, table, n_rows=None):
+        """Boolean mask of the rows in `table` that pass every predicate"""
+        if n_rows is None:
+            n_rows = _table_length(table)
+        result = np.ones(n_rows, dtype=bool)
+        for predicate in self.predicates:
+            result &= predicate.mask(table, n_rows)
+            if not result.any():
+                break
+        return result
+
+    def evaluate(self, table):
+        """Row indices of `table` that pass every predicate"""
+        return np.flatnonzero(self.mask(table))
+
+    def matches(self, stock_data):
+        """Evaluate a single stock dict (kept for the per-stock call sites)"""
+        table = {key: [value] for key, value in stock_data.items()}
+        return bool(self.mask(table, n_rows=1)[0])
+
+    def filter(self, stocks):
+        """Return the stock dicts that pass, preserving order"""
+        if not stocks:
+            return []
+        return [stocks[i] for i in self.evaluate(build_table(stocks))]
+
+
+def _compile(criteria):
+    predicates = []
+    for key, bounds in criteria.items():
+        if not isinstance(bounds, dict):
+            continue
+        if key in ANY_ABOVE_FIELDS:
+            if 'min' in bounds:
+                predicates.append(AnyAbovePredicate(key, ANY_ABOVE_FIELDS[key], bounds['min']))
+        elif key in CRITERIA_FIELDS:
+            if 'min' in bounds or 'max' in bounds or key in POSITIVE_ONLY:
+                predicates.append(RangePredicate(
+                    key,
+                    CRITERIA_FIELDS[key],
+                    minimum=bounds.get('min'),
+                    maximum=bounds.get('max'),
+                    positive_only=key in POSITIVE_ONLY,
+                ))
+        # Unknown criteria are ignored, as the per-stock checks always did
+    return CompiledCriteria(criteria, predicates)
+
+
+@lru_cache(maxsize=256)
+def _compile_cached(criteria_key):
+    return _compile(json.loads(criteria_key))
+
+
+def compile_criteria(criteria):
+    """Compile (and memoize) a criteria dict such as PREDEFINED_FILTERS[...]['criteria']"""
+    return _compile_cached(json.dumps(criteria, sort_keys=True, default=str))
+
+
+def build_table(stocks):
+    """Turn a list of stock dicts into a column table for evaluation"""
+    return pd.DataFrame.from_records(stocks)
+
+
+def filter_stocks(stocks, criteria):
+    """Convenience wrapper: the stocks from `stocks` that pass `criteria`"""
+    return compile_criteria(criteria).filter(stocks)
@@ -0,0 +1,194 @@
+"""
+screener.in CSV ingestion
+Parses the export in bulk into typed columns (every column, not just the
+ones the screens use) and reparses only when the file's mtime or size
+changes
+"""
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+CSV_PATHS = (
+    '/Users/prashanthbandlamudi/Desktop/personalWork/stock-insights/filter-conditions/stock-filter-criteria.csv',
+    '/Users/prashanthbandlamudi/Desktop/personalWork/stock-insights/stock-filter-criteria.csv',
+    './filter-conditions/stock-filter-criteria.csv',
+    './stock-filter-criteria.csv',
+)
+
+# CSV columns with a fixed store field; missing numbers read as 0 here
+TEXT_COLUMNS = {
+    'Name': 'name',
+    'NSE Code': 'nse_code',
+    'BSE Code': 'bse_code',
+    'Industry': 'industry',
+    'Industry Group': 'industry_group',
+}
+NUMERIC_COLUMNS = {
+    'Current Price': 'screener_price',
+    'Price to Earning': 'screener_pe',
+    'Return on equity': 'screener_roe',
+    'Debt to equity': 'screener_debt_equity',
+}
+
+# Value of a text column the export lacks altogether (others read as '')
+TEXT_DEFAULTS = {
+    'Industry': 'Unknown',
+    'Industry Group': 'Unknown',
+}
+
+# Keys of the legacy per-stock dicts (get_screener_stocks_from_csv())
+STOCK_KEYS = ('symbol', 'name', 'nse_code', 'bse_code', 'screener_price', 'screener_pe',
+              'screener_roe', 'screener_debt_equity', 'industry', 'industry_group')
+
+
+def field_name(column):
+    """Store field for any other CSV column: 'Dividend yield' -> 'screener_dividend_yield'"""
+    return 'screener_' + re.sub(r'[^0-9a-z]+', '_', column.lower()).strip('_')
+
+
+class CSVSnapshot:
+    """One parse of the CSV: symbols plus a typed array per field
+
+    Numeric columns are float64 with NaN for blanks (0 for the
+    NUMERIC_COLUMNS, as the screens always read them); text columns are
+    object arrays. `extra_numeric` / `extra_text` name the fields of the
+    columns that have no fixed mapping.
+    """
+
+    def __init__(self, path, signature, symbols, columns, extra_numeric, extra_text):
+        self.path = path
+        self.signature = signature
+        self.symbols = symbols
+        self.columns = columns
+        self.extra_numeric = extra_numeric
+        self.extra_text = extra_text
+        self.loaded_at = time.time()
+        self._stocks = None
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def stocks(self):
+        """Rows as the per-stock dicts the CSV readers used to return"""
+        if self._stocks is None:
+            values = [self.symbols] + [self.columns[key].tolist() for key in STOCK_KEYS[1:]]
+            self._stocks = [dict(zip(STOCK_KEYS, row)) for row in zip(*values)]
+        return self._stocks
+
+
+def _parse(path, signature):
+    # The C parser types the numeric columns; codes like '500488' stay text
+    frame = pd.read_csv(path, dtype={column: str for column in TEXT_COLUMNS},
+                        skipinitialspace=True, encoding='utf-8')
+    frame.columns = [column.strip() for column in frame.columns]
+
+    def text(column):
+        if column not in frame:
+            return np.full(len(frame), TEXT_DEFAULTS.get(column, ''), dtype=object)
+        return frame[column].fillna('').str.strip().to_numpy(dtype=object)
+
+    texts = {column: text(column) for column in TEXT_COLUMNS}
+    name, nse_code, bse_code = texts['Name'], texts['NSE Code'], texts['BSE Code']
+    # Prefer the NSE code, fall back to BSE (.BO); rows with neither or no name are skipped
+    symbols = np.where(nse_code != '', nse_code + '.NS', np.where(bse_code != '', bse_code + '.BO', ''))
+    keep = (name != '') & (symbols != '')
+
+    columns = {}
+    for column, field in TEXT_COLUMNS.items():
+        columns[field] = texts[column][keep]
+    for column, field in NUMERIC_COLUMNS.items():
+        values = pd.to_numeric(frame[column], errors='coerce') if column in frame else pd.Series(0.0, index=frame.index)
+        columns[field] = values.fillna(0.0).to_numpy(dtype=np.float64)[keep]
+
+    extra_numeric, extra_text = [], []
+    for column in frame.columns:
+        if column in TEXT_COLUMNS or column in NUMERIC_COLUMNS:
+            continue
+        field = field_name(column)
+        if field in columns:
+            # e.g. 'Debt equity' would overwrite the fixed screener_debt_equity
+            print(f"⚠️ Skipping CSV column {column!r}: its field {field} is already taken")
+            continue
+        values = frame[column]
+        if pd.api.types.is_numeric_dtype(values):
+            columns[field] = values.to_numpy(dtype=np.float64, na_value=np.nan)[keep]
+            extra_numeric.append(field)
+        else:
+            columns[field] = values.astype(object).where(values.notna(), None).to_numpy(dtype=object)[keep]
+            extra_text.append(field)
+
+    return CSVSnapshot(path, signature, symbols[keep].tolist(), columns, extra_numeric, extra_text)
+
+
+class ScreenerCSV:
+    """The screener.in export, reparsed only when the file changes
+
+    load() stats the first existing path and returns the current snapshot
+    unless its (path, mtime, size) differs from the last parse. A file that
+    fails to parse (e.g. caught half-written) is logged and the last good
+    snapshot keeps being served until the file changes again.
+    """
+
+    def __init__(self, paths=CSV_PATHS):
+        self.paths = paths
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._failed_signature = None
+        self.loads = 0
+        self.errors = 0
+        self.last_error = None
+
+    def path(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                return path
+        return None
+
+    def load(self):
+        """Current CSVSnapshot, or None if no CSV file exists"""
+        path = self.path()
+        if path is None:
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return self._snapshot
+        signature = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.signature == signature:
+                return self._snapshot
+            if signature == self._failed_signature:
+                return self._snapshot
+            started = time.perf_counter()
+            try:
+                snapshot = _parse(path, signature)
+            except Exception as e:
+                self._failed_signature = signature
+                self.errors += 1
+                self.last_error = f"{path}: {e}"
+                print(f"❌ Could not parse {path}: {e}"
+                      + (f" (still serving the {len(self._snapshot)} stocks parsed before)" if self._snapshot else ""))
+                return self._snapshot
+            self._snapshot = snapshot
+            self._failed_signature = None
+            self.loads += 1
+            print(f"📊 Parsed {len(self._snapshot)} stocks from {path} in "
+                  f"{(time.perf_counter() - started) * 1000:.1f}ms")
+            return self._snapshot
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'path': snapshot.path if snapshot else None,
+            'stocks': len(snapshot) if snapshot else 0,
+            'columns': len(snapshot.columns) if snapshot else 0,
+            'loads': self.loads,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'loaded_at': snapshot.loaded_at if snapshot else None,
+        }
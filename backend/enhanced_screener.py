@@ -4,19 +4,24 @@ Real financial data for proper filtering with Flask integration
 """
 import requests
 import json
-import time            # OPM Growth filter (OPM > previous year)
-            if 'omp_growth' in criteria:
-                omp_growth = stock_data.get('omp_growth', 0)
-                if 'min' in criteria['omp_growth'] and omp_growth < criteria['omp_growth']['min']:
-                    print(f"  Failed OPM Growth min: {omp_growth} < {criteria['omp_growth']['min']}")
-                    return Falsedatetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta
 import pandas as pd
 import yfinance as yf
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 
+from criteria_engine import compile_criteria
+from fetch_engine import AsyncFetchEngine
+from json_provider import FastJSONProvider
+from projection import project, project_records, requested_fields
+from quote_provider import BatchQuoteFetcher, YahooQuoteProvider, chunked, yahoo_ticker
+from rate_limit import UpstreamGuard
+from response_cache import ResponseCache
+from streaming import stream_format, stream_stocks
+
 class YahooFinanceScreener:
-    def __init__(self):
+    def __init__(self, quote_provider=None):
         # Pre-defined list of major Indian stocks
         self.indian_stocks = [
             'RELIANCE.NS', 'TCS.NS', 'HDFCBANK.NS', 'INFY.NS', 'ICICIBANK.NS',
@@ -26,13 +31,29 @@ class YahooFinanceScreener:
             'ONGC.NS', 'NTPC.NS', 'POWERGRID.NS', 'TATAMOTORS.NS', 'ADANIGREEN.NS',
             'ADANIPORTS.NS', 'COALINDIA.NS', 'BAJAJFINSV.NS', 'HCLTECH.NS', 'DRREDDY.NS'
         ]
+        
+        # Shared rate limiter + circuit breaker for every Yahoo call
+        self.upstream = UpstreamGuard.from_env()
+        
+        # Concurrent upstream fetching (FETCH_MAX_CONCURRENCY / FETCH_PER_HOST_LIMIT)
+        self.fetch_engine = AsyncFetchEngine.from_env()
+        
+        # Bulk quote fetching (swap the provider for a local stand-in in tests)
+        self.quote_provider = quote_provider or YahooQuoteProvider(guard=self.upstream, engine=self.fetch_engine)
+        self.quote_fetcher = BatchQuoteFetcher(self.quote_provider)
     
     def get_stock_data(self, symbol):
         """Get comprehensive stock data from Yahoo Finance"""
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
-            
+            stock = yahoo_ticker(symbol)
+            return self._stock_data_from_info(symbol, self.upstream.call(getattr, stock, 'info'))
+        except Exception as e:
+            print(f"Error fetching data for {symbol}: {e}")
+            return None
+    
+    def _stock_data_from_info(self, symbol, info):
+        """Normalize a Yahoo info dict into screening fields"""
+        try:
             # Extract all the financial ratios we need
             return {
                 'name': info.get('longName', symbol),
@@ -56,162 +77,50 @@ class YahooFinanceScreener:
                 'url': f'https://finance.yahoo.com/quote/{symbol}'
             }
         except Exception as e:
-            print(f"Error fetching data for {symbol}: {e}")
+            print(f"Error normalizing data for {symbol}: {e}")
             return None
     
     def screen_stocks_by_criteria(self, criteria):
         """Screen stocks with REAL filtering based on actual financial data"""
-        screened_stocks = []
-        
         print(f"Screening {len(self.indian_stocks)} stocks with criteria: {criteria}")
         
+        # Many symbols per round trip instead of one Ticker.info call each
+        infos = self.quote_fetcher.fetch(self.indian_stocks)
+        
+        all_stocks = []
         for symbol in self.indian_stocks:
-            try:
-                stock_data = self.get_stock_data(symbol)
-                if not stock_data:
-                    continue
-                
-                # Apply REAL filtering
-                if self.meets_criteria(stock_data, criteria):
-                    screened_stocks.append(stock_data)
-                    print(f"✓ {stock_data['name']} passed filter")
-                else:
-                    print(f"✗ {stock_data['name']} failed filter")
-                
-                # Small delay to be respectful
-                time.sleep(0.3)
-                
-            except Exception as e:
-                print(f"Error processing {symbol}: {e}")
-                continue
+            if symbol in infos:
+                stock_data = self._stock_data_from_info(symbol, infos[symbol])
+                if stock_data:
+                    all_stocks.append(stock_data)
+        
+        # Apply REAL filtering to the whole universe in one vectorized pass
+        screened_stocks = compile_criteria(criteria).filter(all_stocks)
+        print(f"✓ {len(screened_stocks)}/{len(all_stocks)} stocks passed filter")
         
         return screened_stocks
     
+    def iter_screen_stocks_by_criteria(self, criteria, progress=None):
+        """Like screen_stocks_by_criteria(), yielding passing stocks batch by batch"""
+        compiled = compile_criteria(criteria)
+        progress = progress if progress is not None else {}
+        progress['checked'] = 0
+        
+        for chunk in chunked(self.indian_stocks, self.quote_fetcher.batch_size):
+            infos = self.quote_fetcher.fetch(chunk)
+            batch = []
+            for symbol in chunk:
+                if symbol in infos:
+                    stock_data = self._stock_data_from_info(symbol, infos[symbol])
+                    if stock_data:
+                        batch.append(stock_data)
+            progress['checked'] += len(batch)
+            yield from compiled.filter(batch)
+    
     def meets_criteria(self, stock_data, criteria):
         """REAL filtering based on actual financial ratios"""
         try:
-            # Market Cap filter
-            if 'marketCap' in criteria:
-                market_cap = stock_data.get('marketCap', 0)
-                if 'min' in criteria['marketCap'] and market_cap < criteria['marketCap']['min']:
-                    print(f"  Failed marketCap min: {market_cap} < {criteria['marketCap']['min']}")
-                    return False
-                if 'max' in criteria['marketCap'] and market_cap > criteria['marketCap']['max']:
-                    print(f"  Failed marketCap max: {market_cap} > {criteria['marketCap']['max']}")
-                    return False
-            
-            # PE Ratio filter
-            if 'peRatio' in criteria:
-                pe_ratio = stock_data.get('peRatio', 0)
-                if pe_ratio <= 0:  # Invalid PE ratio
-                    print(f"  Failed PE ratio invalid: {pe_ratio}")
-                    return False
-                if 'min' in criteria['peRatio'] and pe_ratio < criteria['peRatio']['min']:
-                    print(f"  Failed PE ratio min: {pe_ratio} < {criteria['peRatio']['min']}")
-                    return False
-                if 'max' in criteria['peRatio'] and pe_ratio > criteria['peRatio']['max']:
-                    print(f"  Failed PE ratio max: {pe_ratio} > {criteria['peRatio']['max']}")
-                    return False
-            
-            # ROE filter
-            if 'roe' in criteria:
-                roe = stock_data.get('roe', 0)
-                if 'min' in criteria['roe'] and roe < criteria['roe']['min']:
-                    print(f"  Failed ROE min: {roe} < {criteria['roe']['min']}")
-                    return False
-            
-            # Debt to Equity filter
-            if 'debtToEquity' in criteria:
-                debt_ratio = stock_data.get('debtToEquity', 0)
-                if 'max' in criteria['debtToEquity'] and debt_ratio > criteria['debtToEquity']['max']:
-                    print(f"  Failed Debt/Equity max: {debt_ratio} > {criteria['debtToEquity']['max']}")
-                    return False
-            
-            # Current Ratio filter
-            if 'currentRatio' in criteria:
-                current_ratio = stock_data.get('currentRatio', 0)
-                if 'min' in criteria['currentRatio'] and current_ratio < criteria['currentRatio']['min']:
-                    print(f"  Failed Current Ratio min: {current_ratio} < {criteria['currentRatio']['min']}")
-                    return False
-            
-            # Sales Growth filter
-            if 'salesGrowth' in criteria:
-                sales_growth = stock_data.get('salesGrowth', 0)
-                if 'min' in criteria['salesGrowth'] and sales_growth < criteria['salesGrowth']['min']:
-                    print(f"  Failed Sales Growth min: {sales_growth} < {criteria['salesGrowth']['min']}")
-                    return False
-            
-            # Profit Growth filter
-            if 'profitGrowth' in criteria:
-                profit_growth = stock_data.get('profitGrowth', 0)
-                if 'min' in criteria['profitGrowth'] and profit_growth < criteria['profitGrowth']['min']:
-                    print(f"  Failed Profit Growth min: {profit_growth} < {criteria['profitGrowth']['min']}")
-                    return False
-            
-            # Your Custom Criteria Fields
-            
-            # ROE Growth filter (ROE > previous year)
-            if 'roe_growth' in criteria:
-                roe_growth = stock_data.get('roe_growth', 0)
-                if 'min' in criteria['roe_growth'] and roe_growth < criteria['roe_growth']['min']:
-                    print(f"  Failed ROE Growth min: {roe_growth} < {criteria['roe_growth']['min']}")
-                    return False
-            
-            # OPM Growth filter (OPM > previous year)
-            if 'opm_growth' in criteria:
-                opm_growth = stock_data.get('opm_growth', 0)
-                if 'min' in criteria['opm_growth'] and omp_growth < criteria['opm_growth']['min']:
-                    print(f"  Failed OPM Growth min: {omp_growth} < {criteria['opm_growth']['min']}")
-                    return False
-            
-            # PAT Growth filter (PAT > previous year)
-            if 'pat_growth' in criteria:
-                pat_growth = stock_data.get('pat_growth', 0)
-                if 'min' in criteria['pat_growth'] and pat_growth < criteria['pat_growth']['min']:
-                    print(f"  Failed PAT Growth min: {pat_growth} < {criteria['pat_growth']['min']}")
-                    return False
-            
-            # Sales Growth filter (Sales > previous year)
-            if 'sales_growth' in criteria:
-                sales_growth = stock_data.get('salesGrowth', 0)  # Use existing field
-                if 'min' in criteria['sales_growth'] and sales_growth < criteria['sales_growth']['min']:
-                    print(f"  Failed Sales Growth min: {sales_growth} < {criteria['sales_growth']['min']}")
-                    return False
-            
-            # Pledged Percentage filter (= 0)
-            if 'pledged_percent' in criteria:
-                pledged_percent = stock_data.get('pledged_percent', 0)
-                if 'max' in criteria['pledged_percent'] and pledged_percent > criteria['pledged_percent']['max']:
-                    print(f"  Failed Pledged Percent max: {pledged_percent} > {criteria['pledged_percent']['max']}")
-                    return False
-            
-            # Promoter Holding Change filter (>= 0)
-            if 'promoter_holding_change' in criteria:
-                promoter_change = stock_data.get('promoter_holding_change', 0)
-                if 'min' in criteria['promoter_holding_change'] and promoter_change < criteria['promoter_holding_change']['min']:
-                    print(f"  Failed Promoter Change min: {promoter_change} < {criteria['promoter_holding_change']['min']}")
-                    return False
-            
-            # Average ROE 5 Years filter (> 14%)
-            if 'avg_roe_5y' in criteria:
-                avg_roe_5y = stock_data.get('avg_roe_5y', 0)
-                if 'min' in criteria['avg_roe_5y'] and avg_roe_5y < criteria['avg_roe_5y']['min']:
-                    print(f"  Failed Avg ROE 5Y min: {avg_roe_5y} < {criteria['avg_roe_5y']['min']}")
-                    return False
-            
-            # Institutional Holding filter (FII > 0 OR DII > 0)
-            if 'institutional_holding' in criteria:
-                fii_holding = stock_data.get('fii_holding', 0)
-                dii_holding = stock_data.get('dii_holding', 0)
-                if 'min' in criteria['institutional_holding']:
-                    min_required = criteria['institutional_holding']['min']
-                    if not (fii_holding > min_required or dii_holding > min_required):
-                        print(f"  Failed Institutional Holding: FII={fii_holding}, DII={dii_holding}, both <= {min_required}")
-                        return False
-            
-            print(f"  ✓ All criteria passed")
-            return True
-            
+            return compile_criteria(criteria).matches(stock_data)
         except Exception as e:
             print(f"  Error in criteria check: {e}")
             return False
@@ -382,10 +291,15 @@ CORS(app, resources={
         "allow_headers": ["Content-Type"]
     }
 })
+# orjson encoding for jsonify() when it is installed
+app.json = FastJSONProvider(app)
 
 # Initialize screener instance
 screener = YahooFinanceScreener()
 
+# Serialized + compressed responses with ETags (RESPONSE_CACHE_TTL, RESPONSE_CACHE_ENTRIES)
+responses = ResponseCache.from_env()
+
 # Predefined filter sets for quick access
 PREDEFINED_FILTERS = {
     'your_custom_criteria': {
@@ -448,6 +362,24 @@ PREDEFINED_FILTERS = {
     }
 }
 
+def stream_screen(fmt, criteria, use_fallback, fields=None, **trailer):
+    """Stream the stocks passing `criteria`: filtered fallback data, or a live
+    screen that emits each batch as it is evaluated. `trailer` items go in
+    the trailer record along with the count checked, criteria and timestamp."""
+    if use_fallback:
+        fallback_stocks = screener.get_fallback_stocks()
+        progress = {'checked': len(fallback_stocks)}
+        stocks = compile_criteria(criteria).filter(fallback_stocks)
+    else:
+        progress = {}
+        stocks = screener.iter_screen_stocks_by_criteria(criteria, progress)
+    return stream_stocks(fmt, stocks, fields=fields, trailer=lambda: dict(
+        trailer,
+        total_checked=progress['checked'],
+        criteria=criteria,
+        timestamp=datetime.now().isoformat(),
+    ))
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -460,10 +392,11 @@ def health_check():
 @app.route('/api/screener/filters', methods=['GET'])
 def get_predefined_filters():
     """Get all predefined filter sets"""
-    return jsonify({
+    # Static: serialized and compressed once
+    return responses.respond(('filters',), 0, lambda: jsonify({
         'status': 'success',
         'filters': PREDEFINED_FILTERS
-    })
+    }))
 
 @app.route('/api/screener/screen', methods=['POST'])
 def screen_stocks():
@@ -479,12 +412,17 @@ def screen_stocks():
         
         criteria = data['criteria']
         use_fallback = data.get('useFallback', False)
+        fields = requested_fields(request, data)
+        
+        fmt = stream_format(request)
+        if fmt:
+            return stream_screen(fmt, criteria, use_fallback, fields=fields)
         
         if use_fallback:
             # Return fallback data for testing
             stocks = screener.get_fallback_stocks()
             # Apply filtering to fallback data
-            filtered_stocks = [stock for stock in stocks if screener.meets_criteria(stock, criteria)]
+            filtered_stocks = compile_criteria(criteria).filter(stocks)
         else:
             # Use real Yahoo Finance data
             filtered_stocks = screener.screen_stocks_by_criteria(criteria)
@@ -492,7 +430,7 @@ def screen_stocks():
         return jsonify({
             'status': 'success',
             'data': {
-                'stocks': filtered_stocks,
+                'stocks': project_records(filtered_stocks, fields),
                 'total': len(filtered_stocks),
                 'criteria': criteria,
                 'timestamp': datetime.now().isoformat()
@@ -529,22 +467,24 @@ def screen_with_predefined_filter(filter_name):
         
         print(f"✅ Using filter: {filter_set['name']}")
         print(f"🎯 Criteria: {criteria}")
+        fields = requested_fields(request)
         
         # For demo purposes, use fallback data (change to False for real data)
         use_fallback = True
         
+        fmt = stream_format(request)
+        if fmt:
+            return stream_screen(fmt, criteria, use_fallback, fields=fields,
+                                 filter_name=filter_set['name'], description=filter_set['description'])
+        
         if use_fallback:
             print("📦 Using fallback data...")
             stocks = screener.get_fallback_stocks()
             print(f"📊 Got {len(stocks)} fallback stocks")
             
-            filtered_stocks = []
-            for stock in stocks:
-                if screener.meets_criteria(stock, criteria):
-                    filtered_stocks.append(stock)
-                    print(f"✅ {stock['name']} passed criteria")
-                else:
-                    print(f"❌ {stock['name']} failed criteria")
+            filtered_stocks = compile_criteria(criteria).filter(stocks)
+            for stock in filtered_stocks:
+                print(f"✅ {stock['name']} passed criteria")
         else:
             print("🌐 Using real Yahoo Finance data...")
             filtered_stocks = screener.screen_stocks_by_criteria(criteria)
@@ -556,7 +496,7 @@ def screen_with_predefined_filter(filter_name):
             'data': {
                 'filter_name': filter_set['name'],
                 'description': filter_set['description'],
-                'stocks': filtered_stocks,
+                'stocks': project_records(filtered_stocks, fields),
                 'total': len(filtered_stocks),
                 'criteria': criteria,
                 'timestamp': datetime.now().isoformat()
@@ -591,7 +531,7 @@ def get_stock_details(ticker):
         
         return jsonify({
             'status': 'success',
-            'data': stock_data
+            'data': project(stock_data, requested_fields(request))
         })
         
     except Exception as e:
@@ -0,0 +1,174 @@
+"""
+asyncio fetch engine for upstream data
+Runs many symbol fetches concurrently under a global concurrency cap and
+per-host limits, with per-call timeouts, an overall deadline that cancels
+whatever is still pending, and a sync facade for the Flask routes
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+YAHOO_HOST = 'query1.finance.yahoo.com'
+# Per-symbol quoteSummary (Ticker.info) calls; a host of their own, so that
+# the ones a quote batch makes don't queue behind the batches holding the
+# YAHOO_HOST slots
+YAHOO_SUMMARY_HOST = 'query2.finance.yahoo.com'
+TRADINGVIEW_HOST = 'scanner.tradingview.com'
+DEFAULT_HOST = 'default'
+
+
+class AsyncFetchEngine:
+    """Event loop on a background thread plus the blocking-call thread pool
+
+    Coroutine functions are awaited directly; plain (blocking) callables such
+    as yfinance calls run on the engine's thread pool. Either way every call
+    holds one global slot and one slot for its host while it runs.
+    """
+
+    def __init__(self, max_concurrency=32, per_host_limit=8, timeout=15.0):
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='fetch')
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._run_loop, name='fetch-engine', daemon=True)
+        self._thread.start()
+
+        # Created lazily on the loop thread
+        self._global_slots = None
+        self._host_slots = {}
+
+        self.active = 0
+        self.completed = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_concurrency=int(os.environ.get('FETCH_MAX_CONCURRENCY', 32)),
+            per_host_limit=int(os.environ.get('FETCH_PER_HOST_LIMIT', 8)),
+            timeout=float(os.environ.get('FETCH_TIMEOUT', 15)),
+        )
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _slots_for(self, host):
+        if self._global_slots is None:
+            self._global_slots = asyncio.Semaphore(self.max_concurrency)
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._global_slots, slots
+
+    # ------------------------------------------------------------------ #
+    # Async API
+    # ------------------------------------------------------------------ #
+    async def call(self, fn, *args, host=DEFAULT_HOST, timeout=None):
+        """Run one fetch under the concurrency limits and a timeout"""
+        timeout = self.timeout if timeout is None else timeout
+        global_slots, host_slots = self._slots_for(host)
+        async with global_slots, host_slots:
+            self.active += 1
+            try:
+                if asyncio.iscoroutinefunction(fn):
+                    pending = fn(*args)
+                else:
+                    pending = asyncio.get_running_loop().run_in_executor(None, functools.partial(fn, *args))
+                return await asyncio.wait_for(pending, timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.active -= 1
+                self.completed += 1
+
+    async def gather(self, fn, items, host=DEFAULT_HOST, timeout=None, deadline=None):
+        """fn(item) for every item; failed, timed-out or cancelled calls give None
+
+        `deadline` bounds the whole batch: calls still pending when it
+        expires are cancelled.
+        """
+        tasks = [asyncio.ensure_future(self.call(fn, item, host=host, timeout=timeout)) for item in items]
+        if not tasks:
+            return []
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            print(f"   ⏱️ Deadline reached, cancelled {len(pending)}/{len(tasks)} fetches")
+
+        results = []
+        for item, task in zip(items, tasks):
+            if task.cancelled():
+                results.append(None)
+            elif task.exception() is not None:
+                error = task.exception()
+                reason = 'timed out' if isinstance(error, asyncio.TimeoutError) else error
+                print(f"   ❌ Fetch for {item} failed: {reason}")
+                results.append(None)
+            else:
+                results.append(task.result())
+        return results
+
+    # ------------------------------------------------------------------ #
+    # Sync facade (call from request threads, never from the loop thread)
+    # ------------------------------------------------------------------ #
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the engine loop and block for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    def map(self, fn, items, host=DEFAULT_HOST, timeout=None, deadline=None):
+        """Blocking gather(): results in the same order as `items`"""
+        return self.run(self.gather(fn, list(items), host=host, timeout=timeout, deadline=deadline))
+
+    def fetch_many(self, fn, keys, host=DEFAULT_HOST, timeout=None, deadline=None):
+        """{key: fn(key)} for the keys whose fetch succeeded with a result"""
+        keys = list(keys)
+        results = self.map(fn, keys, host=host, timeout=timeout, deadline=deadline)
+        return {key: result for key, result in zip(keys, results) if result is not None}
+
+    def submit(self, fn, *args, host=DEFAULT_HOST, timeout=None):
+        """Fire-and-forget style: returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(self.call(fn, *args, host=host, timeout=timeout), self._loop)
+
+    # ------------------------------------------------------------------ #
+    # Async facade (await from another event loop, e.g. an ASGI server's)
+    # ------------------------------------------------------------------ #
+    def schedule(self, coro_fn, *args):
+        """Start coro_fn(*args) on the engine loop; returns a concurrent.futures.Future
+
+        Await it from another loop with asyncio.wrap_future(), which holds
+        no thread while the coroutine runs.
+        """
+        return asyncio.run_coroutine_threadsafe(coro_fn(*args), self._loop)
+
+    def stats(self):
+        return {
+            'max_concurrency': self.max_concurrency,
+            'per_host_limit': self.per_host_limit,
+            'timeout': self.timeout,
+            'active': self.active,
+            'completed': self.completed,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'cancelled': self.cancelled,
+        }
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._executor.shutdown(wait=False)
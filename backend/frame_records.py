@@ -0,0 +1,92 @@
+"""
+TradingView DataFrame -> API records
+One conversion spec for every route that returns screener rows, applied
+with column operations instead of a Python loop over df.iterrows()
+"""
+import json
+
+import numpy as np
+import pandas as pd
+
+TRADINGVIEW_SYMBOL_URL = 'https://in.tradingview.com/symbols/'
+CRORE = 10000000
+
+# (output field, DataFrame column, default when missing); order is the
+# field order of the records
+TEXT_FIELDS = (
+    ('name', 'Name', ''),
+    ('sector', 'Sector', 'Unknown'),
+    ('industry', 'Industry', 'Unknown'),
+    ('country', 'Country', 'Unknown'),
+    ('exchange', 'Exchange', 'Unknown'),
+)
+
+# (output field, DataFrame column, divisor); missing or non-numeric values become 0
+NUMERIC_FIELDS = (
+    ('currentPrice', 'Last', 1),
+    ('marketCap', 'Market Capitalization', CRORE),  # rupees -> Cr
+    ('peRatio', 'Price/Earnings Ratio (TTM)', 1),
+    ('roe', 'Return on Equity (MRQ)', 1),
+    ('debtToEquity', 'Debt to Equity Ratio (MRQ)', 1),
+    ('currentRatio', 'Current Ratio (MRQ)', 1),
+    ('salesGrowth', 'Revenue Growth (YoY TTM)', 1),
+    ('profitGrowth', 'Net Income Growth (YoY TTM)', 1),
+    ('volume', 'Volume', 1),
+    ('change', 'Change', 1),
+    ('changePercent', 'Change %', 1),
+)
+
+STOCK_FIELDS = ('name', 'ticker', 'symbol') + tuple(f for f, _, _ in NUMERIC_FIELDS) + \
+    tuple(f for f, _, _ in TEXT_FIELDS[1:]) + ('url',)
+
+
+def _text(df, column, default):
+    if column not in df:
+        return np.full(len(df), default, dtype=object)
+    values = df[column].to_numpy(dtype=object)
+    return np.where(pd.isna(values), default, values)
+
+
+def _numeric(df, column, divisor):
+    if column not in df:
+        return np.zeros(len(df))
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    values = np.where(np.isfinite(values), values, 0.0)
+    return values / divisor if divisor != 1 else values
+
+
+def stock_columns(df):
+    """`df` converted to the API stock fields: {field: ndarray}"""
+    symbol = _text(df, 'Symbol', '').astype(str)
+    columns = {'symbol': symbol}
+    # 'NSE:RELIANCE' -> 'RELIANCE'
+    columns['ticker'] = np.char.rpartition(symbol, ':')[:, 2] if len(symbol) else symbol
+    columns['url'] = np.where(symbol != '', np.char.add(TRADINGVIEW_SYMBOL_URL, symbol), '')
+    for field, column, default in TEXT_FIELDS:
+        columns[field] = _text(df, column, default)
+    for field, column, divisor in NUMERIC_FIELDS:
+        columns[field] = _numeric(df, column, divisor)
+    return {field: columns[field] for field in STOCK_FIELDS}
+
+
+def stock_records(df):
+    """List of stock dicts for `df`"""
+    if df is None or len(df) == 0:
+        return []
+    # tolist() turns numpy scalars into plain Python values in one pass
+    columns = [values.tolist() for values in stock_columns(df).values()]
+    return [dict(zip(STOCK_FIELDS, values)) for values in zip(*columns)]
+
+
+def stock_records_json(df):
+    """JSON array of the stock records for `df`, serialized by pandas"""
+    if df is None or len(df) == 0:
+        return '[]'
+    return pd.DataFrame(stock_columns(df)).to_json(orient='records', force_ascii=False, double_precision=15)
+
+
+def json_response_body(envelope, records_json, key='data'):
+    """`envelope` as a JSON object with the pre-serialized `records_json` added as `key`"""
+    body = json.dumps(envelope, default=str)
+    separator = ', ' if envelope else ''
+    return f"{body[:-1]}{separator}{json.dumps(key)}: {records_json}}}"
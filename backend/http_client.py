@@ -0,0 +1,93 @@
+"""
+Pooled HTTP sessions for upstream providers
+One long-lived, keep-alive session per upstream (Yahoo Finance, TradingView)
+with connection pools sized to the fetch engine's concurrency and a default
+per-request timeout, so repeated calls reuse TCP/TLS connections
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from curl_cffi import CurlOpt
+    from curl_cffi import requests as curl_requests
+except ImportError:  # yfinance falls back to plain requests without curl_cffi
+    CurlOpt = curl_requests = None
+
+# Match the fetch engine's limits so a worker never waits for a connection
+POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', os.environ.get('FETCH_MAX_CONCURRENCY', 32)))
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 15))
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+class PooledSession(requests.Session):
+    """requests.Session with sized connection pools and a default timeout"""
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=HTTP_TIMEOUT, headers=None):
+        super().__init__()
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=True)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        if headers:
+            self.headers.update(headers)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def _build_yahoo_session(pool_size=POOL_SIZE):
+    if curl_requests is not None:
+        # What yfinance itself uses: a browser-impersonating curl session.
+        # Curl handles are per thread, each with its own connection cache,
+        # so the pool size caps what every handle keeps alive
+        return curl_requests.Session(impersonate='chrome', timeout=HTTP_TIMEOUT,
+                                     curl_options={CurlOpt.MAXCONNECTS: pool_size})
+    return PooledSession(pool_size=pool_size, headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+    })
+
+
+def _build_tradingview_session():
+    return PooledSession(headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                      '(KHTML, like Gecko) Chrome/120.0 Safari/537.36',
+        'Content-Type': 'application/json',
+        'Origin': 'https://www.tradingview.com',
+        'Referer': 'https://www.tradingview.com/',
+    })
+
+
+def _shared(name, factory):
+    session = _sessions.get(name)
+    if session is None:
+        with _lock:
+            session = _sessions.get(name)
+            if session is None:
+                session = _sessions[name] = factory()
+    return session
+
+
+def yahoo_session():
+    """The process-wide session every yfinance call is given"""
+    return _shared('yahoo', _build_yahoo_session)
+
+
+def tradingview_session():
+    """The process-wide session for TradingView scanner requests"""
+    return _shared('tradingview', _build_tradingview_session)
+
+
+def close_sessions():
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,68 @@
+"""
+orjson-backed JSON for the Flask apps
+jsonify() and app.json.dumps() encode with orjson when it is installed,
+falling back to the stdlib encoder otherwise (or for values orjson can't
+encode, such as integers wider than 64 bits)
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional: stdlib json
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider with orjson doing the encoding
+
+    Keys stay sorted, default() still handles dates, decimals and
+    dataclasses, and debug mode still indents. Differences from the stdlib
+    encoder: non-ASCII text is written as UTF-8 rather than \\u escapes, and
+    NaN / Infinity become null (valid JSON) instead of bare NaN.
+
+        app.json = FastJSONProvider(app)
+    """
+
+    def _orjson(self, obj, indent=False):
+        # Dates go through default() as well, which writes them as HTTP dates
+        option = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                  | orjson.OPT_PASSTHROUGH_DATETIME)
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def _encode(self, obj, **kwargs):
+        """UTF-8 JSON bytes for `obj`, or None when only the stdlib encoder can do it
+
+        orjson has two layouts: compact (separators (',', ':')) and indented
+        by 2. Any other layout, such as the stdlib's default ', '
+        separators, is left to the stdlib encoder.
+        """
+        if orjson is None or kwargs.keys() - {'indent', 'separators'}:
+            return None
+        indent, separators = kwargs.get('indent'), kwargs.get('separators')
+        separators = tuple(separators) if separators is not None else None
+        if indent is None:
+            if separators != (',', ':'):
+                return None
+        elif indent != 2 or separators not in (None, (',', ': ')):
+            return None
+        try:
+            return self._orjson(obj, indent=indent is not None)
+        except orjson.JSONEncodeError:
+            return None
+
+    def dumps(self, obj, **kwargs):
+        encoded = self._encode(obj, **kwargs)
+        return encoded.decode() if encoded is not None else super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        dump_args = {'indent': 2} if indent else {'separators': (',', ':')}
+        encoded = self._encode(obj, **dump_args)
+        if encoded is None:
+            encoded = f"{super().dumps(obj, **dump_args)}\n".encode()
+        else:
+            encoded += b'\n'
+        return self._app.response_class(encoded, mimetype=self.mimetype)
@@ -0,0 +1,149 @@
+"""
+Materialized predefined screens
+Keeps the result set of every PREDEFINED_FILTERS screen up to date as
+symbol records change, so serving a screen is a read of its members
+instead of a scan of the universe
+"""
+import itertools
+import threading
+
+import numpy as np
+
+from criteria_engine import compile_criteria
+
+_epochs = itertools.count(1)
+
+
+class MaterializedScreens:
+    """Member sets of named screens over a fixed list of symbols
+
+    rebuild() evaluates every screen over the universe store in one pass;
+    after that update(symbol) re-checks only that symbol's membership in each
+    screen. results() serves the members in `symbols` order, rendering
+    records only when the screen changed since the last call.
+    """
+
+    def __init__(self, universe, filters, symbols, indexes=None):
+        self.universe = universe
+        # Optional RangeIndexSet: rebuild() then only visits candidate rows
+        self.indexes = indexes
+        self.filters = filters
+        self.symbols = list(dict.fromkeys(symbols))
+        self._position = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._compiled = {name: compile_criteria(f['criteria']) for name, f in filters.items()}
+        self._lock = threading.Lock()
+        # screen name -> {symbol: position in self.symbols}
+        self._members = {name: {} for name in filters}
+        # screen name -> rendered records, None when they need re-rendering
+        self._results = {name: None for name in filters}
+        # Bumped on every change to a screen, so a render that raced with an
+        # update is not cached
+        self._versions = {name: 0 for name in filters}
+        self.built = False
+        self.updates = 0
+        self.epoch = next(_epochs)
+
+    def _eligible_rows(self):
+        """(symbols, rows) of the screen universe that have Yahoo data"""
+        universe = self.universe
+        symbols, rows = [], []
+        for symbol in self.symbols:
+            row = universe.row_of(symbol)
+            if row is not None and universe.has_quote(row):
+                symbols.append(symbol)
+                rows.append(row)
+        return symbols, np.array(rows, dtype=np.int64)
+
+    def accept(self, rows):
+        """Mask of `rows` that belong to this universe and have Yahoo data"""
+        symbols = self.universe.symbols
+        in_universe = np.array([symbols[row] in self._position for row in rows], dtype=bool)
+        return in_universe & self.universe.has_quotes(rows)
+
+    def rebuild(self):
+        """Evaluate every screen from scratch (start-up, or after bulk loads)"""
+        members = {}
+        if self.indexes is not None:
+            symbols = self.universe.symbols
+            for name, compiled in self._compiled.items():
+                passed = self.indexes.select(compiled, accept=self.accept)
+                members[name] = {symbols[row]: self._position[symbols[row]] for row in passed}
+        else:
+            symbols, rows = self._eligible_rows()
+            for name, compiled in self._compiled.items():
+                passed = compiled.mask(self.universe.view(rows)) if len(rows) else np.zeros(0, dtype=bool)
+                members[name] = {symbols[i]: self._position[symbols[i]] for i in np.flatnonzero(passed)}
+        with self._lock:
+            self._members = members
+            self._results = {name: None for name in self.filters}
+            for name in self._versions:
+                self._versions[name] += 1
+            self.built = True
+
+    def update(self, symbol):
+        """Re-check `symbol` in every screen after its record changed"""
+        position = self._position.get(symbol)
+        if position is None:
+            return
+        row = self.universe.row_of(symbol)
+        eligible = row is not None and self.universe.has_quote(row)
+        view = self.universe.view([row]) if eligible else None
+
+        with self._lock:
+            self.updates += 1
+            for name, compiled in self._compiled.items():
+                members = self._members[name]
+                passes = eligible and bool(compiled.mask(view, n_rows=1)[0])
+                if passes:
+                    members[symbol] = position
+                    # Its record changed even if its membership did not
+                    self._results[name] = None
+                    self._versions[name] += 1
+                elif symbol in members:
+                    del members[symbol]
+                    self._results[name] = None
+                    self._versions[name] += 1
+
+    def results(self, name):
+        """Current member records of screen `name`, in universe order"""
+        with self._lock:
+            records = self._results[name]
+            if records is not None:
+                return records
+            members = sorted(self._members[name].items(), key=lambda item: item[1])
+            version = self._versions[name]
+        stock_record = self.universe.stock_record
+        row_of = self.universe.row_of
+        records = [stock_record(row_of(symbol)) for symbol, _ in members]
+        with self._lock:
+            if self._versions[name] == version:
+                self._results[name] = records
+        return records
+
+    def version(self, name):
+        """Changes whenever the records of screen `name` may have changed"""
+        with self._lock:
+            return self.epoch, self._versions[name]
+
+    def member_rows(self, name):
+        """Store rows of the current members of screen `name`, in universe order"""
+        with self._lock:
+            members = sorted(self._members[name].items(), key=lambda item: item[1])
+        row_of = self.universe.row_of
+        return np.array([row_of(symbol) for symbol, _ in members], dtype=np.int64)
+
+    def eligible_rows(self):
+        """Store rows of the universe symbols that have Yahoo data"""
+        return self._eligible_rows()[1]
+
+    def eligible_count(self):
+        return len(self._eligible_rows()[0])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'built': self.built,
+                'universe': len(self.symbols),
+                'updates': self.updates,
+                'members': {name: len(members) for name, members in self._members.items()},
+            }
@@ -0,0 +1,38 @@
+"""
+fields= projection for stock payloads
+?fields=symbol,name,price (or "fields" in a JSON request body) keeps only
+those keys of every stock record, so a client that shows a few columns of
+a large table doesn't pay to encode and download the rest
+"""
+
+
+def requested_fields(request, body=None):
+    """Tuple of the fields asked for, or None for whole records
+
+    ?fields= takes a comma-separated list; a JSON body's "fields" may also
+    be a list. Unknown fields are simply absent from the records.
+    """
+    fields = request.args.get('fields')
+    if fields is None and isinstance(body, dict):
+        fields = body.get('fields')
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    fields = tuple(dict.fromkeys(str(field).strip() for field in fields))
+    fields = tuple(field for field in fields if field)
+    return fields or None
+
+
+def project(record, fields):
+    """`record` with only `fields` (the record itself when fields is None)"""
+    if fields is None or not isinstance(record, dict):
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+
+def project_records(records, fields):
+    """List of the projected `records`"""
+    if fields is None:
+        return records
+    return [project(record, fields) for record in records]
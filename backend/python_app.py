@@ -1,16 +1,171 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import tvscreener as tvs
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
 from datetime import datetime
+import hashlib
+import json
+import os
+import time
 import pandas as pd
 
+from frame_records import json_response_body, stock_records, stock_records_json
+from json_provider import FastJSONProvider
+from projection import project_records, requested_fields
+from response_cache import ResponseCache
+from stock_cache import SingleFlight, TTLCache
+import tvscreener_adapter
+
 app = Flask(__name__)
 CORS(app)
+# orjson encoding for jsonify() when it is installed
+app.json = FastJSONProvider(app)
+
+
+# Full-market retrieval: rows per range request, parallel range requests,
+# and the caps that keep a broad screen bounded
+SCREEN_PAGE_SIZE = int(os.environ.get('SCREEN_PAGE_SIZE', 500))
+SCREEN_CONCURRENCY = int(os.environ.get('SCREEN_CONCURRENCY', 4))
+SCREEN_MAX_ROWS = int(os.environ.get('SCREEN_MAX_ROWS', 20000))
+SCREEN_DEADLINE = float(os.environ.get('SCREEN_DEADLINE', 30))
+
+# Rows returned when the full result is not asked for
+SCREEN_DEFAULT_ROWS = 500
+
+
+_adapter_warned = False
+
+
+def _direct(screener):
+    """True when `screener` can be posted over the shared session (see tvscreener_adapter)"""
+    global _adapter_warned
+    try:
+        tvscreener_adapter.check(screener)
+    except tvscreener_adapter.TvScreenerInternalsError as e:
+        if not _adapter_warned:
+            _adapter_warned = True
+            print(f"⚠️ {e}. Screens run through screener.get() instead of the shared session.")
+        return False
+    return True
+
+
+def run_screener(screener):
+    """screener.get() over the shared keep-alive TradingView session"""
+    if not _direct(screener):
+        return screener.get()
+    columns = tvscreener_adapter.request_columns(screener)
+    rows, _ = tvscreener_adapter.post_payload(screener, tvscreener_adapter.build_payload(screener, columns))
+    return tvscreener_adapter.frame(rows, columns)
+
+
+def run_screener_all(screener, max_rows=SCREEN_MAX_ROWS, page_size=SCREEN_PAGE_SIZE,
+                     concurrency=SCREEN_CONCURRENCY, deadline=SCREEN_DEADLINE):
+    """(DataFrame, total, complete) for up to `max_rows` rows of a screen
+
+    The first range request returns TradingView's totalCount; the remaining
+    ranges of `page_size` rows are requested in parallel, at most
+    `concurrency` at a time. Ranges that fail or miss the `deadline` are
+    left out and the result is marked incomplete, as it is when the screen
+    has more than `max_rows` rows.
+    """
+    if not _direct(screener):
+        screener.set_range(0, max_rows)
+        df = screener.get()
+        return df, len(df), len(df) < max_rows
+    started = time.monotonic()
+    columns = tvscreener_adapter.request_columns(screener)
+    payload = tvscreener_adapter.build_payload(screener, columns)
+
+    def fetch(start):
+        end = min(start + page_size, max_rows)
+        return tvscreener_adapter.post_payload(screener, dict(payload, range=[start, end]))[0]
+
+    first_rows, total = tvscreener_adapter.post_payload(screener, dict(payload, range=[0, min(page_size, max_rows)]))
+    if total is None:
+        total = len(first_rows)
+    pages = {0: first_rows}
+    complete = total <= max_rows
+    starts = range(page_size, min(total, max_rows), page_size)
+    if starts:
+        pool = ThreadPoolExecutor(max_workers=min(concurrency, len(starts)))
+        futures = {pool.submit(fetch, start): start for start in starts}
+        try:
+            for future in as_completed(futures, timeout=max(0.0, deadline - (time.monotonic() - started))):
+                try:
+                    pages[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"Range {futures[future]} failed: {e}")
+                    complete = False
+        except FuturesTimeout:
+            print(f"Screen hit its {deadline}s deadline with {len(pages)}/{len(starts) + 1} ranges")
+            complete = False
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    # Ranges are fetched at slightly different times, so a row that moved
+    # between them may show up twice
+    rows, seen = [], set()
+    for start in sorted(pages):
+        for row in pages[start]:
+            if row[0] not in seen:
+                seen.add(row[0])
+                rows.append(row)
+    complete = complete and len(rows) >= total
+    return tvscreener_adapter.frame(rows, columns), total, complete
+
+# Criteria keys and bounds that reach the TradingView query (see build_screener)
+CRITERIA_BOUNDS = {
+    'marketCap': ('min', 'max'),
+    'peRatio': ('min', 'max'),
+    'roe': ('min',),
+    'debtToEquity': ('max',),
+    'currentRatio': ('min',),
+    'salesGrowth': ('min',),
+    'profitGrowth': ('min',),
+}
+
+
+def normalize_criteria(criteria):
+    """Only the bounds build_screener uses, as floats
+
+    Criteria that produce the same TradingView query normalize to the same
+    dict, whatever the key order, extra keys or int/float spelling.
+    """
+    normalized = {}
+    for key, bounds in (criteria or {}).items():
+        if key not in CRITERIA_BOUNDS or not isinstance(bounds, dict):
+            continue
+        kept = {}
+        for bound in CRITERIA_BOUNDS[key]:
+            if bounds.get(bound) is not None:
+                kept[bound] = float(bounds[bound])
+        if kept:
+            normalized[key] = kept
+    return normalized
+
+
+def criteria_hash(criteria):
+    """Canonical hash of normalized criteria, the screen cache key"""
+    canonical = json.dumps(criteria, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
 
 class TradingViewScreenerService:
+    """TradingView screens, cached by criteria
+
+    Every screen builds its own StockScreener, so concurrent requests never
+    share query state. Results are kept for SCREEN_CACHE_TTL seconds under
+    the hash of their normalized criteria, and concurrent misses for the
+    same criteria share one upstream request.
+    """
+
     def __init__(self):
-        self.screener = tvs.StockScreener()
+        self.cache = TTLCache(
+            ttl=float(os.environ.get('SCREEN_CACHE_TTL', 300)),
+            max_entries=int(os.environ.get('SCREEN_CACHE_ENTRIES', 256)),
+        )
+        self.single_flight = SingleFlight()
         
     def get_predefined_filters(self):
         """Get predefined high-quality stock filters"""
@@ -59,24 +214,23 @@ class TradingViewScreenerService:
             }
         }
     
-    def apply_filters(self, filter_criteria):
-        """Apply filter criteria to the screener"""
-        # Reset screener
-        self.screener = tvs.StockScreener()
+    def build_screener(self, filter_criteria):
+        """New screener for normalized filter criteria"""
+        screener = tvs.StockScreener()
         
         # Set market to India (you can modify this)
-        self.screener.set_tickers_source(tvs.StocksMarket.INDIA)
+        screener.set_tickers_source(tvs.StocksMarket.INDIA)
         
         # Apply filters based on criteria
         if 'marketCap' in filter_criteria:
             if 'min' in filter_criteria['marketCap']:
-                self.screener.add_filter(
+                screener.add_filter(
                     tvs.StockField.MARKET_CAPITALIZATION, 
                     tvs.FilterOperator.ABOVE_OR_EQUAL, 
                     filter_criteria['marketCap']['min'] * 10000000  # Convert Cr to actual value
                 )
             if 'max' in filter_criteria['marketCap']:
-                self.screener.add_filter(
+                screener.add_filter(
                     tvs.StockField.MARKET_CAPITALIZATION, 
                     tvs.FilterOperator.BELOW_OR_EQUAL, 
                     filter_criteria['marketCap']['max'] * 10000000
@@ -84,54 +238,87 @@ class TradingViewScreenerService:
         
         if 'peRatio' in filter_criteria:
             if 'min' in filter_criteria['peRatio'] and 'max' in filter_criteria['peRatio']:
-                self.screener.add_filter(
+                screener.add_filter(
                     tvs.StockField.PRICE_EARNINGS_RATIO_TTM,
                     tvs.FilterOperator.IN_RANGE,
                     [filter_criteria['peRatio']['min'], filter_criteria['peRatio']['max']]
                 )
             elif 'min' in filter_criteria['peRatio']:
-                self.screener.add_filter(
+                screener.add_filter(
                     tvs.StockField.PRICE_EARNINGS_RATIO_TTM,
                     tvs.FilterOperator.ABOVE_OR_EQUAL,
                     filter_criteria['peRatio']['min']
                 )
         
         if 'roe' in filter_criteria and 'min' in filter_criteria['roe']:
-            self.screener.add_filter(
+            screener.add_filter(
                 tvs.StockField.RETURN_ON_EQUITY_MRQ,
                 tvs.FilterOperator.ABOVE_OR_EQUAL,
                 filter_criteria['roe']['min']
             )
         
         if 'debtToEquity' in filter_criteria and 'max' in filter_criteria['debtToEquity']:
-            self.screener.add_filter(
+            screener.add_filter(
                 tvs.StockField.DEBT_TO_EQUITY_RATIO_MRQ,
                 tvs.FilterOperator.BELOW_OR_EQUAL,
                 filter_criteria['debtToEquity']['max']
             )
         
         if 'currentRatio' in filter_criteria and 'min' in filter_criteria['currentRatio']:
-            self.screener.add_filter(
+            screener.add_filter(
                 tvs.StockField.CURRENT_RATIO_MRQ,
                 tvs.FilterOperator.ABOVE_OR_EQUAL,
                 filter_criteria['currentRatio']['min']
             )
         
         if 'salesGrowth' in filter_criteria and 'min' in filter_criteria['salesGrowth']:
-            self.screener.add_filter(
+            screener.add_filter(
                 tvs.StockField.REVENUE_GROWTH_YOY_TTM,
                 tvs.FilterOperator.ABOVE_OR_EQUAL,
                 filter_criteria['salesGrowth']['min']
             )
         
         if 'profitGrowth' in filter_criteria and 'min' in filter_criteria['profitGrowth']:
-            self.screener.add_filter(
+            screener.add_filter(
                 tvs.StockField.NET_INCOME_YOY_GROWTH_TTM,
                 tvs.FilterOperator.ABOVE_OR_EQUAL,
                 filter_criteria['profitGrowth']['min']
             )
+        
+        return screener
+    
+    def screen(self, filter_criteria, full=False):
+        """(result, age in seconds) for criteria
+
+        The result has 'records', 'json', 'count', 'total' and 'complete'.
+        With `full` every row of the market (up to SCREEN_MAX_ROWS) is
+        retrieved, else the first SCREEN_DEFAULT_ROWS.
+        """
+        criteria = normalize_criteria(filter_criteria)
+        key = criteria_hash(criteria) + (':all' if full else '')
+        entry = self.cache.get_entry(key, allow_stale=False)
+        if entry is not None:
+            return entry
+        return self.single_flight.do(key, self._screen, key, criteria, full), 0
     
-    def fetch_stocks(self, filter_name):
+    def _screen(self, key, criteria, full):
+        # A request that waited behind another may find it already cached
+        entry = self.cache.get_entry(key, allow_stale=False)
+        if entry is not None:
+            return entry[0]
+        max_rows = SCREEN_MAX_ROWS if full else SCREEN_DEFAULT_ROWS
+        df, total, complete = run_screener_all(self.build_screener(criteria), max_rows=max_rows)
+        result = {
+            'records': stock_records(df),
+            'json': stock_records_json(df),
+            'count': len(df),
+            'total': total,
+            'complete': complete,
+        }
+        self.cache.set(key, result)
+        return result
+    
+    def fetch_stocks(self, filter_name, full=False):
         """Fetch stocks using predefined filters"""
         try:
             filters = self.get_predefined_filters()
@@ -140,48 +327,14 @@ class TradingViewScreenerService:
                 return {'success': False, 'message': f'Filter {filter_name} not found'}
             
             filter_config = filters[filter_name]['criteria']
-            self.apply_filters(filter_config)
-            
-            # Set range to get more results
-            self.screener.set_range(0, 500)
-            
-            # Get the data
-            df = self.screener.get()
-            
-            # Convert to our format
-            stocks = []
-            for index, row in df.iterrows():
-                try:
-                    stock = {
-                        'name': row.get('Name', ''),
-                        'ticker': row.get('Symbol', '').split(':')[-1] if ':' in str(row.get('Symbol', '')) else row.get('Symbol', ''),
-                        'symbol': row.get('Symbol', ''),
-                        'currentPrice': float(row.get('Last', 0) or 0),
-                        'marketCap': float(row.get('Market Capitalization', 0) or 0) / 10000000,  # Convert to Cr
-                        'peRatio': float(row.get('Price/Earnings Ratio (TTM)', 0) or 0),
-                        'roe': float(row.get('Return on Equity (MRQ)', 0) or 0),
-                        'debtToEquity': float(row.get('Debt to Equity Ratio (MRQ)', 0) or 0),
-                        'currentRatio': float(row.get('Current Ratio (MRQ)', 0) or 0),
-                        'salesGrowth': float(row.get('Revenue Growth (YoY TTM)', 0) or 0),
-                        'profitGrowth': float(row.get('Net Income Growth (YoY TTM)', 0) or 0),
-                        'sector': row.get('Sector', 'Unknown'),
-                        'industry': row.get('Industry', 'Unknown'),
-                        'country': row.get('Country', 'Unknown'),
-                        'exchange': row.get('Exchange', 'Unknown'),
-                        'volume': float(row.get('Volume', 0) or 0),
-                        'change': float(row.get('Change', 0) or 0),
-                        'changePercent': float(row.get('Change %', 0) or 0),
-                        'url': f"https://in.tradingview.com/symbols/{row.get('Symbol', '')}" if row.get('Symbol') else ''
-                    }
-                    stocks.append(stock)
-                except Exception as e:
-                    print(f"Error processing row: {e}")
-                    continue
+            result, _ = self.screen(filter_config, full=full)
             
             return {
                 'success': True, 
-                'data': stocks,
-                'count': len(stocks),
+                'data': result['records'],
+                'count': result['count'],
+                'total': result['total'],
+                'complete': result['complete'],
                 'filter_used': filter_name,
                 'filter_criteria': filter_config
             }
@@ -192,12 +345,16 @@ class TradingViewScreenerService:
 # Initialize service
 screener_service = TradingViewScreenerService()
 
+# Serialized + compressed responses with ETags (RESPONSE_CACHE_TTL, RESPONSE_CACHE_ENTRIES)
+responses = ResponseCache.from_env()
+
 # Routes
 @app.route('/api/screener/filters', methods=['GET'])
 def get_filters():
     """Get available predefined filters"""
-    filters = screener_service.get_predefined_filters()
-    return jsonify({'success': True, 'data': filters})
+    # Static: serialized and compressed once
+    return responses.respond(('filters',), 0, lambda: jsonify({
+        'success': True, 'data': screener_service.get_predefined_filters()}))
 
 @app.route('/api/screener/fetch-stocks', methods=['POST'])
 def fetch_stocks():
@@ -275,7 +432,7 @@ def fetch_stocks():
         
         return jsonify({
             'success': True,
-            'data': mock_stocks,
+            'data': project_records(mock_stocks, requested_fields(request, data)),
             'message': f'Successfully fetched {len(mock_stocks)} stocks using {filter_name} filter',
             'filter_applied': filter_name
         })
@@ -293,43 +450,37 @@ def custom_filter():
     filter_criteria = data.get('criteria', {})
     
     try:
-        screener_service.apply_filters(filter_criteria)
-        screener_service.screener.set_range(0, 500)
-        df = screener_service.screener.get()
+        # "all": true pages through the whole result instead of the first 500 rows
+        result, age = screener_service.screen(filter_criteria, full=bool(data.get('all')))
         
-        # Convert DataFrame to our format (similar to fetch_stocks)
-        stocks = []
-        for index, row in df.iterrows():
-            try:
-                stock = {
-                    'name': row.get('Name', ''),
-                    'ticker': row.get('Symbol', '').split(':')[-1] if ':' in str(row.get('Symbol', '')) else row.get('Symbol', ''),
-                    'symbol': row.get('Symbol', ''),
-                    'currentPrice': float(row.get('Last', 0) or 0),
-                    'marketCap': float(row.get('Market Capitalization', 0) or 0) / 10000000,
-                    'peRatio': float(row.get('Price/Earnings Ratio (TTM)', 0) or 0),
-                    'roe': float(row.get('Return on Equity (MRQ)', 0) or 0),
-                    'debtToEquity': float(row.get('Debt to Equity Ratio (MRQ)', 0) or 0),
-                    'sector': row.get('Sector', 'Unknown'),
-                    'url': f"https://in.tradingview.com/symbols/{row.get('Symbol', '')}" if row.get('Symbol') else ''
-                }
-                stocks.append(stock)
-            except Exception as e:
-                continue
-        
-        return jsonify({
-            'success': True, 
-            'data': stocks,
-            'count': len(stocks),
-            'criteria_used': filter_criteria
-        })
+        # Records were serialized once, when the screen was cached; a
+        # fields= projection encodes just those columns
+        fields = requested_fields(request, data)
+        records_json = result['json'] if fields is None else \
+            app.json.dumps(project_records(result['records'], fields))
+        body = json_response_body({
+            'success': True,
+            'count': result['count'],
+            'total': result['total'],
+            'complete': result['complete'],
+            'criteria_used': filter_criteria,
+            'cache_age': round(age, 1)
+        }, records_json)
+        return Response(body, mimetype='application/json')
         
     except Exception as e:
         return jsonify({'success': False, 'message': f'Custom filter failed: {str(e)}'}), 400
 
 @app.route('/api/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'OK', 'message': 'TradingView Screener API is running', 'version': '2.0'})
+    return jsonify({
+        'status': 'OK',
+        'message': 'TradingView Screener API is running',
+        'version': '2.0',
+        'screen_cache': screener_service.cache.stats(),
+        'single_flight': screener_service.single_flight.stats(),
+        'responses': responses.stats()
+    })
 
 # Test route to verify tvscreener is working
 @app.route('/api/screener/test', methods=['GET'])
@@ -338,7 +489,7 @@ def test_screener():
     try:
         ss = tvs.StockScreener()
         ss.set_range(0, 10)  # Just get 10 stocks for test
-        df = ss.get()
+        df = run_screener(ss)
         
         return jsonify({
             'success': True, 
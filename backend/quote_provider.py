@@ -0,0 +1,242 @@
+"""
+Batched quote fetching
+A pluggable provider interface that serves many symbols per round trip, a
+Yahoo Finance implementation and a local stand-in for tests and benchmarks
+"""
+import time
+from concurrent.futures import as_completed
+
+import yfinance as yf
+
+from fetch_engine import YAHOO_HOST, YAHOO_SUMMARY_HOST
+from http_client import HTTP_TIMEOUT, yahoo_session
+from rate_limit import UpstreamUnavailable
+from stock_cache import TTLCache
+
+try:
+    from yfinance.data import YfData
+except ImportError:  # very old yfinance releases
+    YfData = None
+
+YAHOO_QUOTE_URL = 'https://query1.finance.yahoo.com/v7/finance/quote'
+
+# Fields only Yahoo's per-symbol quoteSummary (Ticker.info) carries
+FUNDAMENTAL_FIELDS = (
+    'returnOnEquity', 'debtToEquity', 'currentRatio', 'revenueGrowth',
+    'earningsGrowth', 'profitMargins', 'sector', 'industry',
+)
+
+
+def yahoo_ticker(symbol):
+    """yf.Ticker on the shared, pooled Yahoo session"""
+    return yf.Ticker(symbol, session=yahoo_session())
+
+
+def chunked(items, size):
+    """Split `items` into lists of at most `size`"""
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class QuoteProvider:
+    """Interface for upstream quote sources
+
+    fetch_quotes() takes a list of symbols and returns {symbol: info} where
+    `info` uses yfinance's Ticker.info key names. Symbols the provider has
+    no data for are simply left out.
+    """
+
+    # Largest number of symbols the provider accepts in one round trip
+    max_batch_size = 50
+
+    def fetch_quotes(self, symbols):
+        raise NotImplementedError
+
+    def fetch_quote(self, symbol):
+        return self.fetch_quotes([symbol]).get(symbol)
+
+
+class YahooQuoteProvider(QuoteProvider):
+    """Yahoo Finance: multi-symbol v7 quotes plus cached per-symbol fundamentals
+
+    With a fetch engine, the per-symbol fundamentals calls run concurrently
+    within its limits; without one they run back to back.
+    """
+
+    max_batch_size = 50
+
+    def __init__(self, include_fundamentals=True, fundamentals_ttl=86400, guard=None, engine=None):
+        self.include_fundamentals = include_fundamentals
+        # Optional rate limiter / circuit breaker every Yahoo call goes through
+        self.guard = guard
+        self.engine = engine
+        # Fundamentals change quarterly, so they are kept far longer than prices
+        self._fundamentals = TTLCache(ttl=fundamentals_ttl, max_entries=20000)
+
+    def _call(self, fn, *args):
+        return self.guard.call(fn, *args) if self.guard is not None else fn(*args)
+
+    def fetch_quotes(self, symbols):
+        symbols = list(symbols)
+        quotes = {}
+        for chunk in chunked(symbols, self.max_batch_size):
+            try:
+                quotes.update(self._call(self._fetch_quote_chunk, chunk))
+            except UpstreamUnavailable as e:
+                print(f"   ⛔ Skipping batch of {len(chunk)}: {e}")
+            except Exception as e:
+                print(f"   ⚠️ Batch quote failed ({e}), falling back to download")
+                try:
+                    quotes.update(self._call(self._download_chunk, chunk))
+                except Exception as e:
+                    print(f"   ❌ Download fallback failed: {e}")
+
+        if self.include_fundamentals:
+            fundamentals = self._get_fundamentals([s for s in symbols if s in quotes])
+            for symbol, quote in quotes.items():
+                merged = dict(fundamentals.get(symbol, {}))
+                merged.update(quote)
+                quotes[symbol] = merged
+        return quotes
+
+    def _fetch_quote_chunk(self, chunk):
+        """One round trip for up to max_batch_size symbols"""
+        if YfData is None:
+            return self._download_chunk(chunk)
+        params = {'symbols': ','.join(chunk), 'formatted': 'false'}
+        result = YfData(session=yahoo_session()).get_raw_json(YAHOO_QUOTE_URL, params=params, timeout=HTTP_TIMEOUT)
+        quotes = {}
+        for quote in (result.get('quoteResponse') or {}).get('result') or []:
+            symbol = quote.get('symbol')
+            if symbol in chunk:
+                if 'volume' not in quote and 'regularMarketVolume' in quote:
+                    quote['volume'] = quote['regularMarketVolume']
+                quotes[symbol] = quote
+        return quotes
+
+    def _download_chunk(self, chunk):
+        """Price-only fallback built from a single multi-symbol download"""
+        frame = yf.download(chunk, period='1y', group_by='ticker', progress=False, threads=False,
+                            timeout=HTTP_TIMEOUT, session=yahoo_session())
+        quotes = {}
+        for symbol in chunk:
+            try:
+                history = frame[symbol] if len(chunk) > 1 else frame
+                closes = history['Close'].dropna()
+                if closes.empty:
+                    continue
+                last = float(closes.iloc[-1])
+                previous = float(closes.iloc[-2]) if len(closes) > 1 else last
+                quotes[symbol] = {
+                    'regularMarketPrice': last,
+                    'regularMarketChange': last - previous,
+                    'regularMarketChangePercent': (last - previous) / previous * 100 if previous else 0,
+                    'fiftyTwoWeekHigh': float(history['High'].max()),
+                    'fiftyTwoWeekLow': float(history['Low'].min()),
+                    'volume': float(history['Volume'].iloc[-1]),
+                }
+            except Exception:
+                continue
+        return quotes
+
+    def _get_fundamentals(self, symbols):
+        found = {}
+        for symbol in symbols:
+            fundamentals = self._fundamentals.get(symbol)
+            if fundamentals is not None:
+                found[symbol] = fundamentals
+        stale = [s for s in symbols if s not in found]
+        if not stale:
+            return found
+        if self.engine is not None and len(stale) > 1:
+            fetched = self.engine.fetch_many(self._fetch_fundamentals, stale, host=YAHOO_SUMMARY_HOST)
+        else:
+            fetched = {symbol: self._fetch_fundamentals(symbol) for symbol in stale}
+        for symbol, fundamentals in fetched.items():
+            if fundamentals is not None:
+                self._fundamentals.set(symbol, fundamentals)
+                found[symbol] = fundamentals
+        return found
+
+    def _fetch_fundamentals(self, symbol):
+        try:
+            info = self._call(getattr, yahoo_ticker(symbol), 'info') or {}
+        except Exception as e:
+            print(f"   ❌ Fundamentals error for {symbol}: {e}")
+            return None
+        return {key: info[key] for key in FUNDAMENTAL_FIELDS if key in info}
+
+
+class StaticQuoteProvider(QuoteProvider):
+    """Local stand-in serving fixed info dicts, with optional simulated latency"""
+
+    def __init__(self, quotes, latency=0.0, max_batch_size=50):
+        self.quotes = quotes
+        self.latency = latency
+        self.max_batch_size = max_batch_size
+        self.round_trips = 0
+
+    def fetch_quotes(self, symbols):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return {s: dict(self.quotes[s]) for s in symbols if s in self.quotes}
+
+
+class BatchQuoteFetcher:
+    """Splits a symbol list into provider-sized batches and merges the results
+
+    With a fetch engine the batches are requested concurrently (within its
+    limits); without one they run back to back.
+    """
+
+    def __init__(self, provider, batch_size=None, engine=None, host=YAHOO_HOST):
+        self.provider = provider
+        self.batch_size = batch_size or provider.max_batch_size
+        self.engine = engine
+        self.host = host
+
+    def fetch(self, symbols):
+        chunks = chunked(dict.fromkeys(symbols), self.batch_size)
+        if self.engine is not None and len(chunks) > 1:
+            batches = self.engine.map(self._fetch_chunk, chunks, host=self.host)
+        else:
+            batches = [self._fetch_chunk(chunk) for chunk in chunks]
+        return self._merge(batches)
+
+    def iter_batches(self, symbols):
+        """{symbol: info} of each provider batch, in the order the batches complete
+
+        With an engine every batch is requested up front, so the first ones
+        can be used while the rest are still in flight.
+        """
+        chunks = chunked(dict.fromkeys(symbols), self.batch_size)
+        if self.engine is None:
+            for chunk in chunks:
+                yield self._fetch_chunk(chunk)
+            return
+        pending = [self.engine.submit(self._fetch_chunk, chunk, host=self.host) for chunk in chunks]
+        for future in as_completed(pending):
+            try:
+                yield future.result()
+            except Exception as e:
+                print(f"   ❌ Batch failed: {e}")
+
+    async def fetch_async(self, symbols):
+        """fetch() as a coroutine on the engine's loop (requires an engine)"""
+        chunks = chunked(dict.fromkeys(symbols), self.batch_size)
+        return self._merge(await self.engine.gather(self._fetch_chunk, chunks, host=self.host))
+
+    @staticmethod
+    def _merge(batches):
+        results = {}
+        for batch in batches:
+            results.update(batch or {})
+        return results
+
+    def _fetch_chunk(self, chunk):
+        try:
+            return self.provider.fetch_quotes(chunk)
+        except Exception as e:
+            print(f"   ❌ Batch of {len(chunk)} symbols failed: {e}")
+            return {}
@@ -0,0 +1,187 @@
+"""
+Sorted range indexes for the criteria engine
+One sorted (value, row) index per criteria column over the universe store.
+A range predicate becomes a binary search; a screen starts from its most
+selective predicate's rows and narrows them with the other predicates, so
+it costs about its candidate count instead of the universe size
+"""
+import threading
+
+import numpy as np
+
+from criteria_engine import AnyAbovePredicate, RangePredicate, _coalesced_column
+
+
+class RangeSnapshot:
+    """One immutable sort of a column: rows by value, plus values by row
+
+    Rebuilds create a new snapshot, so a query holding one always sees
+    arrays from the same build.
+    """
+
+    __slots__ = ('order', 'sorted_values', 'values', 'position')
+
+    def __init__(self, order, sorted_values, values, position):
+        self.order = order
+        self.sorted_values = sorted_values
+        self.values = values
+        self.position = position
+
+    def bounds(self, minimum=None, maximum=None, above=None):
+        """(lo, hi) slice of `order` with minimum <= value <= maximum and value > above"""
+        values = self.sorted_values
+        lo, hi = 0, len(values)
+        if minimum is not None:
+            lo = max(lo, int(np.searchsorted(values, minimum, side='left')))
+        if above is not None:
+            lo = max(lo, int(np.searchsorted(values, above, side='right')))
+        if maximum is not None:
+            hi = min(hi, int(np.searchsorted(values, maximum, side='right')))
+        return lo, max(lo, hi)
+
+
+class RangeIndex:
+    """Rows of a store sorted by one (coalesced) criteria column
+
+    The sort order is a RangeSnapshot, replaced as a whole by build(); rows
+    changed since it was taken are reported by pending() so that callers
+    can add them to their candidates.
+    """
+
+    def __init__(self, store, columns):
+        self.store = store
+        self.columns = columns
+        self.snapshot = None
+        self.builds = 0
+
+    def build(self):
+        store = self.store
+        with store._lock:
+            position = store.change_position
+            n_rows = len(store)
+            # Same values (0 for missing, coalescing on 0) the predicates see
+            values = _coalesced_column(store, self.columns, n_rows)
+        order = np.argsort(values, kind='stable')
+        self.snapshot = RangeSnapshot(order, values[order], values, position)
+        self.builds += 1
+        return self.snapshot
+
+    def pending(self, snapshot):
+        """Rows changed since `snapshot`, or None when it must be rebuilt"""
+        if snapshot is None:
+            return None
+        changed = self.store.changes_since(snapshot.position)
+        # Changed rows are re-evaluated on every query; past a small share of
+        # the index a re-sort is cheaper
+        if changed is None or len(changed) > max(64, len(snapshot.order) // 64):
+            return None
+        return changed
+
+
+class RangeIndexSet:
+    """Lazily built RangeIndex per column tuple, plus the screen planner"""
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._indexes = {}
+        self.queries = 0
+        self.candidates_scanned = 0
+
+    def index(self, columns):
+        """Up-to-date snapshot of the index for `columns` and the rows changed since it"""
+        with self._lock:
+            index = self._indexes.get(columns)
+            if index is None:
+                index = self._indexes[columns] = RangeIndex(self.store, columns)
+            snapshot = index.snapshot
+            changed = index.pending(snapshot)
+            if changed is None:
+                snapshot = index.build()
+                changed = index.pending(snapshot)
+            return snapshot, changed
+
+    def _plan(self, predicate):
+        """Index lookup for one predicate, or None if it can't use an index
+
+        Returns (matching rows in the snapshots, changed rows, check) where
+        check(rows) tests rows against the snapshot values.
+        """
+        if isinstance(predicate, RangePredicate):
+            snapshot, changed = self.index(predicate.columns)
+            above = 0 if predicate.positive_only else None
+            lo, hi = snapshot.bounds(predicate.minimum, predicate.maximum, above=above)
+
+            def check(rows):
+                if hi <= lo:
+                    return np.zeros(len(rows), dtype=bool)
+                # Sorted, so exactly the values between the slice ends match
+                values = snapshot.values[rows]
+                return (values >= snapshot.sorted_values[lo]) & (values <= snapshot.sorted_values[hi - 1])
+            return snapshot.order[lo:hi], changed, check
+        if isinstance(predicate, AnyAbovePredicate):
+            parts, changes, snapshots = [], [], []
+            for column in predicate.columns:
+                snapshot, changed = self.index((column,))
+                lo, hi = snapshot.bounds(above=predicate.minimum)
+                parts.append(snapshot.order[lo:hi])
+                changes.append(changed)
+                snapshots.append(snapshot)
+
+            def check(rows):
+                result = np.zeros(len(rows), dtype=bool)
+                for snapshot in snapshots:
+                    result |= snapshot.values[rows] > predicate.minimum
+                return result
+            return np.unique(np.concatenate(parts)), np.concatenate(changes), check
+        return None
+
+    def select(self, compiled, accept=None):
+        """Rows of the store passing `compiled`, ascending
+
+        Candidates come from the most selective predicate's index range and
+        are narrowed by each further predicate's snapshot values, most
+        selective first. Rows changed since a snapshot was taken are
+        evaluated on their current values instead. `accept(rows) -> bool
+        mask` restricts the result to the caller's universe (e.g. symbols
+        with quotes).
+        """
+        self.queries += 1
+        plans = [self._plan(p) for p in compiled.predicates]
+        if not plans or any(plan is None for plan in plans):
+            candidates = np.arange(len(self.store), dtype=np.int64)
+            if accept is not None and len(candidates):
+                candidates = candidates[accept(candidates)]
+            self.candidates_scanned += len(candidates)
+            return candidates[compiled.mask(self.store.view(candidates))] if len(candidates) else candidates
+
+        plans.sort(key=lambda plan: len(plan[0]))
+        changed = np.unique(np.concatenate([plan[1] for plan in plans]))
+        candidates = plans[0][0]
+        if len(changed):
+            stale = np.zeros(max(len(self.store), int(changed[-1]) + 1), dtype=bool)
+            stale[changed] = True
+            candidates = candidates[~stale[candidates]]
+        for _, _, check in plans[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = candidates[check(candidates)]
+        self.candidates_scanned += len(plans[0][0])
+
+        if len(changed):
+            if accept is not None:
+                changed = changed[accept(changed)]
+            if len(changed):
+                changed = changed[compiled.mask(self.store.view(changed))]
+        if accept is not None and len(candidates):
+            candidates = candidates[accept(candidates)]
+        return np.union1d(candidates, changed)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'indexes': len(self._indexes),
+                'builds': sum(index.builds for index in self._indexes.values()),
+                'queries': self.queries,
+                'candidates_scanned': self.candidates_scanned,
+            }
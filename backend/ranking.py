@@ -0,0 +1,83 @@
+"""
+Top-K ranking over screen results
+Picks the best K rows by one or more sort keys with partial selection
+(np.argpartition) instead of sorting the whole filtered set
+"""
+import numpy as np
+
+from universe_store import FETCHED_AT_FIELDS, NUMERIC_FIELDS
+
+# Columns a ranking may sort on (stock_record() names)
+RANKABLE_FIELDS = tuple(field for field in NUMERIC_FIELDS if field not in FETCHED_AT_FIELDS)
+
+DEFAULT_K = 25
+MAX_K = 500
+
+
+def parse_sort(spec, default='roe:desc'):
+    """'roe:desc,marketCap' or '-roe,marketCap' -> [(field, descending)]
+
+    Keys without a direction rank descending, since "top" usually means
+    largest first.
+    """
+    keys = []
+    for part in (spec or default).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        descending = True
+        if part.startswith('-'):
+            part = part[1:]
+        elif part.startswith('+'):
+            part, descending = part[1:], False
+        if ':' in part:
+            part, direction = part.split(':', 1)
+            direction = direction.strip().lower()
+            if direction not in ('asc', 'desc'):
+                raise ValueError(f"sort direction must be 'asc' or 'desc', got '{direction}'")
+            descending = direction == 'desc'
+        field = part.strip()
+        if field not in RANKABLE_FIELDS:
+            raise ValueError(f"cannot rank by '{field}' (use one of {', '.join(RANKABLE_FIELDS)})")
+        keys.append((field, descending))
+    if not keys:
+        raise ValueError('no sort keys given')
+    return keys
+
+
+def _sort_column(store, rows, field, descending):
+    """Values where smaller ranks first; missing values rank last"""
+    values = store.column(field, rows).astype(np.float64)
+    if descending:
+        values = -values
+    return np.where(np.isnan(values), np.inf, values)
+
+
+def top_k_rows(store, rows, keys, k):
+    """The best `k` of `rows` by `keys`, ties broken by symbol
+
+    argpartition finds the k-th best value of the first key in O(n); only
+    rows at least that good (ties included) are fully sorted, so the cost is
+    O(n + c log c) for c candidates rather than O(n log n).
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    n = len(rows)
+    if n == 0 or k <= 0:
+        return rows[:0]
+    primary = _sort_column(store, rows, *keys[0])
+    if k < n:
+        kth = primary[np.argpartition(primary, k - 1)[k - 1]]
+        candidates = np.flatnonzero(primary <= kth)
+    else:
+        candidates = np.arange(n)
+
+    candidate_rows = rows[candidates]
+    symbols = np.array([store.symbols[row] for row in candidate_rows], dtype=object)
+    symbol_rank = np.argsort(np.argsort(symbols, kind='stable'), kind='stable')
+    # np.lexsort sorts by the last key first
+    sort_keys = [symbol_rank]
+    for field, descending in reversed(keys[1:]):
+        sort_keys.append(_sort_column(store, candidate_rows, field, descending))
+    sort_keys.append(primary[candidates])
+    order = np.lexsort(sort_keys)
+    return candidate_rows[order[:k]]
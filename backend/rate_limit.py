@@ -0,0 +1,218 @@
+"""
+Upstream politeness and protection
+A shared token-bucket rate limiter and a circuit breaker that every Yahoo
+Finance call goes through, replacing the fixed sleeps between requests
+"""
+import os
+import threading
+import time
+
+
+# Slowest rate a bucket refills at, so that a rate divided down to nothing
+# (e.g. by serve.py workers) still hands out a token now and then
+MIN_RATE = 0.01
+
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling upstream when we must not (or cannot) call it"""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class RateLimitTimeout(UpstreamUnavailable):
+    pass
+
+
+def is_rate_limited(error):
+    """True for HTTP 429 / Yahoo 'Too Many Requests' style errors"""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    if type(error).__name__ == 'YFRateLimitError':
+        return True
+    message = str(error).lower()
+    return '429' in message or 'too many requests' in message or 'rate limit' in message
+
+
+class TokenBucket:
+    """`rate` tokens per second (at least MIN_RATE), holding at most `burst`"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = float(burst)
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, rate):
+        self._rate = max(float(rate), MIN_RATE)
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until `tokens` are available; False if `timeout` runs out first"""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive errors (or one 429)
+
+    While open every call is refused. After `reset_timeout` seconds one
+    half-open probe is let through; success closes the breaker, failure
+    re-opens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self):
+        """Whether a call may go upstream now (claims the probe when half-open)"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def release_probe(self):
+        """Hand back a half-open probe that never reached upstream"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_failure(self, rate_limited=False):
+        with self._lock:
+            self._failures += 1
+            if (self._state == self.HALF_OPEN or rate_limited or
+                    self._failures >= self.failure_threshold):
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def stats(self):
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'trips': self.trips,
+                'rejected': self.rejected,
+            }
+
+
+class UpstreamGuard:
+    """Rate limiter + circuit breaker wrapped around an upstream call"""
+
+    def __init__(self, rate=5, burst=10, failure_threshold=5, reset_timeout=30, max_wait=30):
+        self.limiter = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @classmethod
+    def from_env(cls, prefix='YAHOO'):
+        return cls(
+            rate=float(os.environ.get(f'{prefix}_RATE_LIMIT', 5)),
+            burst=float(os.environ.get(f'{prefix}_BURST', 10)),
+            failure_threshold=int(os.environ.get(f'{prefix}_BREAKER_FAILURES', 5)),
+            reset_timeout=float(os.environ.get(f'{prefix}_BREAKER_RESET', 30)),
+        )
+
+    def is_open(self):
+        return self.breaker.state == CircuitBreaker.OPEN
+
+    def call(self, fn, *args, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError('upstream circuit is open')
+        if not self.limiter.acquire(timeout=self.max_wait):
+            # Waiting for a token is not an upstream failure
+            self.breaker.release_probe()
+            raise RateLimitTimeout('timed out waiting for a rate-limit token')
+        with self._lock:
+            self.calls += 1
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.breaker.record_failure(rate_limited=is_rate_limited(e))
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stats(self):
+        return {
+            'rate': self.limiter.rate,
+            'burst': self.limiter.burst,
+            'tokens_available': round(self.limiter.available, 2),
+            'calls': self.calls,
+            'breaker': self.breaker.stats(),
+        }
@@ -0,0 +1,279 @@
+"""
+Background refresh of the whole stock universe
+Keeps every CSV and indian_stocks symbol warm with continuous refresh
+cycles paced to a share of the Yahoo rate budget. Symbols users ask for
+jump the queue, so requests rarely have to wait on the network
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from rate_limit import MIN_RATE
+from universe_store import FETCHED_AT_FIELDS
+
+
+def _refresh_age(universe, row, now):
+    """Age of the older of a row's quote and screening data; None if either was never fetched"""
+    if row is None:
+        return None
+    ages = [universe.data_age(row, now, field=field) for field in FETCHED_AT_FIELDS]
+    return None if None in ages else max(ages)
+
+
+def universe_freshness(screener, now=None):
+    """How many universe symbols are fresh, stale or never fetched"""
+    now = now if now is not None else time.time()
+    symbols = screener.universe_symbols()
+    universe = screener.universe
+    ages = []
+    missing = 0
+    for symbol in symbols:
+        age = _refresh_age(universe, universe.row_of(symbol), now)
+        if age is None:
+            missing += 1
+        else:
+            ages.append(age)
+    ttl = screener.cache_timeout
+    fresh = sum(1 for age in ages if age < ttl)
+    return {
+        'symbols': len(symbols),
+        'fresh': fresh,
+        'stale': len(ages) - fresh,
+        'missing': missing,
+        'fresh_percent': round(fresh / len(symbols) * 100, 1) if symbols else 0.0,
+        'oldest_age': max(ages) if ages else None,
+        'median_age': float(np.median(ages)) if ages else None,
+    }
+
+
+class UniverseRefresher:
+    """Refresh cycles over screener.universe_symbols(), stalest first
+
+    Each step takes one provider batch: pending priority symbols first, then
+    the next symbols of the current cycle. After a step it sleeps long enough
+    that refreshes use at most `budget_share` of the upstream rate limit,
+    leaving the rest for user requests. A finished cycle waits for
+    `cycle_interval` seconds (from its start) before the next one begins,
+    waking early for priority work.
+    """
+
+    def __init__(self, screener, cycle_interval=None, budget_share=0.5, batch_size=None):
+        self.screener = screener
+        self.cycle_interval = cycle_interval if cycle_interval is not None else screener.cache_timeout
+        self.budget_share = budget_share
+        self.batch_size = batch_size or screener.quote_provider.max_batch_size
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # symbol -> times requested since it was last refreshed
+        self._priority = OrderedDict()
+
+        self.cycle = 0
+        self.cycle_started_at = None
+        self.cycle_total = 0
+        self.cycle_position = 0
+        self.last_cycle_seconds = None
+        self.last_cycle_completed_at = None
+        self.refreshed = 0
+        self.failed = 0
+        self.priority_refreshed = 0
+
+    @classmethod
+    def from_env(cls, screener):
+        return cls(
+            screener,
+            cycle_interval=float(os.environ.get('REFRESH_CYCLE_INTERVAL', screener.cache_timeout)),
+            budget_share=float(os.environ.get('REFRESH_BUDGET_SHARE', 0.5)),
+        )
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the refresh thread; False if it was already running"""
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='universe-refresher', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def prioritize(self, symbol):
+        """Refresh `symbol` ahead of the cycle (a user asked for it)"""
+        with self._lock:
+            self._priority[symbol] = self._priority.get(symbol, 0) + 1
+        self._wake.set()
+
+    # ------------------------------------------------------------------ #
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._run_cycle()
+            except Exception as e:
+                print(f"⚠️ Refresh cycle failed: {e}")
+                self._stop.wait(5)
+
+    def _run_cycle(self):
+        queue = self._cycle_order()
+        started = time.time()
+        with self._lock:
+            self.cycle += 1
+            self.cycle_started_at = started
+            self.cycle_total = len(queue)
+            self.cycle_position = 0
+        print(f"🔄 Refresh cycle {self.cycle}: {len(queue)} symbols")
+
+        position = 0
+        while position < len(queue) and not self._stop.is_set():
+            batch, from_queue = self._next_batch(queue, position)
+            position += from_queue
+            self._refresh(batch)
+            with self._lock:
+                self.cycle_position = position
+
+        elapsed = time.time() - started
+        with self._lock:
+            self.last_cycle_seconds = round(elapsed, 1)
+            self.last_cycle_completed_at = time.time()
+        print(f"✅ Refresh cycle {self.cycle} done in {elapsed:.1f}s")
+        # New workers start from this instead of refetching
+        try:
+            self.screener.save_snapshot()
+        except Exception as e:
+            print(f"⚠️ Could not write universe snapshot: {e}")
+
+        # Idle until the next cycle, serving priority requests meanwhile
+        while not self._stop.is_set():
+            remaining = self.cycle_interval - (time.time() - started)
+            if remaining <= 0:
+                break
+            self._wake.wait(remaining)
+            self._wake.clear()
+            batch, _ = self._next_batch([], 0)
+            if batch:
+                self._refresh(batch)
+
+    def _cycle_order(self):
+        """Universe symbols, never-fetched first, then oldest data first"""
+        symbols = self.screener.universe_symbols()
+        universe = self.screener.universe
+        now = time.time()
+        ages = np.full(len(symbols), np.inf)
+        for i, symbol in enumerate(symbols):
+            age = _refresh_age(universe, universe.row_of(symbol), now)
+            if age is not None:
+                ages[i] = age
+        return [symbols[i] for i in np.argsort(-ages, kind='stable')]
+
+    def _next_batch(self, queue, position):
+        """(batch, number of symbols it consumed from `queue`)"""
+        with self._lock:
+            batch = list(self._priority)[:self.batch_size]
+            for symbol in batch:
+                del self._priority[symbol]
+            self.priority_refreshed += len(batch)
+        taken = dict.fromkeys(batch)
+        consumed = 0
+        while len(taken) < self.batch_size and position + consumed < len(queue):
+            taken.setdefault(queue[position + consumed])
+            consumed += 1
+        return list(taken), consumed
+
+    def _refresh(self, batch):
+        guard = self.screener.upstream
+        if guard.is_open():
+            # Don't spend the half-open probe on background work
+            reset = guard.breaker.reset_timeout
+            print(f"⛔ Yahoo circuit open, pausing refresh for {reset:.0f}s")
+            with self._lock:
+                for symbol in batch:
+                    self._priority.setdefault(symbol, 0)
+            self._stop.wait(reset)
+            return
+
+        calls_before = guard.calls
+        refreshed = self.screener.refresh_symbols(batch)
+        with self._lock:
+            self.refreshed += len(refreshed)
+            self.failed += len(batch) - len(refreshed)
+
+        # Keep to our share of the rate budget
+        calls = guard.calls - calls_before
+        pause = calls / max(guard.limiter.rate * self.budget_share, MIN_RATE) if calls else 0
+        if pause:
+            self._stop.wait(pause)
+
+    # ------------------------------------------------------------------ #
+    def freshness(self, now=None):
+        return universe_freshness(self.screener, now)
+
+    def stats(self):
+        with self._lock:
+            progress = {
+                'running': self.running,
+                'cycle': self.cycle,
+                'cycle_started_at': self.cycle_started_at,
+                'cycle_position': self.cycle_position,
+                'cycle_total': self.cycle_total,
+                'cycle_percent': round(self.cycle_position / self.cycle_total * 100, 1) if self.cycle_total else 0.0,
+                'last_cycle_seconds': self.last_cycle_seconds,
+                'last_cycle_completed_at': self.last_cycle_completed_at,
+                'cycle_interval': self.cycle_interval,
+                'budget_share': self.budget_share,
+                'refreshed': self.refreshed,
+                'failed': self.failed,
+                'priority_pending': len(self._priority),
+                'priority_refreshed': self.priority_refreshed,
+            }
+        progress['freshness'] = self.freshness()
+        return progress
+
+
+class RemoteRefresher:
+    """Stands in for UniverseRefresher in serve.py workers
+
+    The refresher runs in its own process. prioritize() forwards symbols to
+    it over `queue` (a multiprocessing.SimpleQueue), so workers never start
+    refreshes of their own.
+    """
+
+    running = True
+
+    def __init__(self, screener, queue):
+        self.screener = screener
+        self.queue = queue
+        self.forwarded = 0
+
+    def start(self):
+        return False
+
+    def stop(self, timeout=None):
+        pass
+
+    def prioritize(self, symbol):
+        self.queue.put(symbol)
+        self.forwarded += 1
+
+    def freshness(self, now=None):
+        return universe_freshness(self.screener, now)
+
+    def stats(self):
+        return {
+            'running': True,
+            'remote': True,
+            'forwarded': self.forwarded,
+            'freshness': self.freshness(),
+        }
@@ -0,0 +1,117 @@
+"""
+Encoded API responses, cached per data generation
+A route's JSON is serialized once per (route, parameters, generation) and
+kept with a strong ETag and its gzip / brotli encodings, so polling
+clients cost a cache lookup, and a 304 without a body when they send the
+ETag back in If-None-Match
+"""
+import gzip
+import hashlib
+import os
+
+from flask import Response, current_app, request
+
+from stock_cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # brotli is optional: gzip and identity only
+    brotli = None
+
+# Smaller bodies are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+
+class EncodedResponse:
+    """One serialized 200 response: body, ETag and lazily built encodings"""
+
+    def __init__(self, body, mimetype):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha1(body).hexdigest()
+        self._encoded = {'identity': body}
+
+    def encoded(self, encoding):
+        body = self._encoded.get(encoding)
+        if body is None:
+            if encoding == 'br':
+                body = brotli.compress(self.body, quality=5)
+            else:
+                body = gzip.compress(self.body, compresslevel=6, mtime=0)
+            # Concurrent first requests may both compress; either result is kept
+            self._encoded[encoding] = body
+        return body
+
+    def encoding_for(self, accept_encodings):
+        """Best encoding the client accepts: br, then gzip, then identity"""
+        if len(self.body) >= MIN_COMPRESS_BYTES:
+            if brotli is not None and accept_encodings['br'] > 0:
+                return 'br'
+            if accept_encodings['gzip'] > 0:
+                return 'gzip'
+        return 'identity'
+
+    def response(self):
+        """Response to the current request: 304 when it already has this body"""
+        if request.if_none_match.contains_weak(self.etag):
+            response = Response(status=304)
+        else:
+            encoding = self.encoding_for(request.accept_encodings)
+            response = Response(self.encoded(encoding), mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(self.etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        # Clients revalidate on every poll; unchanged data costs a 304
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+
+class ResponseCache:
+    """EncodedResponses by (key, generation)
+
+    A new generation means new data, so the key is rendered again; `ttl`
+    also bounds how long one rendering is served, since bodies carry
+    timestamps and data ages.
+    """
+
+    def __init__(self, ttl=30, max_entries=512):
+        self._cache = TTLCache(ttl=ttl, max_entries=max_entries)
+        self.renders = 0
+        self.not_modified = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            ttl=float(os.environ.get('RESPONSE_CACHE_TTL', 30)),
+            max_entries=int(os.environ.get('RESPONSE_CACHE_ENTRIES', 512)),
+        )
+
+    def respond(self, key, generation, render):
+        """Cached response for `key` at `generation`, calling render() on a miss
+
+        render() returns anything a Flask view may; only 200 JSON responses
+        are cached, others are returned as they are. `generation` may be a
+        function instead, for renders that move it themselves (e.g. by
+        fetching what they show): it is called again after render() and the
+        body is stored under what it returns then.
+        """
+        entry = self._cache.get((key, generation() if callable(generation) else generation))
+        if entry is None:
+            response = current_app.make_response(render())
+            if response.status_code != 200 or response.is_streamed:
+                return response
+            self.renders += 1
+            entry = EncodedResponse(response.get_data(), response.mimetype)
+            self._cache.set((key, generation() if callable(generation) else generation), entry)
+        response = entry.response()
+        if response.status_code == 304:
+            self.not_modified += 1
+        return response
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return dict(self._cache.stats(), renders=self.renders, not_modified=self.not_modified,
+                    brotli=brotli is not None)
@@ -0,0 +1,137 @@
+"""
+Pre-forked multi-process serving
+One listening socket shared by N worker processes, each running the app on
+werkzeug's threaded server. For the clean screener a separate refresher
+process owns the background refresh: it publishes the universe through the
+mmapped snapshot file, which the workers adopt as it changes, and workers
+forward the symbols they want refreshed to it.
+
+    python serve.py [clean|enhanced|tradingview] --workers N --port 5001
+
+The supervisor imports nothing from the apps. Every child imports its app
+after the fork, so no threads, sockets or SQLite connections are inherited,
+and a worker that dies is replaced.
+"""
+import argparse
+import importlib
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+
+APPS = {
+    'clean': 'clean_screener',
+    'enhanced': 'enhanced_screener',
+    'tradingview': 'python_app',
+}
+
+# Seconds to wait before replacing a child that exited sooner than this
+RESPAWN_BACKOFF = 1.0
+
+
+def _run_refresher(module_name, queue):
+    module = importlib.import_module(module_name)
+    module.screener.serve_as_refresher(queue)
+    signal.pause()
+
+
+def _run_worker(module_name, sock, queue, workers):
+    from werkzeug.serving import make_server
+
+    module = importlib.import_module(module_name)
+    if queue is not None:
+        module.screener.serve_as_worker(queue, workers)
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, module.app, threaded=True, fd=sock.fileno())
+    print(f"👷 Worker {os.getpid()} serving {module_name}")
+    server.serve_forever()
+
+
+def _coordinated(module_name):
+    # Only the clean screener has a refresher to run apart from the workers
+    return module_name == 'clean_screener'
+
+
+class Supervisor:
+    """Forks the refresher and worker processes and replaces any that exit"""
+
+    def __init__(self, module_name, sock, workers):
+        self.module_name = module_name
+        self.sock = sock
+        self.workers = workers
+        self.queue = multiprocessing.SimpleQueue() if _coordinated(module_name) else None
+        # pid -> (role, started at)
+        self.children = {}
+        self.stopping = False
+
+    def _spawn(self, role):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                if role == 'refresher':
+                    _run_refresher(self.module_name, self.queue)
+                else:
+                    _run_worker(self.module_name, self.sock, self.queue, self.workers)
+            except BaseException as e:
+                print(f"💥 {role} {os.getpid()} failed: {e}")
+                code = 1
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        self.children[pid] = (role, time.monotonic())
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        if self.queue is not None:
+            self._spawn('refresher')
+        for _ in range(self.workers):
+            self._spawn('worker')
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            role, started = self.children.pop(pid, (None, None))
+            if role is None or self.stopping:
+                continue
+            print(f"⚠️ {role} {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            if time.monotonic() - started < RESPAWN_BACKOFF:
+                time.sleep(RESPAWN_BACKOFF)
+            self._spawn(role)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve a screener app from pre-forked worker processes')
+    parser.add_argument('app', nargs='?', default='clean', choices=sorted(APPS))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('SERVE_WORKERS', os.cpu_count() or 1)))
+    parser.add_argument('--host', default=os.environ.get('SERVE_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('SERVE_PORT', 5001)))
+    args = parser.parse_args(argv)
+
+    # Children import the app modules from here, as the dev servers do
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sock = socket.create_server((args.host, args.port), backlog=1024)
+    sock.set_inheritable(True)
+    print(f"🚀 Serving {args.app} on http://{args.host}:{args.port} with {args.workers} workers")
+    Supervisor(APPS[args.app], sock, max(1, args.workers)).run()
+
+
+if __name__ == '__main__':
+    main()
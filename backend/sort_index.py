@@ -0,0 +1,255 @@
+"""
+Presorted row indexes and cursor pagination
+Sort orders over universe rows are built once per version of the columns
+they read and kept as immutable snapshots; opaque cursors point into a snapshot, so every
+page is an O(page size) slice and paging keeps a stable order while the
+data is being reloaded
+"""
+import base64
+import binascii
+import itertools
+import json
+import secrets
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _quote_or_screener(quote_field, screener_field, fallback=0.0):
+    """Yahoo value where the row has a quote, else the screener.in value"""
+    def values(store, rows):
+        has_quote = ~store.null_mask('currentPrice')[rows]
+        if screener_field is None:
+            return np.where(has_quote, np.nan_to_num(store.column(quote_field, rows), nan=fallback), fallback)
+        quote = np.nan_to_num(store.column(quote_field, rows), nan=0.0)
+        screener = np.nan_to_num(store.column(screener_field, rows), nan=0.0)
+        return np.where(has_quote, quote, screener)
+    values.columns = (quote_field,) if screener_field is None else (quote_field, screener_field)
+    return values
+
+
+def _price_diff(store, rows):
+    price = _quote_or_screener('currentPrice', 'screener_price')(store, rows)
+    screener_price = np.nan_to_num(store.column('screener_price', rows), nan=0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diff = (price - screener_price) / screener_price * 100
+    return np.where(screener_price > 0, diff, 0.0)
+
+
+_price_diff.columns = ('currentPrice', 'screener_price')
+
+
+def _quote_only(field, fallback=0.0):
+    def values(store, rows):
+        has_quote = ~store.null_mask('currentPrice')[rows]
+        return np.where(has_quote, np.nan_to_num(store.column(field, rows), nan=0.0), fallback)
+    values.columns = (field,)
+    return values
+
+
+# Sort key -> values as shown on the your-stocks page (enriched_record());
+# each function lists the store columns it reads in .columns
+NUMERIC_SORT_KEYS = {
+    'price': _quote_or_screener('currentPrice', 'screener_price'),
+    'pe': _quote_or_screener('peRatio', 'screener_pe'),
+    'roe': _quote_or_screener('roe', 'screener_roe'),
+    'debt_equity': _quote_or_screener('debtToEquity', 'screener_debt_equity'),
+    'market_cap': _quote_or_screener('marketCap', None, fallback=1000.0),
+    'price_diff': _price_diff,
+    'change_percent': _quote_only('changePercent'),
+    'volume': _quote_only('volume', fallback=100000.0),
+}
+SORT_KEYS = ('name',) + tuple(NUMERIC_SORT_KEYS)
+# enriched_record() field showing each numeric sort key's value
+SORT_KEY_FIELDS = {
+    'price': 'yahoo_current_price',
+    'pe': 'yahoo_pe_ratio',
+    'roe': 'yahoo_roe',
+    'debt_equity': 'yahoo_debt_equity',
+    'market_cap': 'yahoo_market_cap',
+    'price_diff': 'price_diff_percent',
+    'change_percent': 'yahoo_change_percent',
+    'volume': 'yahoo_volume',
+}
+ORDERS = ('asc', 'desc')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(snapshot_id, position, key, order, last_symbol):
+    payload = json.dumps([snapshot_id, position, key, order, last_symbol], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(snapshot_id, position, key, order, last_symbol) from an opaque cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        snapshot_id, position, key, order, last_symbol = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidCursor('invalid cursor')
+    if not isinstance(snapshot_id, str) or not isinstance(position, int) or position < 0:
+        raise InvalidCursor('invalid cursor')
+    return snapshot_id, position, key, order, last_symbol
+
+
+class SortSnapshot:
+    """One immutable sort order of a set of rows
+
+    Numeric orders keep the values they were sorted by (`values`, None for
+    name orders), so pages can show the order they are sliced from.
+    """
+
+    def __init__(self, snapshot_id, key, order, generation, rows, symbols, values=None):
+        self.id = snapshot_id
+        self.key = key
+        self.order = order
+        self.generation = generation
+        self.rows = rows
+        self.symbols = symbols
+        self.values = values
+        self._positions = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def resumes(self, position, key, order, last_symbol):
+        """Whether a cursor's (position, key, order, last_symbol) points into this order"""
+        if key != self.key or order != self.order or position > len(self):
+            return False
+        return last_symbol == (self.symbols[position - 1] if position else None)
+
+    def position_after(self, symbol):
+        """Position following `symbol`, or None if it is not in this order"""
+        if self._positions is None:
+            self._positions = {s: i for i, s in enumerate(self.symbols)}
+        position = self._positions.get(symbol)
+        return None if position is None else position + 1
+
+
+def _generation(store, key):
+    """What a snapshot for `key` is built from: it is reused until this changes"""
+    if key == 'name':
+        return store.csv_generation
+    # Every numeric key switches between Yahoo and screener.in values on
+    # whether the row has a quote (currentPrice is set)
+    return (store.csv_generation, store.null_version('currentPrice'),
+            store.column_version(*NUMERIC_SORT_KEYS[key].columns))
+
+
+class SortIndexCache:
+    """Sort snapshots of a row set, rebuilt when the columns they read change
+
+    Name orders only depend on the CSV, so they follow the store's
+    csv_generation; numeric orders follow the versions of the columns of
+    their key, so quote updates to other fields leave them in place. Recent
+    snapshots are retained (up to `max_snapshots`) so that cursors handed
+    out before a reload keep paging through the order they started with.
+    Snapshot ids carry a random per-cache prefix, so a cursor handed out by
+    another cache (another worker, or the one a reload replaced) never
+    resolves to an unrelated snapshot here.
+    """
+
+    def __init__(self, store, max_snapshots=32):
+        self.store = store
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._current = {}
+        self._snapshots = OrderedDict()
+        self._id_prefix = secrets.token_hex(6)
+        self._ids = itertools.count(1)
+        self.builds = 0
+
+    def snapshot(self, rows, key='name', order='asc'):
+        """Current snapshot for (key, order) over `rows`"""
+        if key not in SORT_KEYS:
+            raise ValueError(f"unknown sort key '{key}' (use one of {', '.join(SORT_KEYS)})")
+        if order not in ORDERS:
+            raise ValueError("order must be 'asc' or 'desc'")
+        generation = _generation(self.store, key)
+        with self._lock:
+            snapshot = self._current.get((key, order))
+            if snapshot is not None and snapshot.generation == generation and len(snapshot) == len(rows):
+                return snapshot
+        snapshot = self._build(rows, key, order, generation)
+        with self._lock:
+            self._current[(key, order)] = snapshot
+            self._snapshots[snapshot.id] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def get(self, snapshot_id):
+        with self._lock:
+            return self._snapshots.get(snapshot_id)
+
+    def _build(self, rows, key, order, generation):
+        rows = np.array(rows, dtype=np.int64)
+        store = self.store
+        names = np.array([(n or '').lower() for n in store.column('name', rows)], dtype=object)
+        # np.lexsort wants sortable arrays: rank the names first
+        name_rank = np.unique(names, return_inverse=True)[1]
+        values = None
+        if key == 'name':
+            primary = name_rank.astype(np.float64)
+        else:
+            values = NUMERIC_SORT_KEYS[key](store, rows).astype(np.float64)
+            primary = values
+        if order == 'desc':
+            primary = -primary
+        # Ties break on name, then on symbol so the order is total
+        symbols = [store.symbols[row] for row in rows]
+        symbol_rank = np.argsort(np.argsort(np.array(symbols, dtype=object), kind='stable'), kind='stable')
+        ordering = np.lexsort((symbol_rank, name_rank, primary))
+        self.builds += 1
+        return SortSnapshot(f'{self._id_prefix}.{next(self._ids)}', key, order, generation,
+                            rows[ordering], [symbols[i] for i in ordering],
+                            None if values is None else values[ordering])
+
+    def page(self, rows, per_page, key='name', order='asc', cursor=None, page=1):
+        """(row slice, page info) for a cursor, or for a 1-based page number
+
+        A cursor whose snapshot is not (or no longer) in this cache resumes
+        after its last symbol in the current order.
+        """
+        snapshot = None
+        if cursor:
+            snapshot_id, start, key, order, last_symbol = decode_cursor(cursor)
+            snapshot = self.get(snapshot_id)
+            if snapshot is None or not snapshot.resumes(start, key, order, last_symbol):
+                snapshot = self.snapshot(rows, key, order)
+                start = snapshot.position_after(last_symbol) if last_symbol else 0
+                if start is None:
+                    start = 0
+        else:
+            snapshot = self.snapshot(rows, key, order)
+            start = (page - 1) * per_page
+
+        total = len(snapshot)
+        start = max(0, min(start, total))
+        end = min(start + per_page, total)
+        page_rows = snapshot.rows[start:end]
+
+        next_cursor = None
+        if end < total:
+            next_cursor = encode_cursor(snapshot.id, end, snapshot.key, snapshot.order, snapshot.symbols[end - 1] if end else None)
+        prev_cursor = None
+        if start > 0:
+            prev_start = max(0, start - per_page)
+            prev_cursor = encode_cursor(snapshot.id, prev_start, snapshot.key, snapshot.order,
+                                        snapshot.symbols[prev_start - 1] if prev_start else None)
+        return page_rows, {
+            'sort': snapshot.key,
+            'order': snapshot.order,
+            'start': start,
+            'end': end,
+            'total': total,
+            'snapshot': snapshot.id,
+            # What each row was ordered by (None for name orders)
+            'values': None if snapshot.values is None else snapshot.values[start:end].tolist(),
+            'next_cursor': next_cursor,
+            'prev_cursor': prev_cursor,
+        }
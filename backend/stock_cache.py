@@ -0,0 +1,283 @@
+"""
+Caching tiers for provider responses
+A bounded, thread-safe TTL + LRU memory cache, a persistent SQLite tier
+that keeps normalized stock records across restarts, and single-flight
+coalescing of concurrent fetches for the same key
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+
+def estimate_size(value):
+    """Rough byte size of a cached value (dicts/lists of scalars)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(sys.getsizeof(v) for v in value)
+    return size
+
+
+class TTLCache:
+    """LRU cache with monotonic-clock expiry and an entry and/or byte budget
+
+    All operations take a single lock, so it is safe to share between
+    ThreadPoolExecutor workers and request threads. With `max_stale` set,
+    expired entries are kept until that age so get_entry() can serve them
+    while a refresh runs (stale-while-revalidate).
+    """
+
+    def __init__(self, ttl=300, max_entries=1024, max_bytes=None, max_stale=None, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, stored_at, size); ordered oldest -> most recently used
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    @property
+    def retention(self):
+        """How long an entry is kept at all (fresh or stale)"""
+        return max(self.ttl, self.max_stale or 0)
+
+    def get(self, key, default=None):
+        """Fresh value for `key`, or `default` on a miss / expired entry"""
+        entry = self.get_entry(key, allow_stale=False)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key, allow_stale=True):
+        """(value, age_seconds) for `key`; stale entries only with allow_stale"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at, size = entry
+            age = self._clock() - stored_at
+            if age >= self.retention:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            if age >= self.ttl:
+                if not allow_stale:
+                    self.misses += 1
+                    return None
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            self._entries.move_to_end(key)
+            return value, age
+
+    def set(self, key, value, age=0):
+        """Store `value`; `age` backdates entries restored from another tier"""
+        size = estimate_size(value) if self.max_bytes else 0
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, self._clock() - age, size)
+            self._bytes += size
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self):
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries) or
+            (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes if self.max_bytes else None,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'max_stale': self.max_stale,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class PersistentStockCache:
+    """SQLite-backed tier of normalized stock records with their fetch times
+
+    Timestamps are wall-clock epoch seconds so ages stay meaningful across
+    restarts. Records older than `max_age` are pruned on open.
+    """
+
+    def __init__(self, path, max_age=7 * 86400):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS stock_records ('
+            ' key TEXT PRIMARY KEY,'
+            ' payload TEXT NOT NULL,'
+            ' fetched_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        self.prune()
+
+    def get(self, key):
+        """(value, fetched_at) for `key`, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT payload, fetched_at FROM stock_records WHERE key = ?', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, fetched_at=None):
+        fetched_at = fetched_at if fetched_at is not None else time.time()
+        payload = json.dumps(value, default=str)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO stock_records (key, payload, fetched_at) VALUES (?, ?, ?)',
+                (key, payload, fetched_at),
+            )
+            self._conn.commit()
+
+    def load_all(self, prefix=''):
+        """Every (key, value, fetched_at) whose key starts with `prefix`"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT key, payload, fetched_at FROM stock_records WHERE substr(key, 1, ?) = ?',
+                (len(prefix), prefix),
+            ).fetchall()
+        return [(key, json.loads(payload), fetched_at) for key, payload, fetched_at in rows]
+
+    def prune(self):
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            self._conn.execute('DELETE FROM stock_records WHERE fetched_at < ?', (cutoff,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM stock_records').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-flight call
+
+    The first caller for a key runs the function; callers arriving while it
+    is running wait on the same Future and get its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+    def future(self, key, start, *args, **kwargs):
+        """Future of the in-flight call for `key` without waiting on it
+
+        When nothing is in flight for `key`, start(*args, **kwargs) must
+        begin the call and return a concurrent.futures.Future for it. do()
+        callers of the same key share that call too.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = start(*args, **kwargs)
+            self._calls[key] = future
+            self.leaders += 1
+
+        def done(_):
+            with self._lock:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+        future.add_done_callback(done)
+        return future
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._calls), 'leaders': self.leaders, 'coalesced': self.coalesced}
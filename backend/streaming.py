@@ -0,0 +1,88 @@
+"""
+Streaming responses for the screen endpoints
+Sends each passing stock as soon as it is evaluated, as newline-delimited
+JSON or Server-Sent Events, followed by a trailer with totals and timing
+"""
+import time
+
+from flask import Response, current_app
+
+from projection import project
+
+NDJSON = 'ndjson'
+SSE = 'sse'
+
+MIMETYPES = {
+    NDJSON: 'application/x-ndjson',
+    SSE: 'text/event-stream',
+}
+
+
+def stream_format(request):
+    """'ndjson' or 'sse' if the client asked for a stream, else None
+
+    Either ?stream=ndjson|sse (?stream=1 means ndjson) or an Accept header
+    of application/x-ndjson / text/event-stream.
+    """
+    requested = (request.args.get('stream') or '').lower()
+    if requested in (NDJSON, SSE):
+        return requested
+    if requested in ('1', 'true', 'yes'):
+        return NDJSON
+    accept = request.headers.get('Accept', '')
+    if MIMETYPES[SSE] in accept:
+        return SSE
+    if MIMETYPES[NDJSON] in accept:
+        return NDJSON
+    return None
+
+
+def _encode(dumps, fmt, event, payload):
+    if fmt == SSE:
+        return f"event: {event}\ndata: {dumps(payload, separators=(',', ':'))}\n\n"
+    return dumps(dict(payload, type=event), separators=(',', ':')) + '\n'
+
+
+def stream_stocks(fmt, stocks, trailer=None, fields=None):
+    """Response streaming `stocks` (any iterable) then a 'trailer' event
+
+    Each stock goes out as a 'stock' event ({"type": "stock", "data": {...}}
+    in NDJSON). The trailer carries `trailer` (a dict, or a callable that
+    returns one once the stocks are exhausted) plus total, elapsed time and
+    time to first result. An exception mid-stream ends it with an 'error'
+    event instead. `fields` projects every stock (see projection.py).
+
+    Events are encoded compactly by the app's JSON provider, as jsonify()
+    would (orjson under FastJSONProvider, else the stdlib). It is looked up
+    here since the stream runs after the request context is gone.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        started = time.time()
+        first_at = None
+        total = 0
+        try:
+            for stock in stocks:
+                if first_at is None:
+                    first_at = time.time()
+                total += 1
+                yield _encode(dumps, fmt, 'stock', {'data': project(stock, fields)})
+        except Exception as e:
+            print(f"💥 Stream failed after {total} stocks: {e}")
+            yield _encode(dumps, fmt, 'error', {'status': 'error', 'message': str(e), 'total': total})
+            return
+        summary = dict((trailer() if callable(trailer) else trailer) or {})
+        summary.update({
+            'status': 'success',
+            'total': total,
+            'elapsed': round(time.time() - started, 3),
+            'time_to_first_result': round(first_at - started, 3) if first_at is not None else None,
+        })
+        yield _encode(dumps, fmt, 'trailer', summary)
+
+    return Response(generate(), mimetype=MIMETYPES[fmt], headers={
+        'Cache-Control': 'no-cache',
+        # Stop reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no',
+    })
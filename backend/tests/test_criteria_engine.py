@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from criteria_engine import CRITERIA_FIELDS, compile_criteria, filter_stocks
+from enhanced_screener import PREDEFINED_FILTERS
+from universe_store import UniverseStore
+
+# Store field per criteria key in the fixture records
+FIELDS = {
+    'marketCap': (0, 100000),
+    'peRatio': (-10, 60),
+    'roe': (-10, 40),
+    'roe_growth': (-5, 5),
+    'omp_growth': (-5, 5),
+    'debtToEquity': (0, 3),
+    'currentRatio': (0, 3),
+    'salesGrowth': (-20, 40),
+    'profitGrowth': (-20, 40),
+    'pat_growth': (-5, 5),
+    'pledged_percent': (0, 2),
+    'promoter_holding_change': (-2, 2),
+    'avg_roe_5y': (0, 30),
+    'fii_holding': (0, 20),
+    'dii_holding': (0, 20),
+}
+
+
+def _records(n=1500, seed=11):
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(n):
+        record = {}
+        for field, (low, high) in FIELDS.items():
+            draw = rng.random()
+            if draw < 0.08:
+                continue  # missing: reads as 0
+            record[field] = 0.0 if draw < 0.12 else float(rng.uniform(low, high))
+        records.append(record)
+    return records
+
+
+@pytest.fixture(scope='module')
+def records():
+    return _records()
+
+
+@pytest.fixture(scope='module')
+def store(records):
+    store = UniverseStore()
+    for i, record in enumerate(records):
+        store.upsert(f'S{i}', record)
+    return store
+
+
+def _legacy_meets_criteria(stock, criteria):
+    """The per-filter checks the screeners ran before the criteria engine
+
+    Only the bounds listed here were ever checked (e.g. a 'max' on roe was
+    ignored); OPM growth reads the stored omp_growth, the old key typo aside.
+    """
+    def value(key):
+        return stock.get(key, 0)
+
+    checks = {
+        'marketCap': (value('marketCap'), ('min', 'max')),
+        'peRatio': (value('peRatio'), ('min', 'max')),
+        'roe': (value('roe'), ('min',)),
+        'debtToEquity': (value('debtToEquity'), ('max',)),
+        'currentRatio': (value('currentRatio'), ('min',)),
+        'salesGrowth': (value('salesGrowth'), ('min',)),
+        'profitGrowth': (value('profitGrowth'), ('min',)),
+        'roe_growth': (value('roe_growth'), ('min',)),
+        'opm_growth': (value('omp_growth'), ('min',)),
+        'pat_growth': (value('pat_growth'), ('min',)),
+        'sales_growth': (value('salesGrowth') or value('sales_growth'), ('min',)),
+        'pledged_percent': (value('pledged_percent'), ('max',)),
+        'promoter_holding_change': (value('promoter_holding_change'), ('min',)),
+        'avg_roe_5y': (value('avg_roe_5y'), ('min',)),
+    }
+    for key, bounds in criteria.items():
+        if key == 'institutional_holding':
+            if 'min' in bounds and not (value('fii_holding') > bounds['min'] or value('dii_holding') > bounds['min']):
+                return False
+            continue
+        if key == 'peRatio' and value('peRatio') <= 0:
+            return False
+        current, enforced = checks[key]
+        if 'min' in enforced and 'min' in bounds and current < bounds['min']:
+            return False
+        if 'max' in enforced and 'max' in bounds and current > bounds['max']:
+            return False
+    return True
+
+
+def _all_bounds_reference(stock, criteria):
+    """Every min and max enforced on the coalesced column"""
+    for key, bounds in criteria.items():
+        columns = CRITERIA_FIELDS[key]
+        current = next((stock[c] for c in columns if stock.get(c, 0) != 0), 0)
+        if key == 'peRatio' and current <= 0:
+            return False
+        if current < bounds.get('min', -np.inf) or current > bounds.get('max', np.inf):
+            return False
+    return True
+
+
+@pytest.mark.parametrize('name', sorted(PREDEFINED_FILTERS))
+def test_predefined_filters_match_the_per_filter_checks(store, records, name):
+    criteria = PREDEFINED_FILTERS[name]['criteria']
+    expected = np.array([_legacy_meets_criteria(record, criteria) for record in records])
+    mask = compile_criteria(criteria).mask(store)
+    assert np.array_equal(mask, expected)
+    # Something to compare: the fixture is not all-pass or all-fail
+    assert 0 < expected.sum() < len(records) or name == 'your_custom_criteria'
+
+
+@pytest.mark.parametrize('name', sorted(PREDEFINED_FILTERS))
+def test_filter_on_dicts_matches_the_store_mask(store, records, name):
+    criteria = PREDEFINED_FILTERS[name]['criteria']
+    passed = filter_stocks(records, criteria)
+    assert passed == [records[i] for i in np.flatnonzero(compile_criteria(criteria).mask(store))]
+
+
+def test_every_min_and_max_is_enforced(store, records):
+    # Bounds the per-filter checks ignored (a max on roe, a min on debt/equity...)
+    criteria = {
+        'roe': {'min': 5, 'max': 25},
+        'debtToEquity': {'min': 0.2, 'max': 2},
+        'pledged_percent': {'min': 0.1, 'max': 1.5},
+        'salesGrowth': {'max': 30},
+    }
+    expected = np.array([_all_bounds_reference(record, criteria) for record in records])
+    legacy = np.array([_legacy_meets_criteria(record, criteria) for record in records])
+    mask = compile_criteria(criteria).mask(store)
+    assert np.array_equal(mask, expected)
+    assert (legacy & ~mask).any()
+
+
+def test_matches_single_stock():
+    compiled = compile_criteria({'peRatio': {'max': 30}, 'institutional_holding': {'min': 0}})
+    assert compiled.matches({'peRatio': 12.0, 'fii_holding': 0.5})
+    assert not compiled.matches({'peRatio': -3.0, 'fii_holding': 0.5})
+    assert not compiled.matches({'peRatio': 12.0})
+
+
+def test_unknown_and_malformed_criteria_are_ignored(store):
+    compiled = compile_criteria({'nonsense': {'min': 1}, 'roe': 'high'})
+    assert compiled.mask(store).all()
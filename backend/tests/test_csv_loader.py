@@ -0,0 +1,64 @@
+import os
+
+from csv_loader import ScreenerCSV
+
+HEADER = 'Name,NSE Code,BSE Code,Current Price,Return on equity,Dividend yield\n'
+
+
+def _write(path, text, mtime):
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_parses_symbols_and_columns(tmp_path):
+    path = tmp_path / 'stocks.csv'
+    _write(path, HEADER + 'Alpha,ALPHA,,100,12.5,1.2\nBeta,,500488,50,,\n,GAMMA,,1,1,1\n', 10**18)
+    snapshot = ScreenerCSV(paths=(str(path),)).load()
+    assert snapshot.symbols == ['ALPHA.NS', '500488.BO']
+    assert snapshot.columns['screener_roe'].tolist() == [12.5, 0.0]
+    assert snapshot.extra_numeric == ['screener_dividend_yield']
+    # Columns missing from the export
+    assert snapshot.stocks[0]['industry'] == 'Unknown'
+    assert snapshot.stocks[0]['industry_group'] == 'Unknown'
+    assert snapshot.stocks[0]['screener_pe'] == 0.0
+
+
+def test_unchanged_file_is_not_reparsed(tmp_path):
+    path = tmp_path / 'stocks.csv'
+    _write(path, HEADER + 'Alpha,ALPHA,,100,12.5,1.2\n', 10**18)
+    loader = ScreenerCSV(paths=(str(path),))
+    assert loader.load() is loader.load()
+    assert loader.loads == 1
+
+
+def test_parse_error_keeps_the_last_good_snapshot(tmp_path):
+    path = tmp_path / 'stocks.csv'
+    _write(path, HEADER + 'Alpha,ALPHA,,100,12.5,1.2\n', 10**18)
+    loader = ScreenerCSV(paths=(str(path),))
+    good = loader.load()
+
+    _write(path, HEADER + 'Alpha,"ALPHA\n', 2 * 10**18)
+    assert loader.load() is good
+    assert loader.load() is good
+    assert loader.errors == 1
+    assert loader.stats()['last_error']
+
+    _write(path, HEADER + 'Beta,BETA,,5,1,1\n', 3 * 10**18)
+    assert loader.load().symbols == ['BETA.NS']
+
+
+def test_parse_error_without_a_snapshot_returns_none(tmp_path):
+    path = tmp_path / 'stocks.csv'
+    path.write_bytes(b'Name,NSE Code\n\xff\xfe,"X\n')
+    assert ScreenerCSV(paths=(str(path),)).load() is None
+
+
+def test_column_colliding_with_a_field_is_skipped(tmp_path, capsys):
+    path = tmp_path / 'stocks.csv'
+    _write(path, 'Name,NSE Code,Debt to equity,Debt equity,Dividend yield,Dividend-yield\n'
+                 'Alpha,ALPHA,0.5,9,1.2,7\n', 10**18)
+    snapshot = ScreenerCSV(paths=(str(path),)).load()
+    assert snapshot.columns['screener_debt_equity'].tolist() == [0.5]
+    assert snapshot.columns['screener_dividend_yield'].tolist() == [1.2]
+    assert snapshot.extra_numeric == ['screener_dividend_yield']
+    assert "'Debt equity'" in capsys.readouterr().out
@@ -0,0 +1,140 @@
+import json
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from frame_records import STOCK_FIELDS, json_response_body, stock_records, stock_records_json
+
+
+def _iterrows_records(df):
+    """The per-row conversion fetch_stocks ran before frame_records"""
+    stocks = []
+    for index, row in df.iterrows():
+        try:
+            stock = {
+                'name': row.get('Name', ''),
+                'ticker': row.get('Symbol', '').split(':')[-1] if ':' in str(row.get('Symbol', '')) else row.get('Symbol', ''),
+                'symbol': row.get('Symbol', ''),
+                'currentPrice': float(row.get('Last', 0) or 0),
+                'marketCap': float(row.get('Market Capitalization', 0) or 0) / 10000000,  # Convert to Cr
+                'peRatio': float(row.get('Price/Earnings Ratio (TTM)', 0) or 0),
+                'roe': float(row.get('Return on Equity (MRQ)', 0) or 0),
+                'debtToEquity': float(row.get('Debt to Equity Ratio (MRQ)', 0) or 0),
+                'currentRatio': float(row.get('Current Ratio (MRQ)', 0) or 0),
+                'salesGrowth': float(row.get('Revenue Growth (YoY TTM)', 0) or 0),
+                'profitGrowth': float(row.get('Net Income Growth (YoY TTM)', 0) or 0),
+                'sector': row.get('Sector', 'Unknown'),
+                'industry': row.get('Industry', 'Unknown'),
+                'country': row.get('Country', 'Unknown'),
+                'exchange': row.get('Exchange', 'Unknown'),
+                'volume': float(row.get('Volume', 0) or 0),
+                'change': float(row.get('Change', 0) or 0),
+                'changePercent': float(row.get('Change %', 0) or 0),
+                'url': f"https://in.tradingview.com/symbols/{row.get('Symbol', '')}" if row.get('Symbol') else ''
+            }
+            stocks.append(stock)
+        except Exception as e:
+            continue
+    return stocks
+
+
+def _frame(n=40, seed=2):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Symbol': [f'NSE:S{i}' if i % 5 else f'S{i}' for i in range(n)],
+        'Name': [f'Company {i}' for i in range(n)],
+        'Last': rng.uniform(1, 5000, n),
+        'Market Capitalization': rng.integers(10**8, 10**13, n),  # int64 column
+        'Price/Earnings Ratio (TTM)': rng.uniform(-20, 80, n),
+        'Return on Equity (MRQ)': rng.uniform(-10, 40, n),
+        'Debt to Equity Ratio (MRQ)': rng.uniform(0, 3, n),
+        'Current Ratio (MRQ)': rng.uniform(0, 4, n),
+        'Revenue Growth (YoY TTM)': rng.uniform(-30, 60, n),
+        'Net Income Growth (YoY TTM)': rng.uniform(-30, 60, n),
+        'Sector': rng.choice(['Finance', 'Energy', 'Technology'], n),
+        'Industry': rng.choice(['Banks', 'Oil', 'Software'], n),
+        'Country': 'India',
+        'Exchange': 'NSE',
+        'Volume': rng.integers(0, 10**7, n),  # int64 column
+        'Change': rng.uniform(-50, 50, n),
+        'Change %': rng.uniform(-5, 5, n),
+    })
+
+
+def _json_safe(records):
+    """The old records with NaN numbers as 0 and NaN text as its default"""
+    defaults = {'name': '', 'sector': 'Unknown', 'industry': 'Unknown', 'country': 'Unknown', 'exchange': 'Unknown'}
+    safe = []
+    for record in records:
+        record = dict(record)
+        for field, value in record.items():
+            if isinstance(value, float) and math.isnan(value):
+                record[field] = defaults.get(field, 0.0)
+        safe.append(record)
+    return safe
+
+
+def test_matches_the_iterrows_conversion():
+    df = _frame()
+    records = stock_records(df)
+    assert records == _iterrows_records(df)
+    assert all(list(record) == list(STOCK_FIELDS) for record in records)
+    assert all(type(record['volume']) is float and type(record['marketCap']) is float for record in records)
+
+
+@pytest.mark.parametrize('missing', [
+    ['Industry', 'Exchange'],
+    ['Volume', 'Change', 'Change %'],
+    ['Current Ratio (MRQ)', 'Sector', 'Country'],
+])
+def test_missing_columns_take_the_old_defaults(missing):
+    df = _frame().drop(columns=missing)
+    assert stock_records(df) == _iterrows_records(df)
+
+
+def test_nan_values_become_the_defaults():
+    df = _frame(10)
+    df['Last'] = df['Last'].astype(object)
+    df.loc[2, 'Last'] = None
+    df.loc[3, 'Return on Equity (MRQ)'] = np.nan
+    df.loc[4, 'Volume'] = np.nan  # the column turns float
+    df.loc[5, 'Sector'] = np.nan
+    df.loc[6, 'Change %'] = np.inf
+    records = stock_records(df)
+    # The old loop passed NaN through (invalid JSON); it is 0 / the text default now
+    assert records[:6] == _json_safe(_iterrows_records(df))[:6]
+    assert records[3]['roe'] == 0.0 and records[5]['sector'] == 'Unknown'
+    assert records[6]['changePercent'] == 0.0
+    assert records[7:] == _iterrows_records(df)[7:]
+
+
+def test_non_numeric_values_become_zero_instead_of_dropping_the_row():
+    df = _frame(5)
+    df['Return on Equity (MRQ)'] = df['Return on Equity (MRQ)'].astype(object)
+    df.loc[1, 'Return on Equity (MRQ)'] = 'n/a'
+    old = _iterrows_records(df)
+    records = stock_records(df)
+    assert len(old) == 4 and len(records) == 5
+    assert records[1]['roe'] == 0.0
+    assert [r for i, r in enumerate(records) if i != 1] == old
+
+
+def test_empty_frames():
+    assert stock_records(None) == []
+    assert stock_records(pd.DataFrame()) == []
+    assert stock_records_json(pd.DataFrame()) == '[]'
+
+
+def test_json_matches_the_records():
+    df = _frame()
+    encoded = json.loads(stock_records_json(df))
+    records = stock_records(df)
+    assert len(encoded) == len(records)
+    for got, expected in zip(encoded, records):
+        # to_json writes 15 significant digits
+        assert got == {field: pytest.approx(value, rel=1e-14) if isinstance(value, float) else value
+                       for field, value in expected.items()}
+    body = json_response_body({'success': True, 'count': len(df)}, stock_records_json(df))
+    assert json.loads(body)['data'] == encoded
@@ -0,0 +1,34 @@
+import pytest
+
+import http_client
+from http_client import POOL_SIZE, PooledSession
+
+
+def test_pooled_session_sizes_its_pools():
+    session = PooledSession(pool_size=7, timeout=3)
+    adapter = session.get_adapter('https://query1.finance.yahoo.com/')
+    assert adapter._pool_connections == 7
+    assert adapter._pool_maxsize == 7
+    assert adapter._pool_block
+
+
+def test_yahoo_session_without_curl_cffi_is_pooled(monkeypatch):
+    monkeypatch.setattr(http_client, 'curl_requests', None)
+    session = http_client._build_yahoo_session(pool_size=5)
+    assert isinstance(session, PooledSession)
+    assert session.get_adapter('https://query1.finance.yahoo.com/')._pool_maxsize == 5
+
+
+@pytest.mark.skipif(http_client.curl_requests is None, reason='curl_cffi is not installed')
+def test_curl_yahoo_session_gets_the_pool_size():
+    session = http_client._build_yahoo_session()
+    assert session.curl_options[http_client.CurlOpt.MAXCONNECTS] == POOL_SIZE
+    session = http_client._build_yahoo_session(pool_size=4)
+    assert session.curl_options[http_client.CurlOpt.MAXCONNECTS] == 4
+
+
+def test_sessions_are_shared_until_closed():
+    session = http_client.tradingview_session()
+    assert http_client.tradingview_session() is session
+    http_client.close_sessions()
+    assert http_client.tradingview_session() is not session
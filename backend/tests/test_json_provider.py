@@ -0,0 +1,64 @@
+import datetime
+import decimal
+import json
+
+import pytest
+from flask import Flask
+
+import json_provider
+from json_provider import FastJSONProvider
+
+PAYLOAD = {'b': 1, 'a': [1.5, None, True, 'x'], 'd': datetime.date(2024, 1, 2), 'dec': decimal.Decimal('1.25')}
+
+
+@pytest.fixture
+def apps():
+    plain, fast = Flask('plain'), Flask('fast')
+    fast.json = FastJSONProvider(fast)
+    return plain, fast
+
+
+@pytest.mark.parametrize('debug', [False, True])
+def test_responses_match_the_stdlib_provider(apps, debug):
+    bodies = []
+    for app in apps:
+        app.debug = debug
+        with app.app_context():
+            bodies.append(app.json.response(PAYLOAD).get_data())
+    assert bodies[0] == bodies[1]
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'separators': (', ', ': ')}, {'indent': 4}, {'separators': (',', '=')},
+                                    {'indent': 2, 'separators': (',', ':')}, {'ensure_ascii': False}])
+def test_other_layouts_fall_back_to_the_stdlib_encoder(apps, kwargs):
+    plain, fast = apps
+    with plain.app_context():
+        expected = plain.json.dumps(PAYLOAD, **kwargs)
+    with fast.app_context():
+        assert fast.json.dumps(PAYLOAD, **kwargs) == expected
+
+
+def test_compact_dumps(apps):
+    _, fast = apps
+    with fast.app_context():
+        encoded = fast.json.dumps({'z': 1, 'a': [1, 2]}, separators=(',', ':'))
+    assert encoded == '{"a":[1,2],"z":1}'
+
+
+@pytest.mark.skipif(json_provider.orjson is None, reason='orjson is not installed')
+def test_documented_differences(apps):
+    _, fast = apps
+    with fast.app_context():
+        encoded = fast.json.dumps({'name': 'Nestlé', 'pe': float('nan')}, separators=(',', ':'))
+    # Raw UTF-8 rather than \u escapes, and null rather than NaN
+    assert encoded == '{"name":"Nestlé","pe":null}'
+    assert json.loads(encoded)['pe'] is None
+
+
+def test_values_orjson_cannot_encode_fall_back(apps):
+    plain, fast = apps
+    payload = {'big': 2 ** 70}
+    with plain.app_context():
+        expected = plain.json.response(payload).get_data()
+    with fast.app_context():
+        assert fast.json.response(payload).get_data() == expected
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from criteria_engine import compile_criteria
+from materialized_screens import MaterializedScreens
+from range_index import RangeIndexSet
+from universe_store import UniverseStore
+
+FILTERS = {
+    'profitable': {'name': 'Profitable', 'criteria': {'roe': {'min': 15}, 'peRatio': {'max': 30}}},
+    'large': {'name': 'Large', 'criteria': {'marketCap': {'min': 50000}}},
+}
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(4)
+    store = UniverseStore()
+    for i in range(120):
+        symbol = f'S{i:03d}.NS'
+        store.upsert(symbol, {'name': f'Company {i}', 'screener_roe': 50.0})
+        # A quarter of the symbols have no Yahoo data yet
+        if i % 4:
+            store.update_quote(symbol, {
+                'price': float(rng.uniform(10, 1000)),
+                'roe': float(rng.uniform(-5, 40)),
+                'pe_ratio': float(rng.uniform(-10, 60)),
+                'market_cap': float(rng.uniform(0, 100000)),
+            })
+    # Symbols outside the screen universe
+    store.update_quote('OTHER.NS', {'price': 1.0, 'roe': 99.0, 'pe_ratio': 5.0, 'market_cap': 1e6})
+    return store
+
+
+def _symbols(store):
+    return [s for s in store.symbols if s != 'OTHER.NS'][::-1]
+
+
+def _expected(store, symbols, name):
+    compiled = compile_criteria(FILTERS[name]['criteria'])
+    return [s for s in symbols if store.has_quote(store.row_of(s)) and compiled.matches(store.stock_record(store.row_of(s)))]
+
+
+@pytest.mark.parametrize('indexed', [False, True])
+def test_rebuild_matches_the_criteria_in_universe_order(store, indexed):
+    symbols = _symbols(store)
+    screens = MaterializedScreens(store, FILTERS, symbols, indexes=RangeIndexSet(store) if indexed else None)
+    screens.rebuild()
+    for name in FILTERS:
+        expected = _expected(store, symbols, name)
+        assert 0 < len(expected) < len(symbols)
+        assert [record['symbol'] for record in screens.results(name)] == expected
+        assert [store.symbols[row] for row in screens.member_rows(name)] == expected
+
+
+def test_update_follows_a_changed_record(store):
+    symbols = _symbols(store)
+    screens = MaterializedScreens(store, FILTERS, symbols)
+    screens.rebuild()
+    results = screens.results('profitable')
+    version = screens.version('profitable')
+    assert screens.results('profitable') is results
+
+    # An unscreened symbol gets its first quote and now passes
+    symbol = 'S004.NS'
+    assert symbol not in [r['symbol'] for r in results]
+    store.update_quote(symbol, {'price': 10.0, 'roe': 30.0, 'pe_ratio': 12.0})
+    screens.update(symbol)
+    assert screens.version('profitable') != version
+    assert symbol in [r['symbol'] for r in screens.results('profitable')]
+
+    # and drops out again
+    store.update_quote(symbol, {'price': 10.0, 'roe': 1.0, 'pe_ratio': 12.0})
+    screens.update(symbol)
+    assert symbol not in [r['symbol'] for r in screens.results('profitable')]
+    assert screens.results('profitable') == [store.stock_record(store.row_of(s))
+                                             for s in _expected(store, symbols, 'profitable')]
+
+
+def test_update_of_a_member_refreshes_its_record(store):
+    screens = MaterializedScreens(store, FILTERS, _symbols(store))
+    screens.rebuild()
+    member = screens.results('large')[0]['symbol']
+    store.update_quote(member, {'price': 1234.5, 'market_cap': 90000.0})
+    screens.update(member)
+    assert screens.results('large')[0]['currentPrice'] == 1234.5
+
+
+def test_symbols_outside_the_universe_are_ignored(store):
+    screens = MaterializedScreens(store, FILTERS, _symbols(store), indexes=RangeIndexSet(store))
+    screens.rebuild()
+    version = screens.version('large')
+    screens.update('OTHER.NS')
+    assert screens.version('large') == version
+    assert 'OTHER.NS' not in [r['symbol'] for r in screens.results('large')]
+    assert screens.stats()['updates'] == 0
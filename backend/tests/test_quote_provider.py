@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from fetch_engine import YAHOO_SUMMARY_HOST, AsyncFetchEngine
+from quote_provider import BatchQuoteFetcher, StaticQuoteProvider, YahooQuoteProvider
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncFetchEngine(max_concurrency=16, per_host_limit=2, timeout=5)
+    yield engine
+    engine.close()
+
+
+class FakeYahoo(YahooQuoteProvider):
+    """Quotes and fundamentals without the network, recording concurrency"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+        self.fundamentals_calls = 0
+
+    def _fetch_quote_chunk(self, chunk):
+        return {symbol: {'regularMarketPrice': 10.0} for symbol in chunk}
+
+    def _fetch_fundamentals(self, symbol):
+        with self._lock:
+            self.fundamentals_calls += 1
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(0.02)
+        with self._lock:
+            self.running -= 1
+        return {'sector': f'Sector of {symbol}'}
+
+
+def test_fundamentals_run_through_the_engine_within_its_host_limit(engine):
+    provider = FakeYahoo(engine=engine)
+    symbols = [f'S{i}' for i in range(8)]
+    quotes = provider.fetch_quotes(symbols)
+    assert quotes['S3'] == {'sector': 'Sector of S3', 'regularMarketPrice': 10.0}
+    assert provider.most_running == 2
+    assert engine.stats()['completed'] == len(symbols)
+    assert YAHOO_SUMMARY_HOST in engine._host_slots
+
+
+def test_fundamentals_are_cached(engine):
+    provider = FakeYahoo(engine=engine)
+    provider.fetch_quotes(['A', 'B'])
+    provider.fetch_quotes(['A', 'B', 'C'])
+    assert provider.fundamentals_calls == 3
+
+
+def test_fundamentals_without_an_engine_run_in_turn():
+    provider = FakeYahoo()
+    assert set(provider.fetch_quotes(['A', 'B', 'C'])) == {'A', 'B', 'C'}
+    assert provider.most_running == 1
+
+
+def test_batch_fetcher_merges_provider_batches(engine):
+    provider = StaticQuoteProvider({f'S{i}': {'price': i} for i in range(7)}, max_batch_size=3)
+    fetcher = BatchQuoteFetcher(provider, engine=engine)
+    quotes = fetcher.fetch([f'S{i}' for i in range(9)] + ['S0'])
+    assert quotes == {f'S{i}': {'price': i} for i in range(7)}
+    assert provider.round_trips == 3
+
+
+def test_iter_batches_yields_each_batch_as_it_completes(engine):
+    provider = StaticQuoteProvider({f'S{i}': {'price': i} for i in range(7)}, max_batch_size=3)
+    fetcher = BatchQuoteFetcher(provider, engine=engine)
+    batches = list(fetcher.iter_batches([f'S{i}' for i in range(9)]))
+    assert sorted(len(batch) for batch in batches) == [1, 3, 3]
+    assert BatchQuoteFetcher._merge(batches) == fetcher.fetch([f'S{i}' for i in range(9)])
+
+    in_turn = list(BatchQuoteFetcher(provider).iter_batches(['S0', 'S1', 'S2', 'S3']))
+    assert in_turn == [{'S0': {'price': 0}, 'S1': {'price': 1}, 'S2': {'price': 2}}, {'S3': {'price': 3}}]
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from criteria_engine import compile_criteria
+from range_index import RangeIndexSet
+from universe_store import UniverseStore
+
+CRITERIA = [
+    {'marketCap': {'min': 90000}, 'roe': {'min': 30}},
+    {'marketCap': {'min': 50000}, 'roe': {'min': 30}, 'debtToEquity': {'max': 0.5}},
+    {'peRatio': {'min': 5, 'max': 20}},
+    {'roe': {'min': 10}, 'institutional_holding': {'min': 20}},
+    {},
+]
+
+
+def _record(rng):
+    record = {
+        'marketCap': float(rng.uniform(0, 100000)),
+        'roe': float(rng.uniform(-10, 40)),
+        'debtToEquity': float(rng.uniform(0, 3)),
+        'peRatio': float(rng.uniform(-5, 80)),
+        'fii_holding': float(rng.uniform(0, 30)),
+        'dii_holding': float(rng.uniform(0, 30)),
+    }
+    if rng.random() < 0.1:
+        del record['roe']
+    return record
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(7)
+    store = UniverseStore()
+    for i in range(2000):
+        store.upsert(f'S{i}', _record(rng))
+    store.rng = rng
+    return store
+
+
+def _scan(store, compiled):
+    return np.flatnonzero(compiled.mask(store))
+
+
+@pytest.mark.parametrize('criteria', CRITERIA)
+def test_select_matches_full_scan(store, criteria):
+    indexes = RangeIndexSet(store)
+    compiled = compile_criteria(criteria)
+    assert np.array_equal(indexes.select(compiled), _scan(store, compiled))
+
+
+@pytest.mark.parametrize('changes', [10, 500])
+def test_select_sees_rows_changed_since_the_build(store, changes):
+    indexes = RangeIndexSet(store)
+    compiled = compile_criteria(CRITERIA[1])
+    indexes.select(compiled)
+    for row in store.rng.integers(0, len(store), changes):
+        store.upsert(f'S{row}', _record(store.rng))
+    store.upsert('NEW', {'marketCap': 99999.0, 'roe': 39.0, 'debtToEquity': 0.1})
+    assert np.array_equal(indexes.select(compiled), _scan(store, compiled))
+
+
+def test_select_with_accept(store):
+    indexes = RangeIndexSet(store)
+    compiled = compile_criteria(CRITERIA[0])
+    accept = lambda rows: rows % 3 != 0
+    expected = _scan(store, compiled)
+    assert np.array_equal(indexes.select(compiled, accept=accept), expected[accept(expected)])
+
+
+def test_plans_keep_the_snapshot_they_were_made_with(store):
+    indexes = RangeIndexSet(store)
+    predicate = compile_criteria({'roe': {'min': 30}}).predicates[0]
+    rows, _, check = indexes._plan(predicate)
+    snapshot = indexes._indexes[predicate.columns].snapshot
+    # Enough changes to force a rebuild
+    for i in range(len(store)):
+        store.upsert(f'S{i}', {'roe': -50.0})
+    rebuilt, _ = indexes.index(predicate.columns)
+    assert rebuilt is not snapshot
+    assert check(rows).all()
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from ranking import RANKABLE_FIELDS, parse_sort, top_k_rows
+from universe_store import FETCHED_AT_FIELDS, UniverseStore
+
+
+def test_parse_sort_directions():
+    assert parse_sort('roe:asc,-marketCap,+peRatio,salesGrowth') == [
+        ('roe', False), ('marketCap', True), ('peRatio', False), ('salesGrowth', True)]
+    assert parse_sort(None) == [('roe', True)]
+
+
+@pytest.mark.parametrize('spec', ['roe:up', 'not_a_field', ' , ', 'quote_fetched_at'])
+def test_parse_sort_rejects_bad_specs(spec):
+    with pytest.raises(ValueError):
+        parse_sort(spec)
+
+
+def test_fetch_times_are_not_rankable():
+    assert not set(FETCHED_AT_FIELDS) & set(RANKABLE_FIELDS)
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(5)
+    store = UniverseStore()
+    for i in range(300):
+        roe = float(rng.integers(0, 20)) if i % 17 else None
+        store.upsert(f'S{299 - i:03d}', {'roe': roe, 'marketCap': float(rng.integers(0, 5))})
+    return store
+
+
+def _reference(store, rows, keys, k):
+    """Full sort: each key in turn, missing values last, then symbol"""
+    def sort_key(row):
+        parts = []
+        for field, descending in keys:
+            value = store.get(row, field)
+            parts.append((value is None, -value if value is not None and descending else value or 0))
+        return parts + [store.symbols[row]]
+    return sorted(rows, key=sort_key)[:k]
+
+
+@pytest.mark.parametrize('k', [0, 1, 10, 37, 300, 400])
+@pytest.mark.parametrize('spec', ['roe', 'roe:asc,marketCap', 'marketCap,-roe'])
+def test_top_k_matches_a_full_sort(store, spec, k):
+    keys = parse_sort(spec)
+    rows = np.arange(len(store))
+    assert list(top_k_rows(store, rows, keys, k)) == _reference(store, list(rows), keys, k)
+
+
+def test_ties_are_broken_by_symbol():
+    store = UniverseStore()
+    for symbol in ('C', 'A', 'D', 'B'):
+        store.upsert(symbol, {'roe': 10.0})
+    top = top_k_rows(store, np.arange(4), parse_sort('roe'), 3)
+    assert [store.symbols[row] for row in top] == ['A', 'B', 'C']
+
+
+def test_top_k_of_a_subset(store):
+    rows = np.arange(0, 300, 7)
+    top = top_k_rows(store, rows, parse_sort('roe'), 5)
+    assert set(top) <= set(rows)
+    assert list(top) == _reference(store, list(rows), parse_sort('roe'), 5)
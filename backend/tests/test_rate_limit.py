@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+
+from rate_limit import (MIN_RATE, CircuitBreaker, CircuitOpenError, RateLimitTimeout, TokenBucket,
+                        UpstreamGuard, is_rate_limited)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_at_rate_up_to_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=3, clock=clock)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+    clock.now = 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    clock.now = 100
+    assert bucket.available == 3
+
+
+def test_acquire_gives_up_at_timeout():
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.01)
+
+
+def test_rate_divided_down_to_zero_is_clamped():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert bucket.rate == MIN_RATE
+    # As serve_as_worker splits the rate between workers
+    bucket.rate = bucket.rate * (1 - 1.0) / 4
+    assert bucket.rate == MIN_RATE
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.01)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_one_rate_limit_error_opens_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=5)
+    breaker.record_failure(rate_limited=True)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_lets_one_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, clock=clock)
+    breaker.record_failure()
+    clock.now = 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    # A failed probe re-opens it for another reset_timeout
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 2
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_released_probe_can_be_claimed_again():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=1, clock=clock)
+    breaker.record_failure()
+    clock.now = 1
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+def test_is_rate_limited():
+    assert is_rate_limited(TooManyRequests('429 Client Error: Too Many Requests'))
+    assert not is_rate_limited(ValueError('no data'))
+
+
+def test_guard_trips_on_rate_limit_and_refuses_calls():
+    guard = UpstreamGuard(rate=100, burst=10, failure_threshold=5, reset_timeout=30)
+
+    def limited():
+        raise TooManyRequests('Too Many Requests')
+
+    with pytest.raises(TooManyRequests):
+        guard.call(limited)
+    assert guard.is_open()
+    with pytest.raises(CircuitOpenError):
+        guard.call(lambda: 1)
+    assert guard.calls == 1
+
+
+def test_guard_token_timeout_is_not_a_failure():
+    guard = UpstreamGuard(rate=0.001, burst=1, failure_threshold=1, max_wait=0)
+    assert guard.call(lambda: 'ok') == 'ok'
+    with pytest.raises(RateLimitTimeout):
+        guard.call(lambda: 'ok')
+    assert guard.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_guard_counts_every_call_across_threads():
+    guard = UpstreamGuard(rate=1e6, burst=1e6)
+
+    def call_many():
+        for _ in range(2000):
+            guard.call(lambda: None)
+
+    threads = [threading.Thread(target=call_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert guard.calls == 16000
@@ -0,0 +1,125 @@
+import queue
+import time
+
+import pytest
+
+from rate_limit import UpstreamGuard
+from refresher import RemoteRefresher, UniverseRefresher, universe_freshness
+from universe_store import UniverseStore
+
+
+class FakeProvider:
+    max_batch_size = 3
+
+
+class FakeScreener:
+    """What the refresher uses of a screener, refreshing from memory"""
+
+    cache_timeout = 300
+
+    def __init__(self, symbols, unavailable=()):
+        self.universe = UniverseStore()
+        self.symbols = list(symbols)
+        self.unavailable = set(unavailable)
+        self.quote_provider = FakeProvider()
+        self.upstream = UpstreamGuard(rate=1e6, burst=1e6)
+        self.batches = []
+        self.snapshots = 0
+
+    def universe_symbols(self):
+        return self.symbols
+
+    def refresh_symbols(self, symbols):
+        self.batches.append(list(symbols))
+        refreshed = [symbol for symbol in symbols if symbol not in self.unavailable]
+        for symbol in refreshed:
+            self.upstream.call(lambda: None)
+            self.universe.update_quote(symbol, {'price': 10.0})
+            self.universe.update_stock_data({'symbol': symbol, 'roe': 12.0})
+        return refreshed
+
+    def save_snapshot(self):
+        self.snapshots += 1
+
+
+def _fetched(screener, symbol, age):
+    fetched_at = time.time() - age
+    screener.universe.update_quote(symbol, {'price': 1.0}, fetched_at=fetched_at)
+    screener.universe.update_stock_data({'symbol': symbol}, fetched_at=fetched_at)
+
+
+def test_cycle_order_is_never_fetched_then_stalest_first():
+    screener = FakeScreener(['A', 'B', 'C', 'D', 'E'])
+    _fetched(screener, 'A', 10)
+    _fetched(screener, 'B', 500)
+    _fetched(screener, 'D', 50)
+    # Quote fresh but never screened: still never fetched as a whole
+    screener.universe.update_quote('E', {'price': 1.0})
+    assert UniverseRefresher(screener)._cycle_order() == ['C', 'E', 'B', 'D', 'A']
+
+
+def test_freshness_counts():
+    screener = FakeScreener(['A', 'B', 'C'])
+    _fetched(screener, 'A', 10)
+    _fetched(screener, 'B', 500)
+    freshness = universe_freshness(screener)
+    assert (freshness['fresh'], freshness['stale'], freshness['missing']) == (1, 1, 1)
+    assert freshness['oldest_age'] == pytest.approx(500, abs=5)
+
+
+def test_cycle_refreshes_every_symbol_in_provider_batches():
+    screener = FakeScreener([f'S{i}' for i in range(8)], unavailable={'S5'})
+    refresher = UniverseRefresher(screener, cycle_interval=0)
+    refresher._run_cycle()
+    assert [len(batch) for batch in screener.batches] == [3, 3, 2]
+    assert sorted(sum(screener.batches, [])) == sorted(screener.symbols)
+    stats = refresher.stats()
+    assert (stats['refreshed'], stats['failed'], stats['cycle_percent']) == (7, 1, 100.0)
+    assert stats['freshness']['missing'] == 1
+    assert screener.snapshots == 1
+
+
+def test_prioritized_symbols_jump_the_queue():
+    screener = FakeScreener([f'S{i}' for i in range(6)])
+    refresher = UniverseRefresher(screener)
+    refresher.prioritize('S4')
+    refresher.prioritize('X')
+    batch, consumed = refresher._next_batch(['S0', 'S4', 'S1', 'S2'], 0)
+    assert batch == ['S4', 'X', 'S0']
+    assert consumed == 1
+    assert refresher._next_batch(['S0', 'S4', 'S1', 'S2'], 1) == (['S4', 'S1', 'S2'], 3)
+
+
+def test_open_circuit_requeues_the_batch_without_fetching():
+    screener = FakeScreener(['A', 'B'])
+    screener.upstream.breaker.record_failure(rate_limited=True)
+    refresher = UniverseRefresher(screener)
+    refresher._stop.set()  # don't sit out the reset timeout
+    refresher._refresh(['A', 'B'])
+    assert screener.batches == []
+    assert refresher.stats()['priority_pending'] == 2
+
+
+def test_thread_keeps_cycling_until_stopped():
+    screener = FakeScreener(['A', 'B', 'C', 'D'])
+    refresher = UniverseRefresher(screener, cycle_interval=0)
+    assert refresher.start()
+    assert not refresher.start()
+    deadline = time.monotonic() + 5
+    while refresher.cycle < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    refresher.stop(timeout=5)
+    assert not refresher.running
+    assert refresher.cycle >= 2
+    assert universe_freshness(screener)['fresh'] == 4
+
+
+def test_remote_refresher_forwards_priorities():
+    screener = FakeScreener(['A'])
+    forwarded = queue.Queue()
+    remote = RemoteRefresher(screener, forwarded)
+    remote.prioritize('A')
+    remote.prioritize('B')
+    assert [forwarded.get_nowait(), forwarded.get_nowait()] == ['A', 'B']
+    assert remote.stats()['forwarded'] == 2
+    assert not remote.start()
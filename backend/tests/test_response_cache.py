@@ -0,0 +1,44 @@
+from flask import Flask, jsonify
+
+from response_cache import ResponseCache
+
+
+def _app():
+    return Flask(__name__)
+
+
+def test_same_generation_is_rendered_once_and_revalidates():
+    app, cache = _app(), ResponseCache()
+    with app.test_request_context():
+        first = cache.respond('k', 1, lambda: jsonify(value=1))
+        cache.respond('k', 1, lambda: jsonify(value=2))
+    assert cache.renders == 1
+    with app.test_request_context(headers={'If-None-Match': f'"{first.get_etag()[0]}"'}):
+        assert cache.respond('k', 1, lambda: jsonify(value=3)).status_code == 304
+    with app.test_request_context():
+        assert cache.respond('k', 2, lambda: jsonify(value=4)).get_json() == {'value': 4}
+    assert cache.renders == 2
+
+
+def test_generation_function_keys_the_body_after_render():
+    app, cache = _app(), ResponseCache()
+    state = {'generation': 1}
+
+    def render():
+        # The render fetches data and so moves the generation itself
+        state['generation'] += 1
+        return jsonify(value=state['generation'])
+
+    with app.test_request_context():
+        cache.respond('k', lambda: state['generation'], render)
+        again = cache.respond('k', lambda: state['generation'], render)
+    assert cache.renders == 1
+    assert again.get_json() == {'value': 2}
+
+
+def test_errors_are_not_cached():
+    app, cache = _app(), ResponseCache()
+    with app.test_request_context():
+        cache.respond('k', None, lambda: (jsonify(error=True), 400))
+        assert cache.respond('k', None, lambda: jsonify(value=1)).status_code == 200
+    assert cache.renders == 1
@@ -0,0 +1,102 @@
+import threading
+import time
+
+import pytest
+import tvscreener as tvs
+
+import tvscreener_adapter
+from python_app import run_screener_all
+
+
+class FakeScanner:
+    """TradingView's scan endpoint over `total` rows, serving the requested range"""
+
+    def __init__(self, total, fail=(), slow=(), shift=()):
+        self.total = total
+        self.fail = set(fail)
+        self.slow = set(slow)
+        # Range starts served one row early, as if a row moved between requests
+        self.shift = set(shift)
+        self.ranges = []
+        self._lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+
+    def post_payload(self, screener, payload):
+        start, end = payload['range']
+        with self._lock:
+            self.ranges.append((start, end))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(0.01)
+            if start in self.slow:
+                time.sleep(1)
+            if start in self.fail:
+                raise RuntimeError(f'range {start} failed')
+            if start in self.shift:
+                start -= 1
+            width = len(payload['columns'])
+            rows = [[f'NSE:S{i:05d}'] + [float(i)] * width for i in range(start, min(end, self.total))]
+            return rows, self.total
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+@pytest.fixture
+def scan(monkeypatch):
+    def install(**kwargs):
+        scanner = FakeScanner(**kwargs)
+        monkeypatch.setattr(tvscreener_adapter, 'post_payload', scanner.post_payload)
+        return scanner
+    return install
+
+
+def _symbols(df):
+    return list(df['Symbol'])
+
+
+def test_every_range_is_fetched_in_order(scan):
+    scanner = scan(total=1234)
+    df, total, complete = run_screener_all(tvs.StockScreener(), page_size=100, concurrency=3)
+    assert (total, complete) == (1234, True)
+    assert _symbols(df) == [f'NSE:S{i:05d}' for i in range(1234)]
+    assert sorted(scanner.ranges) == [(start, min(start + 100, 20000)) for start in range(0, 1234, 100)]
+    assert scanner.most_running <= 3
+
+
+def test_row_cap_marks_the_result_incomplete(scan):
+    scan(total=1234)
+    df, total, complete = run_screener_all(tvs.StockScreener(), max_rows=450, page_size=100)
+    assert (len(df), total, complete) == (450, 1234, False)
+
+
+def test_failed_range_is_left_out(scan):
+    scan(total=500, fail={200})
+    df, total, complete = run_screener_all(tvs.StockScreener(), page_size=100)
+    assert not complete
+    assert len(df) == 400
+    assert 'NSE:S00250' not in _symbols(df)
+
+
+def test_rows_seen_in_two_ranges_are_kept_once(scan):
+    scan(total=300, shift={100, 200})
+    df, _, complete = run_screener_all(tvs.StockScreener(), page_size=100)
+    assert _symbols(df) == [f'NSE:S{i:05d}' for i in range(300)]
+    assert complete
+
+
+def test_deadline_returns_the_ranges_that_arrived(scan):
+    scan(total=400, slow={300})
+    started = time.monotonic()
+    df, total, complete = run_screener_all(tvs.StockScreener(), page_size=100, deadline=0.3)
+    assert time.monotonic() - started < 0.9
+    assert (len(df), total, complete) == (300, 400, False)
+
+
+def test_small_screens_take_one_request(scan):
+    scanner = scan(total=42)
+    df, total, complete = run_screener_all(tvs.StockScreener(), page_size=100)
+    assert (len(df), total, complete) == (42, 42, True)
+    assert scanner.ranges == [(0, 100)]
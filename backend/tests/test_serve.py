@@ -0,0 +1,128 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+import pytest
+
+from universe_state import UniverseState
+from universe_store import UniverseStore
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TOY_APP = '''
+import os
+
+def app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [str(os.getpid()).encode()]
+'''
+
+SUPERVISE = '''
+import socket
+import sys
+
+sys.path[:0] = [{backend!r}, {apps!r}]
+import serve
+
+sock = socket.create_server(('127.0.0.1', 0))
+sock.set_inheritable(True)
+print(sock.getsockname()[1], flush=True)
+serve.Supervisor('toy_app', sock, {workers}).run()
+'''
+
+
+def _children(pid):
+    path = f'/proc/{pid}/task/{pid}/children'
+    with open(path) as f:
+        return {int(child) for child in f.read().split()}
+
+
+def _state(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0]
+    except FileNotFoundError:
+        return 'X'
+
+
+def _get(port, timeout=5):
+    with urllib.request.urlopen(f'http://127.0.0.1:{port}/', timeout=timeout) as response:
+        return int(response.read())
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def supervise(tmp_path):
+    (tmp_path / 'toy_app.py').write_text(TOY_APP)
+    started = []
+
+    def start(workers):
+        script = SUPERVISE.format(backend=BACKEND, apps=str(tmp_path), workers=workers)
+        process = subprocess.Popen([sys.executable, '-c', textwrap.dedent(script)],
+                                   stdout=subprocess.PIPE, text=True)
+        started.append(process)
+        return process, int(process.stdout.readline())
+
+    yield start
+    for process in started:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+@pytest.mark.skipif(not os.path.exists(f'/proc/{os.getpid()}/task/{os.getpid()}/children'),
+                    reason='needs /proc child listings')
+def test_workers_share_the_socket_and_are_replaced(supervise):
+    supervisor, port = supervise(workers=2)
+    assert _wait_for(lambda: len(_children(supervisor.pid)) == 2)
+    workers = _children(supervisor.pid)
+    assert {_get(port) for _ in range(20)} <= workers
+
+    # A worker that dies is replaced, and requests keep being served
+    victim = _get(port)
+    os.kill(victim, signal.SIGKILL)
+    assert _wait_for(lambda: len(_children(supervisor.pid) - {victim}) == 2)
+    replaced = _children(supervisor.pid)
+    assert victim not in replaced
+    assert {_get(port) for _ in range(20)} <= replaced
+
+    supervisor.send_signal(signal.SIGTERM)
+    assert supervisor.wait(10) == 0
+    # The supervisor stopped its workers and reaped them before exiting
+    assert all(_state(pid) == 'X' for pid in replaced)
+
+
+FILTERS = {'high_roe': {'name': 'High ROE', 'criteria': {'roe': {'min': 20}}}}
+
+
+def _store(roe_by_symbol):
+    store = UniverseStore()
+    for symbol, roe in roe_by_symbol.items():
+        store.update_quote(symbol, {'price': 10.0, 'roe': roe})
+    return store
+
+
+def test_state_bundles_indexes_and_screens_of_one_store():
+    old = UniverseState(_store({'A': 25.0, 'B': 5.0}))
+    old.materialize(FILTERS, ['A', 'B', 'C'])
+    new = UniverseState(_store({'A': 5.0, 'B': 30.0, 'C': 40.0}))
+    screens = new.materialize(FILTERS, ['A', 'B', 'C'])
+
+    assert new.screens is screens
+    assert screens.universe is new.store
+    assert new.range_indexes.store is new.store and new.sort_indexes.store is new.store
+    # The swapped-in state serves the new store's members; the old one is untouched
+    assert [r['symbol'] for r in new.screens.results('high_roe')] == ['B', 'C']
+    assert [r['symbol'] for r in old.screens.results('high_roe')] == ['A']
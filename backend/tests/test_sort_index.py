@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+
+from sort_index import SORT_KEY_FIELDS, InvalidCursor, SortIndexCache, decode_cursor, encode_cursor
+from universe_store import UniverseStore
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(3)
+    store = UniverseStore()
+    for i in range(200):
+        store.upsert(f'S{i:03d}.NS', {
+            'name': f'Company {i % 50}',
+            'screener_price': float(rng.uniform(10, 1000)),
+            'screener_roe': float(rng.uniform(-5, 40)),
+        })
+    # Every third symbol has a Yahoo quote
+    for i in range(0, 200, 3):
+        store.update_quote(f'S{i:03d}.NS', {'price': float(rng.uniform(10, 1000)), 'roe': float(rng.uniform(-5, 40))})
+    return store
+
+
+def _rows(store):
+    return np.arange(len(store))
+
+
+def _shown_roe(store, row):
+    return store.enriched_record(row)['yahoo_roe']
+
+
+def test_cursor_pages_cover_the_order_once(store):
+    indexes = SortIndexCache(store)
+    rows, info = indexes.page(_rows(store), 30, key='roe', order='desc')
+    seen = list(rows)
+    while info['next_cursor']:
+        rows, info = indexes.page(_rows(store), 30, cursor=info['next_cursor'])
+        assert info['sort'] == 'roe' and info['order'] == 'desc'
+        seen.extend(rows)
+    assert sorted(seen) == list(range(len(store)))
+    shown = [_shown_roe(store, row) for row in seen]
+    assert shown == sorted(shown, reverse=True)
+
+
+def test_prev_cursor_returns_the_previous_page(store):
+    indexes = SortIndexCache(store)
+    first, info = indexes.page(_rows(store), 25, key='price')
+    second, info = indexes.page(_rows(store), 25, cursor=info['next_cursor'])
+    back, info = indexes.page(_rows(store), 25, cursor=info['prev_cursor'])
+    assert np.array_equal(back, first)
+    assert info['prev_cursor'] is None
+
+
+def test_cursor_keeps_its_snapshot_across_updates(store):
+    indexes = SortIndexCache(store)
+    _, info = indexes.page(_rows(store), 20, key='roe')
+    snapshot = info['snapshot']
+    store.update_quote('S001.NS', {'price': 1.0, 'roe': -100.0})
+    _, info = indexes.page(_rows(store), 20, cursor=info['next_cursor'])
+    assert info['snapshot'] == snapshot
+    assert indexes.page(_rows(store), 20, key='roe')[1]['snapshot'] != snapshot
+
+
+def test_updates_to_unrelated_columns_reuse_the_snapshot(store):
+    indexes = SortIndexCache(store)
+    snapshot = indexes.snapshot(_rows(store), 'roe')
+    store.update_quote('S000.NS', {'volume': 123.0, 'change_percent': 1.5})
+    # Same roe value again: nothing the roe order reads has changed
+    store.upsert('S003.NS', {'roe': store.get(store.row_of('S003.NS'), 'roe')})
+    assert indexes.snapshot(_rows(store), 'roe') is snapshot
+    assert indexes.builds == 1
+
+    store.upsert('S003.NS', {'roe': 99.0})
+    assert indexes.snapshot(_rows(store), 'roe') is not snapshot
+
+
+def test_first_quote_for_a_row_rebuilds_numeric_orders(store):
+    indexes = SortIndexCache(store)
+    snapshot = indexes.snapshot(_rows(store), 'pe')
+    store.update_quote('S002.NS', {'price': 10.0})
+    assert indexes.snapshot(_rows(store), 'pe') is not snapshot
+
+
+@pytest.mark.parametrize('key', sorted(SORT_KEY_FIELDS))
+def test_page_values_are_the_values_shown(store, key):
+    indexes = SortIndexCache(store)
+    rows, info = indexes.page(_rows(store), 200, key=key, order='desc')
+    shown = [store.enriched_record(row)[SORT_KEY_FIELDS[key]] for row in rows]
+    assert info['values'] == pytest.approx(shown)
+
+
+def test_page_values_keep_the_cursor_order_while_quotes_arrive(store):
+    indexes = SortIndexCache(store)
+    rows, info = indexes.page(_rows(store), 30, key='roe', order='desc')
+    values = list(info['values'])
+    while info['next_cursor']:
+        # Quotes fetched for the page just shown, as the your-stocks route does
+        for row in rows:
+            store.update_quote(store.symbols[row], {'price': 100.0, 'roe': -float(row)})
+        rows, info = indexes.page(_rows(store), 30, cursor=info['next_cursor'])
+        values.extend(info['values'])
+    assert len(values) == len(store)
+    assert values == sorted(values, reverse=True)
+
+
+def test_cursor_from_another_cache_resumes_its_own_order(store):
+    # Another worker, or the cache a reload replaced, numbers its own snapshots
+    first = SortIndexCache(store)
+    by_price = first.snapshot(_rows(store), 'price', 'desc')
+    other = SortIndexCache(store)
+    _, info = other.page(_rows(store), 20, key='name', order='asc')
+    assert info['snapshot'] != by_price.id
+
+    resumed, resumed_info = first.page(_rows(store), 20, cursor=info['next_cursor'])
+    expected, _ = other.page(_rows(store), 20, cursor=info['next_cursor'])
+    assert np.array_equal(resumed, expected)
+    assert (resumed_info['sort'], resumed_info['order']) == ('name', 'asc')
+
+
+def test_cursor_that_does_not_match_its_snapshot_is_resumed_by_symbol(store):
+    indexes = SortIndexCache(store)
+    by_price = indexes.snapshot(_rows(store), 'price', 'desc')
+    by_name = indexes.snapshot(_rows(store), 'name', 'asc')
+    # Claims the price order's id but a name-order position and symbol
+    cursor = encode_cursor(by_price.id, 20, 'name', 'asc', by_name.symbols[19])
+    rows, info = indexes.page(_rows(store), 5, cursor=cursor)
+    assert np.array_equal(rows, by_name.rows[20:25])
+    assert info['snapshot'] == by_name.id
+
+
+def test_invalid_cursor():
+    with pytest.raises(InvalidCursor):
+        decode_cursor('not a cursor')
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor('a.1', -5, 'name', 'asc', None))
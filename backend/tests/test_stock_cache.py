@@ -0,0 +1,136 @@
+import threading
+import time
+
+import pytest
+
+from stock_cache import PersistentStockCache, SingleFlight, TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set('a', 1)
+    clock.now = 9.9
+    assert cache.get('a') == 1
+    clock.now = 10
+    assert cache.get('a') is None
+    assert 'a' not in cache._entries
+    assert cache.stats()['expirations'] == 1
+
+
+def test_stale_entries_are_served_until_max_stale():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, max_stale=60, clock=clock)
+    cache.set('a', 1)
+    clock.now = 30
+    assert cache.get('a') is None
+    assert cache.get_entry('a') == (1, 30)
+    assert cache.get_entry('a', allow_stale=False) is None
+    clock.now = 60
+    assert cache.get_entry('a') is None
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_set_backdates_restored_entries():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set('a', 1, age=8)
+    clock.now = 2
+    assert cache.get('a') is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_budget_evicts_oldest_entries():
+    cache = TTLCache(max_entries=None, max_bytes=2000)
+    for i in range(20):
+        cache.set(i, {'payload': 'x' * 200})
+    stats = cache.stats()
+    assert 0 < stats['entries'] < 20
+    assert stats['bytes'] <= 2000
+    assert cache.get(19) is not None and cache.get(0) is None
+
+
+def test_persistent_cache_round_trip(tmp_path):
+    path = str(tmp_path / 'cache' / 'stocks.db')
+    cache = PersistentStockCache(path)
+    cache.set('quote:A', {'price': 1.5}, fetched_at=1000.0)
+    cache.set('info:A', {'roe': 12})
+    cache.close()
+
+    cache = PersistentStockCache(path, max_age=float('inf'))
+    assert cache.get('quote:A') == ({'price': 1.5}, 1000.0)
+    assert cache.get('quote:B') is None
+    assert [key for key, _, _ in cache.load_all('quote:')] == ['quote:A']
+    assert len(cache) == 2
+    cache.close()
+
+
+def test_persistent_cache_prunes_old_records(tmp_path):
+    path = str(tmp_path / 'stocks.db')
+    cache = PersistentStockCache(path)
+    cache.set('old', {}, fetched_at=0.0)
+    cache.set('new', {})
+    cache.prune()
+    assert cache.get('old') is None
+    assert cache.get('new') is not None
+    cache.close()
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('k', fetch))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while flight.stats()['coalesced'] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert results == ['value'] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 3}
+
+
+def test_single_flight_forgets_failed_calls():
+    flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError('upstream down')
+
+    with pytest.raises(RuntimeError):
+        flight.do('k', fail)
+    assert not flight.in_flight('k')
+    assert flight.do('k', lambda: 2) == 2
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+from flask import Flask, request
+
+import enhanced_screener
+import json_provider
+from json_provider import FastJSONProvider
+from streaming import stream_format, stream_stocks
+
+app = Flask(__name__)
+fast_app = Flask(__name__)
+fast_app.json = FastJSONProvider(fast_app)
+
+
+def _format(path, **headers):
+    with app.test_request_context(path, headers=headers):
+        return stream_format(request)
+
+
+def test_stream_format_from_query_or_accept_header():
+    assert _format('/?stream=ndjson') == 'ndjson'
+    assert _format('/?stream=1') == 'ndjson'
+    assert _format('/?stream=SSE') == 'sse'
+    assert _format('/', Accept='text/event-stream') == 'sse'
+    assert _format('/', Accept='application/x-ndjson, */*') == 'ndjson'
+    assert _format('/') is None
+    assert _format('/?stream=0') is None
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_ndjson_stocks_then_trailer():
+    stocks = [{'symbol': 'A', 'roe': 1}, {'symbol': 'B', 'roe': 2}]
+    with app.test_request_context():
+        response = stream_stocks('ndjson', iter(stocks), trailer={'criteria': {}}, fields=('symbol',))
+        lines = _lines(response)
+    assert response.mimetype == 'application/x-ndjson'
+    assert lines[:2] == [{'type': 'stock', 'data': {'symbol': 'A'}}, {'type': 'stock', 'data': {'symbol': 'B'}}]
+    assert lines[2]['type'] == 'trailer'
+    assert (lines[2]['status'], lines[2]['total'], lines[2]['criteria']) == ('success', 2, {})
+
+
+def test_sse_events():
+    with app.test_request_context():
+        body = stream_stocks('sse', [{'symbol': 'A'}]).get_data(as_text=True)
+    events = body.split('\n\n')
+    assert events[0] == 'event: stock\ndata: {"data":{"symbol":"A"}}'
+    assert events[1].startswith('event: trailer\ndata: ')
+    assert json.loads(events[1].split('data: ', 1)[1])['total'] == 1
+
+
+def test_stocks_are_sent_as_they_are_produced():
+    produced = []
+
+    def stocks():
+        for symbol in 'ABC':
+            produced.append(symbol)
+            yield {'symbol': symbol}
+
+    checked = {}
+    with app.test_request_context():
+        chunks = iter(stream_stocks('ndjson', stocks(), trailer=lambda: dict(checked)).response)
+        assert json.loads(next(chunks))['data'] == {'symbol': 'A'}
+        assert produced == ['A']
+        # The trailer is taken once the stocks are exhausted
+        checked['checked'] = 3
+        rest = [json.loads(chunk) for chunk in chunks]
+    assert rest[-1]['checked'] == 3 and rest[-1]['total'] == 3
+
+
+def test_failure_mid_stream_ends_with_an_error_event():
+    def stocks():
+        yield {'symbol': 'A'}
+        raise RuntimeError('upstream went away')
+
+    with app.test_request_context():
+        lines = _lines(stream_stocks('ndjson', stocks()))
+    assert [line['type'] for line in lines] == ['stock', 'error']
+    assert lines[1]['message'] == 'upstream went away' and lines[1]['total'] == 1
+
+
+@pytest.mark.skipif(json_provider.orjson is None, reason='orjson is not installed')
+def test_stream_is_encoded_by_the_app_json_provider():
+    with fast_app.test_request_context():
+        response = stream_stocks('ndjson', [{'symbol': 'Ä', 'pe': float('nan')}])
+    # Generated after the request context is gone, as under a real server
+    first = response.get_data(as_text=True).splitlines()[0]
+    # orjson: UTF-8 text and NaN as null, where the stdlib writes \u00c4 and NaN
+    assert first == '{"data":{"pe":null,"symbol":"Ä"},"type":"stock"}'
+
+
+@pytest.mark.parametrize('method, path, body', [
+    ('post', '/api/screener/screen?stream=ndjson', {'criteria': {'roe': {'min': 10}}, 'useFallback': True}),
+    ('get', '/api/screener/screen/quality_stocks?stream=ndjson', None),
+])
+def test_screen_routes_stream_fallback_results(method, path, body):
+    client = enhanced_screener.app.test_client()
+    response = getattr(client, method)(path, json=body)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    trailer = lines[-1]
+    assert trailer['type'] == 'trailer'
+    assert trailer['total'] == len(lines) - 1
+    assert trailer['total_checked'] == len(enhanced_screener.screener.get_fallback_stocks())
+    if method == 'get':
+        assert trailer['filter_name'] == 'Quality Stocks' and trailer['description']
@@ -0,0 +1,23 @@
+import pytest
+import tvscreener as tvs
+
+import tvscreener_adapter
+from tvscreener_adapter import TvScreenerInternalsError
+
+
+def test_installed_tvscreener_has_every_internal():
+    screener = tvs.StockScreener()
+    tvscreener_adapter.check(screener)
+    columns = tvscreener_adapter.request_columns(screener)
+    payload = tvscreener_adapter.build_payload(screener, columns)
+    assert payload['columns'] == list(columns)
+    frame = tvscreener_adapter.frame([['NSE:TCS'] + [None] * len(columns)], columns)
+    assert len(frame) == 1
+
+
+def test_missing_internal_is_named():
+    class Screener:
+        specific_fields = ()
+
+    with pytest.raises(TvScreenerInternalsError, match=r'Screener\._build_payload, Screener\.url'):
+        tvscreener_adapter.check(Screener())
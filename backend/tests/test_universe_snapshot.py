@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+import universe_snapshot
+from universe_snapshot import load_snapshot, write_snapshot
+from universe_store import UniverseStore
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(9)
+    store = UniverseStore()
+    for i in range(150):
+        store.upsert(f'S{i:03d}.NS', {
+            'name': f'Company {i}',
+            'sector': ('Tech', 'Energy', None)[i % 3],
+            'screener_price': float(rng.uniform(10, 1000)),
+            'roe': float(rng.uniform(-5, 40)) if i % 4 else None,
+        })
+    for i in range(0, 150, 5):
+        store.update_quote(f'S{i:03d}.NS', {'price': float(rng.uniform(10, 1000))}, fetched_at=1000.0 + i)
+    return store
+
+
+def test_round_trip_keeps_every_record(store, tmp_path):
+    path = str(tmp_path / 'universe.snap')
+    assert write_snapshot(store, path) > 0
+    loaded = load_snapshot(path)
+    assert list(loaded.symbols) == list(store.symbols)
+    assert loaded.generation == store.generation
+    assert loaded.csv_generation == store.csv_generation
+    for row in range(len(store)):
+        assert loaded.stock_record(row) == store.stock_record(row)
+    assert np.array_equal(loaded.csv_rows, store.csv_rows)
+    assert loaded.row_of('S010.NS') == store.row_of('S010.NS')
+
+
+def test_writes_to_a_loaded_store_leave_the_file_alone(store, tmp_path):
+    path = str(tmp_path / 'universe.snap')
+    write_snapshot(store, path)
+    loaded = load_snapshot(path)
+    loaded.update_quote('S001.NS', {'price': 1.0})
+    loaded.upsert('NEW.NS', {'roe': 5.0, 'sector': 'Retail'})
+    assert loaded.get(loaded.row_of('NEW.NS'), 'sector') == 'Retail'
+
+    again = load_snapshot(path)
+    assert 'NEW.NS' not in again.symbols
+    assert again.stock_record(again.row_of('S001.NS')) == store.stock_record(store.row_of('S001.NS'))
+
+
+def test_rejects_files_that_are_not_snapshots(tmp_path):
+    path = tmp_path / 'other.bin'
+    path.write_bytes(b'not a snapshot' * 10)
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_written_arrays_are_copied_under_the_lock(store, tmp_path, monkeypatch):
+    # Store writes landing once the lock is released, before the bytes are written
+    written = []
+    original = universe_snapshot.os.fdopen
+
+    def fdopen(*args, **kwargs):
+        store.upsert('S000.NS', {'sector': 'New sector', 'roe': 123.0})
+        written.append(True)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(universe_snapshot.os, 'fdopen', fdopen)
+    path = str(tmp_path / 'universe.snap')
+    before = store.stock_record(store.row_of('S000.NS'))
+    write_snapshot(store, path)
+    assert written
+    loaded = load_snapshot(path)
+    assert loaded.stock_record(loaded.row_of('S000.NS')) == before
@@ -0,0 +1,79 @@
+import numpy as np
+
+from universe_store import UniverseStore
+
+
+def test_upsert_grows_and_reads_back():
+    store = UniverseStore(capacity=2)
+    for i in range(10):
+        store.upsert(f'S{i}', {'roe': float(i), 'sector': 'Tech' if i % 2 else None})
+    assert len(store) == 10
+    assert store.get(store.row_of('S7'), 'roe') == 7.0
+    assert store.get(store.row_of('S7'), 'sector') == 'Tech'
+    assert store.get(store.row_of('S4'), 'sector', 'Unknown') == 'Unknown'
+    assert np.isnan(store.column('peRatio')).all()
+    assert store.upsert('S3', {'roe': 'n/a'}) == store.row_of('S3')
+    assert store.get(store.row_of('S3'), 'roe') is None
+
+
+def test_unknown_keys_are_ignored():
+    store = UniverseStore()
+    store.upsert('A', {'roe': 1.0, 'not_a_field': 5})
+    assert 'not_a_field' not in store
+
+
+def test_changes_since_lists_each_changed_row_once():
+    store = UniverseStore()
+    store.upsert('A', {'roe': 1.0})
+    position = store.change_position
+    store.upsert('B', {'roe': 2.0})
+    store.upsert('A', {'roe': 3.0})
+    store.upsert('A', {'roe': 4.0})
+    assert store.changes_since(position).tolist() == [0, 1]
+    assert len(store.changes_since(store.change_position)) == 0
+
+
+def test_trimmed_change_log_asks_for_a_rebuild():
+    store = UniverseStore()
+    position = store.change_position
+    for i in range(10000):
+        store.upsert(f'S{i % 100}', {'roe': float(i)})
+    assert store.changes_since(position) is None
+
+
+def test_quote_and_screen_fetch_times_are_separate():
+    store = UniverseStore()
+    row = store.update_quote('A.NS', {'price': 10.0}, fetched_at=1000.0)
+    assert store.data_age(row, now=1060.0) == 60.0
+    assert store.data_age(row, now=1060.0, field='screen_fetched_at') is None
+
+    store.update_stock_data({'symbol': 'A.NS', 'roe': 12.0}, fetched_at=1050.0)
+    assert store.data_age(row, now=1060.0) == 60.0
+    assert store.data_age(row, now=1060.0, field='screen_fetched_at') == 10.0
+
+
+def test_column_versions_move_only_on_changes():
+    store = UniverseStore()
+    store.upsert('A', {'roe': 1.0, 'sector': 'Tech'})
+    roe, sector = store.column_version('roe', 'sector')
+    nulls = store.null_version('roe')
+
+    store.upsert('A', {'roe': 1.0, 'sector': 'Tech'})
+    assert store.column_version('roe', 'sector') == (roe, sector)
+
+    store.upsert('A', {'roe': 2.0})
+    assert store.column_version('roe') == (roe + 1,)
+    assert store.null_version('roe') == nulls
+
+    store.upsert('B', {'roe': 3.0})
+    assert store.null_version('roe') == nulls + 1
+    assert store.column_version('sector') == (sector,)
+
+
+def test_view_restricts_rows():
+    store = UniverseStore()
+    for i in range(5):
+        store.upsert(f'S{i}', {'roe': float(i)})
+    view = store.view([1, 3])
+    assert len(view) == 2
+    assert view['roe'].tolist() == [1.0, 3.0]
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, jsonify
+
+from wsgi_bridge import call_wsgi, wsgi_environ
+
+app = Flask(__name__)
+rendered = []
+closed = threading.Event()
+
+
+@app.route('/quote')
+def quote():
+    return jsonify({'symbol': 'A'})
+
+
+@app.route('/rows')
+def rows():
+    def generate():
+        try:
+            n = 0
+            while True:
+                rendered.append(n)
+                yield f"{n}\n"
+                n += 1
+        finally:
+            closed.set()
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+def _scope(path):
+    return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'x=1',
+            'headers': [(b'accept', b'application/json'), (b'accept', b'text/plain')]}
+
+
+def _serve(path, on_send, buffer=None):
+    """Run the bridge for `path`; `on_send(message, disconnect)` sees each message"""
+    rendered.clear()
+    closed.clear()
+    sent = []
+
+    async def main():
+        gone = asyncio.Event()
+
+        async def receive():
+            await gone.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            await on_send(message, gone.set)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            await asyncio.wait_for(call_wsgi(app, wsgi_environ(_scope(path), path, b''), send, receive,
+                                             executor, buffer=buffer), timeout=10)
+
+    asyncio.run(main())
+    return sent
+
+
+def test_environ_from_scope():
+    environ = wsgi_environ(_scope('/quote'), '/quote', b'{}')
+    assert environ['REQUEST_METHOD'] == 'GET'
+    assert environ['QUERY_STRING'] == 'x=1'
+    assert environ['HTTP_ACCEPT'] == 'application/json,text/plain'
+    assert environ['wsgi.input'].read() == b'{}'
+
+
+def test_sends_the_whole_response():
+    async def on_send(message, disconnect):
+        pass
+
+    sent = _serve('/quote', on_send)
+    assert sent[0]['type'] == 'http.response.start'
+    assert sent[0]['status'] == 200
+    assert (b'content-type', b'application/json') in sent[0]['headers']
+    assert b''.join(m.get('body', b'') for m in sent[1:]).strip() == b'{"symbol":"A"}'
+    assert sent[-1] == {'type': 'http.response.body', 'body': b'', 'more_body': False}
+
+
+def test_disconnect_stops_the_render():
+    async def on_send(message, disconnect):
+        if message.get('body') == b'2\n':
+            disconnect()
+
+    sent = _serve('/rows', on_send, buffer=4)
+    # The endless stream was cut short and its generator closed
+    assert closed.is_set()
+    assert sent[-1]['more_body'] is True
+    assert len(rendered) <= 3 + 4 + 2
+
+
+def test_slow_client_holds_the_render_back():
+    async def on_send(message, disconnect):
+        if message['type'] == 'http.response.body':
+            # The client stops reading: the render may only fill the buffer
+            await asyncio.get_running_loop().run_in_executor(None, time.sleep, 0.3)
+            assert len(rendered) <= 1 + 4 + 2
+            disconnect()
+
+    _serve('/rows', on_send, buffer=4)
+    assert closed.is_set()
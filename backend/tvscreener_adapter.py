@@ -0,0 +1,80 @@
+"""
+Every tvscreener internal python_app depends on, in one place
+Screens are posted over our pooled TradingView session instead of through
+screener.get(), which takes a few private parts of tvscreener (checked
+against 0.5.x): the payload builder, the column list, the status check,
+the endpoint URL and the result DataFrame. They are only reached through
+this module; when a tvscreener release moves one, check() raises
+TvScreenerInternalsError naming it and callers fall back to screener.get().
+"""
+import json
+from importlib import metadata
+
+import tvscreener as tvs
+
+from http_client import tradingview_session
+
+# tvscreener releases the internals below were checked against
+TESTED_VERSIONS = '0.5.x'
+
+try:
+    from tvscreener.core.base import ScreenerDataFrame
+    from tvscreener.util import get_columns_to_request, is_status_code_ok
+    _import_error = None
+except ImportError as e:
+    ScreenerDataFrame = get_columns_to_request = is_status_code_ok = None
+    _import_error = e
+
+# Private attributes read off every screener
+SCREENER_ATTRIBUTES = ('_build_payload', 'specific_fields', 'url')
+
+
+class TvScreenerInternalsError(RuntimeError):
+    """The installed tvscreener lacks an internal this module relies on"""
+
+
+def installed_version():
+    try:
+        return metadata.version('tvscreener')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def check(screener):
+    """Raise TvScreenerInternalsError unless every internal is there for `screener`"""
+    missing = None
+    if _import_error is not None:
+        missing = f"tvscreener.core.base.ScreenerDataFrame / tvscreener.util helpers ({_import_error})"
+    else:
+        absent = [name for name in SCREENER_ATTRIBUTES if not hasattr(screener, name)]
+        if absent:
+            missing = ', '.join(f"{type(screener).__name__}.{name}" for name in absent)
+    if missing:
+        raise TvScreenerInternalsError(
+            f"tvscreener {installed_version()} has no {missing}; "
+            f"python_app was written against tvscreener {TESTED_VERSIONS}")
+
+
+def request_columns(screener):
+    """{field: column label} of what the screener's payload asks for"""
+    return get_columns_to_request(screener.specific_fields)
+
+
+def build_payload(screener, columns):
+    """The JSON body screener.get() would post for `columns`"""
+    return screener._build_payload(list(columns.keys()))
+
+
+def post_payload(screener, payload):
+    """(rows, totalCount) for one screener payload over the shared session"""
+    payload = json.dumps(payload)
+    response = tradingview_session().post(screener.url, data=payload)
+    if not is_status_code_ok(response):
+        raise tvs.MalformedRequestException(response.status_code, response.text, screener.url, payload)
+    body = response.json()
+    return [[d['s']] + d['d'] for d in body['data']], body.get('totalCount')
+
+
+def frame(rows, columns):
+    """Rows as the DataFrame screener.get() returns"""
+    return ScreenerDataFrame(rows, columns)
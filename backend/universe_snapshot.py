@@ -0,0 +1,108 @@
+"""
+Binary snapshots of the universe store
+One file per snapshot: a JSON header (schema, symbols, string dictionaries)
+followed by the fixed-width column arrays, each 64-byte aligned. Snapshots
+are written atomically and opened with mmap, so a new worker starts without
+parsing anything and every worker reading the same snapshot shares its
+pages until it writes to a column
+"""
+import json
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from universe_store import UniverseStore
+
+MAGIC = b'UNIVSNP1'
+_ALIGN = 64
+_HEADER_LENGTH = struct.Struct('<Q')
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _arrays(store):
+    """(name, array) of every column array, trimmed to the store's size"""
+    size = len(store)
+    for field, values in store._numeric.items():
+        yield f'numeric/{field}', values[:size]
+    for field, codes in store._codes.items():
+        yield f'codes/{field}', codes[:size]
+    for field, valid in store._valid.items():
+        yield f'valid/{field}', valid[:size]
+    yield 'csv_rows', store.csv_rows
+
+
+def write_snapshot(store, path):
+    """Write `store` to `path` atomically (temp file + os.replace); returns bytes written"""
+    with store._lock:
+        # Copies, so writes landing after the lock is released can't store
+        # codes or rows the header below doesn't describe
+        arrays = [(name, np.array(values, order='C', copy=True)) for name, values in _arrays(store)]
+        header = {
+            'created_at': time.time(),
+            'size': len(store),
+            'symbols': list(store.symbols),
+            'numeric_fields': list(store._numeric),
+            'string_fields': list(store._codes),
+            'dictionaries': {field: list(values) for field, values in store._dictionaries.items()},
+            'generation': store.generation,
+            'csv_generation': store.csv_generation,
+            'arrays': {},
+        }
+        # Offsets are relative to the start of the data section, which
+        # begins at the first aligned position after the header
+        offset = 0
+        for name, values in arrays:
+            offset = _aligned(offset)
+            header['arrays'][name] = {'dtype': values.dtype.str, 'length': len(values), 'offset': offset}
+            offset += values.nbytes
+
+    encoded = json.dumps(header, separators=(',', ':')).encode()
+    data_start = _aligned(len(MAGIC) + _HEADER_LENGTH.size + len(encoded))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.universe-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER_LENGTH.pack(len(encoded)))
+            f.write(encoded)
+            for name, values in arrays:
+                f.seek(data_start + header['arrays'][name]['offset'])
+                f.write(values.tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return data_start + offset
+
+
+def read_snapshot(path):
+    """(header, {name: array}) with every array a copy-on-write view of the mapped file"""
+    mapped = np.memmap(path, dtype=np.uint8, mode='c')
+    if bytes(mapped[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f'{path} is not a universe snapshot')
+    start = len(MAGIC)
+    (header_length,) = _HEADER_LENGTH.unpack(bytes(mapped[start:start + _HEADER_LENGTH.size]))
+    start += _HEADER_LENGTH.size
+    header = json.loads(bytes(mapped[start:start + header_length]))
+    data_start = _aligned(start + header_length)
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        begin = data_start + spec['offset']
+        arrays[name] = mapped[begin:begin + spec['length'] * dtype.itemsize].view(dtype)
+    return header, arrays
+
+
+def load_snapshot(path):
+    """UniverseStore over the mapped snapshot at `path`"""
+    return UniverseStore.from_snapshot(*read_snapshot(path))
@@ -0,0 +1,31 @@
+"""
+The universe store together with everything derived from it
+A UniverseState bundles a store with its sort indexes, range indexes and
+materialized screens. A reloaded universe replaces all of them with one
+assignment, and a reader that took one state never mixes rows of two stores.
+"""
+from materialized_screens import MaterializedScreens
+from range_index import RangeIndexSet
+from sort_index import SortIndexCache
+
+
+class UniverseState:
+    """One UniverseStore and the indexes and screens built over it"""
+
+    __slots__ = ('store', 'sort_indexes', 'range_indexes', 'screens')
+
+    def __init__(self, store):
+        self.store = store
+        # Presorted page orders over the CSV rows, one per sort key
+        self.sort_indexes = SortIndexCache(store)
+        # Sorted per-column indexes so criteria don't scan the whole universe
+        self.range_indexes = RangeIndexSet(store)
+        # Predefined screen results, maintained per symbol (see materialize())
+        self.screens = None
+
+    def materialize(self, filters, symbols):
+        """Maintain the results of `filters` over `symbols` from now on"""
+        screens = MaterializedScreens(self.store, filters, symbols, indexes=self.range_indexes)
+        screens.rebuild()
+        self.screens = screens
+        return screens
@@ -0,0 +1,540 @@
+"""
+Columnar in-memory universe store
+One typed array per field, a symbol -> row index and per-field null masks,
+populated from the screener.in CSV and from Yahoo Finance enrichment
+"""
+import itertools
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Text fields are dictionary-encoded: an int32 code per row plus a shared
+# list of distinct values (industries, sectors etc. repeat a lot)
+STRING_FIELDS = (
+    'name',            # screener.in name
+    'long_name',       # Yahoo longName / shortName
+    'nse_code',
+    'bse_code',
+    'industry',        # screener.in industry
+    'industry_group',  # screener.in industry group
+    'sector',          # Yahoo sector
+    'yahoo_industry',  # Yahoo industry
+)
+
+NUMERIC_FIELDS = (
+    # screener.in CSV
+    'screener_price',
+    'screener_pe',
+    'screener_roe',
+    'screener_debt_equity',
+    # Yahoo Finance quote / fundamentals (criteria engine column names)
+    'currentPrice',
+    'marketCap',
+    'peRatio',
+    'roe',
+    'debtToEquity',
+    'currentRatio',
+    'salesGrowth',
+    'profitGrowth',
+    'volume',
+    'change',
+    'changePercent',
+    'fiftyTwoWeekHigh',
+    'fiftyTwoWeekLow',
+    # Derived / estimated metrics used by the custom criteria
+    'roe_growth',
+    'omp_growth',
+    'pat_growth',
+    'pledged_percent',
+    'promoter_holding_change',
+    'avg_roe_5y',
+    'fii_holding',
+    'dii_holding',
+    # Epoch seconds of the row's last Yahoo quote (update_quote) and
+    # screening data (update_stock_data); the two are fetched separately
+    'quote_fetched_at',
+    'screen_fetched_at',
+)
+
+# Fetch-time columns, not data
+FETCHED_AT_FIELDS = ('quote_fetched_at', 'screen_fetched_at')
+
+# Keys of the get_stock_data_cached() dicts -> store fields
+QUOTE_FIELD_MAP = {
+    'price': 'currentPrice',
+    'market_cap': 'marketCap',
+    'pe_ratio': 'peRatio',
+    'roe': 'roe',
+    'debt_equity': 'debtToEquity',
+    'volume': 'volume',
+    'change': 'change',
+    'change_percent': 'changePercent',
+    '52w_high': 'fiftyTwoWeekHigh',
+    '52w_low': 'fiftyTwoWeekLow',
+    'sector': 'sector',
+    'industry': 'yahoo_industry',
+}
+
+# Keys of the get_stock_data() dicts that do not share the store field name
+STOCK_FIELD_MAP = {
+    'name': 'long_name',
+    'industry': 'yahoo_industry',
+}
+
+_INITIAL_CAPACITY = 256
+_epochs = itertools.count(1)
+
+
+class RowsView:
+    """The column table protocol over a subset of a store's rows"""
+
+    def __init__(self, store, rows):
+        self.store = store
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, field):
+        return field in self.store
+
+    def __getitem__(self, field):
+        return self.store.column(field, self.rows)
+
+
+class UniverseStore:
+    """Thread-safe columnar table of every symbol the screener knows about"""
+
+    def __init__(self, capacity=_INITIAL_CAPACITY):
+        self._lock = threading.RLock()
+        self._capacity = capacity
+        self._size = 0
+        self.symbols = []
+        self.symbol_index = {}
+        self.csv_rows = np.empty(0, dtype=np.int64)
+        # Bumped on every mutation so readers can tell when derived data is stale
+        self.generation = 0
+        # Bumped only when the screener.in CSV rows are (re)loaded
+        self.csv_generation = 0
+        # Per-column counters: field -> bumped when any of its values changes,
+        # ('null', field) -> bumped when a row turns null or non-null. They let
+        # derived orders rebuild only when a column they read has moved.
+        self._versions = {}
+        # Tells stores apart whose generations may coincide (e.g. one
+        # reloaded from a snapshot), for caches keyed by generation
+        self.epoch = next(_epochs)
+        # Rows touched by each mutation, in order, so derived indexes can
+        # catch up on just what changed (see changes_since)
+        self._change_log = []
+        self._change_base = 0
+
+        self._numeric = {field: np.zeros(capacity) for field in NUMERIC_FIELDS}
+        self._codes = {field: np.full(capacity, -1, dtype=np.int32) for field in STRING_FIELDS}
+        self._valid = {field: np.zeros(capacity, dtype=bool) for field in NUMERIC_FIELDS + STRING_FIELDS}
+        self._dictionaries = {field: [] for field in STRING_FIELDS}
+        self._dictionary_index = {field: {} for field in STRING_FIELDS}
+
+    @classmethod
+    def from_snapshot(cls, header, arrays):
+        """Store over universe_snapshot.read_snapshot() arrays, without copying them
+
+        The arrays stay mapped until a write grows the store; fields the
+        snapshot lacks start out null.
+        """
+        size = header['size']
+        store = cls(capacity=max(size, 1))
+        if size == 0:
+            return store
+        for field in header['numeric_fields']:
+            store._numeric[field] = arrays[f'numeric/{field}']
+        for field in header['string_fields']:
+            store._codes[field] = arrays[f'codes/{field}']
+            dictionary = header['dictionaries'][field]
+            store._dictionaries[field] = dictionary
+            store._dictionary_index[field] = {value: code for code, value in enumerate(dictionary)}
+        for field in header['numeric_fields'] + header['string_fields']:
+            store._valid[field] = arrays[f'valid/{field}']
+        store._size = size
+        store.symbols = header['symbols']
+        store.symbol_index = {symbol: row for row, symbol in enumerate(store.symbols)}
+        store.csv_rows = arrays['csv_rows']
+        store.generation = header['generation']
+        store.csv_generation = header['csv_generation']
+        return store
+
+    # ------------------------------------------------------------------ #
+    # Column table protocol (used by criteria_engine)
+    # ------------------------------------------------------------------ #
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, field):
+        return field in self._numeric or field in self._codes
+
+    def __getitem__(self, field):
+        """Column view; numeric nulls come back as NaN, string nulls as None"""
+        return self.column(field)
+
+    def keys(self):
+        return tuple(self._numeric) + tuple(self._codes)
+
+    def column(self, field, rows=None):
+        size = self._size
+        if field in self._numeric:
+            values = self._numeric[field][:size]
+            valid = self._valid[field][:size]
+            if rows is not None:
+                values, valid = values[rows], valid[rows]
+            return np.where(valid, values, np.nan)
+        codes = self._codes[field][:size]
+        if rows is not None:
+            codes = codes[rows]
+        dictionary = np.array(self._dictionaries[field] + [None], dtype=object)
+        return dictionary[codes]
+
+    def null_mask(self, field):
+        """True where the field has never been populated"""
+        return ~self._valid[field][:self._size]
+
+    def view(self, rows):
+        """Column table restricted to `rows` (e.g. to re-evaluate one symbol)"""
+        return RowsView(self, np.asarray(rows, dtype=np.int64))
+
+    # ------------------------------------------------------------------ #
+    # Writes
+    # ------------------------------------------------------------------ #
+    def _grow(self, minimum):
+        capacity = self._capacity
+        while capacity < minimum:
+            capacity *= 2
+        if capacity == self._capacity:
+            return
+        for columns in (self._numeric, self._codes, self._valid):
+            for field, values in columns.items():
+                grown = np.zeros(capacity, dtype=values.dtype)
+                if values.dtype == np.int32:
+                    grown.fill(-1)
+                grown[:self._capacity] = values
+                columns[field] = grown
+        self._capacity = capacity
+
+    def _log_change(self, row):
+        self._log_changes((row,))
+
+    def _log_changes(self, rows):
+        log = self._change_log
+        log.extend(rows)
+        if len(log) > max(4096, 4 * self._size):
+            # Readers further behind than this have to rebuild
+            drop = len(log) // 2
+            del log[:drop]
+            self._change_base += drop
+
+    @property
+    def change_position(self):
+        """Log position to pass to changes_since() later"""
+        return self._change_base + len(self._change_log)
+
+    def changes_since(self, position):
+        """Distinct rows changed since `position`, or None if the log was trimmed past it"""
+        with self._lock:
+            if position < self._change_base:
+                return None
+            changed = self._change_log[position - self._change_base:]
+            return np.unique(np.array(changed, dtype=np.int64))
+
+    def _row_for(self, symbol):
+        row = self.symbol_index.get(symbol)
+        if row is None:
+            row = self._size
+            self._grow(row + 1)
+            self.symbols.append(symbol)
+            self.symbol_index[symbol] = row
+            self._size += 1
+        return row
+
+    def _rows_for(self, symbols):
+        """_row_for() over many symbols, growing the arrays once"""
+        self._grow(self._size + len(symbols))
+        index = self.symbol_index
+        rows = np.empty(len(symbols), dtype=np.int64)
+        for i, symbol in enumerate(symbols):
+            row = index.get(symbol)
+            if row is None:
+                row = self._size
+                self.symbols.append(symbol)
+                index[symbol] = row
+                self._size += 1
+            rows[i] = row
+        return rows
+
+    def _encode(self, field, value):
+        index = self._dictionary_index[field]
+        code = index.get(value)
+        if code is None:
+            code = len(self._dictionaries[field])
+            self._dictionaries[field].append(value)
+            index[value] = code
+        return code
+
+    def _bump(self, key):
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def column_version(self, *fields):
+        """Versions of `fields`; they differ once any of their values has changed"""
+        return tuple(self._versions.get(field, 0) for field in fields)
+
+    def null_version(self, field):
+        """Version of the null mask of `field`"""
+        return self._versions.get(('null', field), 0)
+
+    def _set(self, row, field, value):
+        was_valid = bool(self._valid[field][row])
+        valid = value is not None
+        if field in self._numeric:
+            values = self._numeric
+            if valid:
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    valid = False
+        else:
+            values = self._codes
+            if valid:
+                value = self._encode(field, str(value))
+        if valid:
+            if was_valid and values[field][row] == value:
+                return
+            values[field][row] = value
+        elif not was_valid:
+            return
+        self._valid[field][row] = valid
+        self._bump(field)
+        if valid != was_valid:
+            self._bump(('null', field))
+
+    def upsert(self, symbol, values):
+        """Insert or update one symbol; keys not in the schema are ignored"""
+        with self._lock:
+            row = self._row_for(symbol)
+            for field, value in values.items():
+                if field in self:
+                    self._set(row, field, value)
+            self._log_change(row)
+            self.generation += 1
+            return row
+
+    def _add_field(self, field, numeric):
+        """Extra column (e.g. a screener.in column outside the fixed schema)"""
+        if field in self:
+            return
+        if numeric:
+            self._numeric[field] = np.zeros(self._capacity)
+        else:
+            self._codes[field] = np.full(self._capacity, -1, dtype=np.int32)
+            self._dictionaries[field] = []
+            self._dictionary_index[field] = {}
+        self._valid[field] = np.zeros(self._capacity, dtype=bool)
+
+    def _set_column(self, rows, field, values):
+        """Bulk _set(): NaN numbers and None texts leave the cell null"""
+        if field in self._numeric:
+            values = np.asarray(values, dtype=np.float64)
+            valid = ~np.isnan(values)
+            stored = np.where(valid, values, 0.0)
+            column = self._numeric[field]
+        else:
+            # Encode each distinct value once
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object), use_na_sentinel=True)
+            lookup = np.array([self._encode(field, str(value)) for value in uniques] + [-1], dtype=np.int32)
+            valid = codes >= 0
+            stored = lookup[codes]
+            column = self._codes[field]
+        nulls_changed = np.any(self._valid[field][rows] != valid)
+        if nulls_changed or np.any(column[rows] != stored):
+            self._bump(field)
+        if nulls_changed:
+            self._bump(('null', field))
+        column[rows] = stored
+        self._valid[field][rows] = valid
+
+    def load_screener_csv(self, snapshot):
+        """Populate from a csv_loader.CSVSnapshot (every column); returns its rows"""
+        with self._lock:
+            rows = self._rows_for(snapshot.symbols)
+            for field in snapshot.extra_numeric:
+                self._add_field(field, numeric=True)
+            for field in snapshot.extra_text:
+                self._add_field(field, numeric=False)
+            for field, values in snapshot.columns.items():
+                self._set_column(rows, field, values)
+            self._log_changes(rows.tolist())
+            self.csv_rows = rows
+            self.generation += 1
+            self.csv_generation += 1
+            return rows
+
+    def update_quote(self, symbol, quote, fetched_at=None):
+        """Store a get_stock_data_cached() dict for `symbol`"""
+        values = {QUOTE_FIELD_MAP[key]: value for key, value in quote.items() if key in QUOTE_FIELD_MAP}
+        values['quote_fetched_at'] = fetched_at if fetched_at is not None else time.time()
+        return self.upsert(symbol, values)
+
+    def update_stock_data(self, stock_data, fetched_at=None):
+        """Store a get_stock_data() dict (screening fields)"""
+        values = {STOCK_FIELD_MAP.get(key, key): value for key, value in stock_data.items()}
+        values['screen_fetched_at'] = fetched_at if fetched_at is not None else time.time()
+        return self.upsert(stock_data['symbol'], values)
+
+    # ------------------------------------------------------------------ #
+    # Reads
+    # ------------------------------------------------------------------ #
+    def row_of(self, symbol):
+        return self.symbol_index.get(symbol)
+
+    def rows_for(self, symbols):
+        """Rows of the symbols that are present, in the given order"""
+        index = self.symbol_index
+        return np.array([index[s] for s in symbols if s in index], dtype=np.int64)
+
+    def get(self, row, field, default=None):
+        if not self._valid[field][row]:
+            return default
+        if field in self._numeric:
+            return float(self._numeric[field][row])
+        return self._dictionaries[field][self._codes[field][row]]
+
+    def has_quote(self, row):
+        return bool(self._valid['currentPrice'][row])
+
+    def has_quotes(self, rows):
+        """Vectorized has_quote() over an array of rows"""
+        return self._valid['currentPrice'][rows]
+
+    def data_age(self, row, now=None, field='quote_fetched_at'):
+        """Seconds since the row's last Yahoo quote (or `field` update), or None if never fetched"""
+        fetched_at = self.get(row, field)
+        if fetched_at is None:
+            return None
+        return round((now if now is not None else time.time()) - fetched_at, 1)
+
+    def rows_sorted_by_name(self, rows):
+        """`rows` ordered alphabetically (case-insensitive) by screener.in name"""
+        names = self.column('name', rows)
+        keys = np.array([(n or '').lower() for n in names], dtype=object)
+        return rows[np.argsort(keys, kind='stable')]
+
+    def stock_record(self, row):
+        """Row rendered in the get_stock_data() shape used by screens"""
+        get = self.get
+        symbol = self.symbols[row]
+        return {
+            'name': get(row, 'long_name') or get(row, 'name') or symbol,
+            'ticker': symbol.replace('.NS', ''),
+            'symbol': symbol,
+            'currentPrice': get(row, 'currentPrice', 0),
+            'marketCap': get(row, 'marketCap', 0),
+            'peRatio': get(row, 'peRatio', 0),
+            'roe': get(row, 'roe', 0),
+            'debtToEquity': get(row, 'debtToEquity', 0),
+            'currentRatio': get(row, 'currentRatio', 1.0),
+            'salesGrowth': get(row, 'salesGrowth', 0),
+            'profitGrowth': get(row, 'profitGrowth', 0),
+            'sector': get(row, 'sector', 'Unknown'),
+            'industry': get(row, 'yahoo_industry', 'Unknown'),
+            'country': 'India',
+            'exchange': 'NSE',
+            'volume': get(row, 'volume', 0),
+            'change': get(row, 'change', 0),
+            'changePercent': get(row, 'changePercent', 0),
+            'url': f'https://finance.yahoo.com/quote/{symbol}',
+            'roe_growth': get(row, 'roe_growth', 0),
+            'omp_growth': get(row, 'omp_growth', 0),
+            'pat_growth': get(row, 'pat_growth', 0),
+            'pledged_percent': get(row, 'pledged_percent', 0),
+            'promoter_holding_change': get(row, 'promoter_holding_change', 0),
+            'avg_roe_5y': get(row, 'avg_roe_5y', 0),
+            'fii_holding': get(row, 'fii_holding', 0),
+            'dii_holding': get(row, 'dii_holding', 0),
+        }
+
+    def enriched_record(self, row):
+        """Row rendered in the yahoo_*/screener_* shape used by your-stocks pages"""
+        get = self.get
+        symbol = self.symbols[row]
+        screener_price = get(row, 'screener_price', 0)
+        industry = get(row, 'industry', 'Unknown')
+        industry_group = get(row, 'industry_group', 'Unknown')
+
+        if self.has_quote(row):
+            price = get(row, 'currentPrice', 0)
+            market_cap = get(row, 'marketCap', 1000.0)
+            pe_ratio = get(row, 'peRatio', 0)
+            roe = get(row, 'roe', 0)
+            debt_equity = get(row, 'debtToEquity', 0)
+            high_52w = get(row, 'fiftyTwoWeekHigh', 0)
+            low_52w = get(row, 'fiftyTwoWeekLow', 0)
+            volume = get(row, 'volume', 0)
+            change = get(row, 'change', 0)
+            change_percent = get(row, 'changePercent', 0)
+            sector = get(row, 'sector', 'Unknown')
+            yahoo_industry = get(row, 'yahoo_industry', 'Unknown')
+        else:
+            # Fallback to screener data
+            price = screener_price
+            market_cap = 1000.0
+            pe_ratio = get(row, 'screener_pe', 0)
+            roe = get(row, 'screener_roe', 0)
+            debt_equity = get(row, 'screener_debt_equity', 0)
+            high_52w = price * 1.2
+            low_52w = price * 0.8
+            volume = 100000
+            change = 0
+            change_percent = 0
+            sector = industry_group
+            yahoo_industry = industry
+
+        return {
+            'name': get(row, 'name') or get(row, 'long_name') or symbol,
+            'symbol': symbol,
+            'ticker': get(row, 'nse_code') or get(row, 'bse_code') or symbol.split('.')[0],
+            'industry': industry,
+            'industry_group': industry_group,
+
+            # Yahoo Finance data (or fallback)
+            'yahoo_current_price': price,
+            'yahoo_market_cap': market_cap,
+            'yahoo_pe_ratio': pe_ratio,
+            'yahoo_roe': roe,
+            'yahoo_debt_equity': debt_equity,
+            'yahoo_52w_high': high_52w,
+            'yahoo_52w_low': low_52w,
+            'yahoo_volume': volume,
+            'yahoo_change': change,
+            'yahoo_change_percent': change_percent,
+            'yahoo_sector': sector,
+            'yahoo_industry': yahoo_industry,
+            'yahoo_revenue_growth': 10.0,
+            'yahoo_earnings_growth': 8.0,
+
+            # Screener.in data for comparison
+            'screener_price': screener_price,
+            'screener_pe': get(row, 'screener_pe', 0),
+            'screener_roe': get(row, 'screener_roe', 0),
+            'screener_debt_equity': get(row, 'screener_debt_equity', 0),
+
+            # Price difference analysis
+            'price_diff_percent': ((price - screener_price) / screener_price * 100) if screener_price > 0 else 0,
+
+            # Seconds since the Yahoo data was fetched (None = screener.in only)
+            'data_age': self.data_age(row),
+
+            'url': f'https://finance.yahoo.com/quote/{symbol}'
+        }
+
+    def memory_usage(self):
+        """Approximate bytes held by the column arrays"""
+        arrays = list(self._numeric.values()) + list(self._codes.values()) + list(self._valid.values())
+        return sum(a.nbytes for a in arrays)
@@ -0,0 +1,142 @@
+"""
+WSGI apps served from an ASGI event loop
+Builds the WSGI environ for an ASGI HTTP scope and runs the app on a thread
+pool, sending its response to the client as it is produced: through a
+bounded buffer, so a slow client holds a streamed render back, and with the
+render stopped once the client disconnects
+"""
+import asyncio
+import io
+import os
+import sys
+import threading
+
+# Response messages buffered per request between its render thread and the
+# client (ASGI_SEND_BUFFER)
+SEND_BUFFER = int(os.environ.get('ASGI_SEND_BUFFER', 16))
+
+
+def wsgi_environ(scope, path_info, body):
+    """WSGI environ of an ASGI HTTP `scope` whose request body is `body`"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path_info.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+class _Disconnected(Exception):
+    """The client went away before its response was sent"""
+
+
+async def _disconnect(receive):
+    """Returns once the client disconnects (the request body has been read)"""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def call_wsgi(app, environ, send, receive, executor, buffer=None):
+    """Run the WSGI `app` for `environ` on `executor`, sending its response as it is produced
+
+    The render thread hands each message over through a queue of `buffer`
+    messages (SEND_BUFFER by default), waiting while it is full, so a slow
+    client holds a streamed render back instead of letting its body pile up
+    in memory. If the client disconnects, the render stops at its next
+    chunk and the WSGI iterable is closed.
+    """
+    loop = asyncio.get_running_loop()
+    messages = asyncio.Queue(maxsize=buffer or SEND_BUFFER)
+    disconnected = threading.Event()
+
+    def put(message):
+        if disconnected.is_set():
+            raise _Disconnected()
+        asyncio.run_coroutine_threadsafe(messages.put(message), loop).result()
+
+    def run():
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['start'] = {
+                'type': 'http.response.start',
+                'status': int(status.split(' ', 1)[0]),
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            }
+            return write
+
+        def write(chunk):
+            if 'start' in response:
+                put(response.pop('start'))
+            if chunk:
+                put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        try:
+            result = app(environ, start_response)
+            try:
+                # Streamed routes send each chunk as soon as it is rendered
+                for chunk in result:
+                    write(chunk)
+                write(b'')
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+            put({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        except _Disconnected:
+            pass
+        except BaseException as e:
+            try:
+                put(e)
+            except _Disconnected:
+                pass
+
+    rendering = loop.run_in_executor(executor, run)
+    watch = asyncio.ensure_future(_disconnect(receive))
+    try:
+        while True:
+            getting = asyncio.ensure_future(messages.get())
+            await asyncio.wait((getting, watch), return_when=asyncio.FIRST_COMPLETED)
+            if watch.done():
+                getting.cancel()
+                raise _Disconnected()
+            message = getting.result()
+            if isinstance(message, BaseException):
+                raise message
+            await send(message)
+            if message['type'] == 'http.response.body' and not message['more_body']:
+                break
+    except _Disconnected:
+        print(f"🔌 Client disconnected from {environ['PATH_INFO']}")
+    finally:
+        # A render still running stops at its next put(); one waiting on the
+        # full queue is let through first
+        disconnected.set()
+        while not messages.empty():
+            messages.get_nowait()
+        watch.cancel()
+        await rendering